@@ -0,0 +1,112 @@
+"""
+Benchmark: /health Latenz während 50 Kontakt-Vorschläge laufen
+Supabase und Gemini werden durch Sleeps mit realistischer Dauer ersetzt,
+damit nur das Verhalten des Event Loops gemessen wird. Ersetzt wird nur der
+Gemini Call selbst (generate_response_async), Cache, Single-Flight und das
+SUGGESTION_CONCURRENCY-Limit laufen echt mit. Jeder Request hat eine eigene
+Adresse, damit keine Anfragen gebündelt werden.
+
+    python backend/bench_contact_suggestions.py
+"""
+import asyncio
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import httpx
+
+import backend.contact_suggestions as contact_suggestions
+import llmcall_method.callgemini as callgemini
+import llmcall_method.records as records
+from backend.main import app
+
+IN_FLIGHT = 50
+PROFILE_SECONDS = 0.15   # blockierender Supabase Call (läuft im Executor)
+LLM_SECONDS = 3.0        # Gemini Antwortzeit
+HEALTH_SAMPLES = 40
+
+
+def fake_fetch_profile(user_id):
+    time.sleep(PROFILE_SECONDS)
+    # Hausnummer aus der user_id -> eigener Cache-Key pro Request
+    house_number = user_id.rsplit("-", 1)[-1]
+    return {"user_id": user_id, "street": "Nancystraße", "house_number": house_number, "postal_code": "76187", "city": "Karlsruhe"}
+
+
+class FakeGemini:
+    """Ersetzt nur den Gemini Call und zählt, wie viele gleichzeitig laufen"""
+
+    def __init__(self):
+        self.calls = 0
+        self.running = 0
+        self.peak = 0
+
+    async def generate_response_async(self, prompt, timeout=None):
+        self.calls += 1
+        self.running += 1
+        self.peak = max(self.peak, self.running)
+        try:
+            await asyncio.sleep(LLM_SECONDS)
+        finally:
+            self.running -= 1
+        return '[{"name": "Praxis Dr. Müller", "telefonnummer": "0721 123456"}]'
+
+
+async def sample_health(client, samples):
+    latencies = []
+    for _ in range(samples):
+        start = time.perf_counter()
+        response = await client.get("/health")
+        latencies.append((time.perf_counter() - start) * 1000)
+        assert response.status_code == 200
+        await asyncio.sleep(0.05)
+    return latencies
+
+
+def describe(name, latencies):
+    latencies = sorted(latencies)
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    print(f"{name:<28} p50={statistics.median(latencies):7.2f} ms  p95={p95:7.2f} ms  max={latencies[-1]:7.2f} ms")
+
+
+async def main():
+    records._fetch_profile = fake_fetch_profile
+    gemini = FakeGemini()
+    callgemini.generate_response_async = gemini.generate_response_async
+    # Ohne lokales Verzeichnis geht jeder Lookup an das (gefälschte) LLM
+    callgemini.get_provider_directory = lambda: None
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        idle = await sample_health(client, HEALTH_SAMPLES)
+
+        start = time.perf_counter()
+        suggestions = [
+            asyncio.create_task(client.post("/api/get-contact-suggestions", json={
+                "user_id": f"bench-user-{i}", "description": "Zahnarzt Termin", "radius_km": 10,
+            }))
+            for i in range(IN_FLIGHT)
+        ]
+        await asyncio.sleep(0.2)  # alle Requests sind jetzt in flight
+        loaded = await sample_health(client, HEALTH_SAMPLES)
+        results = await asyncio.gather(*suggestions)
+        total = time.perf_counter() - start
+
+    print("=" * 70)
+    print(f"📊 /health latency with {IN_FLIGHT} suggestion requests in flight")
+    print("=" * 70)
+    describe("idle", idle)
+    describe(f"{IN_FLIGHT} suggestions in flight", loaded)
+    ok = sum(1 for r in results if r.status_code == 200 and r.json()["success"])
+    print(f"suggestions: {ok}/{IN_FLIGHT} ok in {total:.2f}s (LLM {LLM_SECONDS}s each)")
+    waves = -(-gemini.calls // contact_suggestions.SUGGESTION_CONCURRENCY)
+    print(f"LLM calls: {gemini.calls}, peak concurrent {gemini.peak} "
+          f"(SUGGESTION_CONCURRENCY={contact_suggestions.SUGGESTION_CONCURRENCY}, expected ≥ {waves * LLM_SECONDS:.1f}s)")
+    print("=" * 70)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,297 @@
+"""
+Persistente Warteschlange für geplante Anrufe
+Ersetzt einen schlafenden Coroutine pro Request durch eine SQLite-Tabelle
+und einen einzigen Dispatcher, der fällige Jobs in Batches abarbeitet.
+"""
+import asyncio
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Awaitable, Callable, List, Optional
+
+from backend.event_writer import event_writer
+
+DEFAULT_DB_PATH = os.getenv(
+    "CALL_QUEUE_DB",
+    str(Path(__file__).resolve().parent / "call_queue.sqlite3"),
+)
+BATCH_SIZE = int(os.getenv("CALL_QUEUE_BATCH_SIZE", "20"))
+BATCH_INTERVAL_SECONDS = float(os.getenv("CALL_QUEUE_BATCH_INTERVAL", "5"))
+LEASE_SECONDS = int(os.getenv("CALL_QUEUE_LEASE_SECONDS", "120"))
+# Solange der Handler läuft (Opener, Warten auf einen Live-Call-Slot), wird die Lease so oft verlängert
+LEASE_RENEW_SECONDS = LEASE_SECONDS / 3
+MAX_ATTEMPTS = int(os.getenv("CALL_QUEUE_MAX_ATTEMPTS", "3"))
+RETRY_DELAY_SECONDS = int(os.getenv("CALL_QUEUE_RETRY_DELAY", "300"))
+# Auch ohne fällige Jobs regelmäßig nachsehen (andere Prozesse können einreihen)
+POLL_SECONDS = float(os.getenv("CALL_QUEUE_POLL_SECONDS", "30"))
+
+
+class CallQueue:
+    """
+    Jobs: pending -> leased -> done / failed
+
+    Ein Worker "least" einen Job für LEASE_SECONDS und verlängert die Lease,
+    solange er daran arbeitet. Stirbt er, läuft sie ab und der Job wird von
+    einem anderen Worker erneut übernommen.
+    """
+
+    def __init__(self, db_path: str = DEFAULT_DB_PATH):
+        self.db_path = db_path
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute(
+            """CREATE TABLE IF NOT EXISTS scheduled_calls (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                request_id TEXT NOT NULL UNIQUE,
+                payload TEXT NOT NULL,
+                run_at REAL NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                lease_owner TEXT,
+                lease_until REAL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                last_error TEXT,
+                created_at REAL NOT NULL
+            )"""
+        )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_scheduled_calls_due ON scheduled_calls(status, run_at)"
+        )
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=10, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def enqueue(self, request_id: str, payload: dict, run_at: datetime) -> bool:
+        """
+        Reiht einen Anruf ein (idempotent pro request_id)
+
+        Ist der frühere Job des Requests schon done/failed, wird er mit den
+        neuen Daten wieder auf pending gesetzt (erneut planen).
+
+        Returns:
+            False, wenn der Request schon eingereiht war und noch läuft
+        """
+        cursor = self._conn().execute(
+            """INSERT INTO scheduled_calls (request_id, payload, run_at, created_at)
+               VALUES (?, ?, ?, ?)
+               ON CONFLICT(request_id) DO UPDATE SET
+                   payload = excluded.payload, run_at = excluded.run_at, status = 'pending',
+                   lease_owner = NULL, lease_until = NULL, attempts = 0, last_error = NULL,
+                   created_at = excluded.created_at
+               WHERE scheduled_calls.status IN ('done', 'failed')""",
+            (request_id, json.dumps(payload, ensure_ascii=False), run_at.timestamp(), time.time()),
+        )
+        return cursor.rowcount == 1
+
+    def claim_due(self, owner: str, limit: int = BATCH_SIZE, lease_seconds: int = LEASE_SECONDS,
+                  now: Optional[float] = None) -> List[dict]:
+        """Übernimmt bis zu limit fällige Jobs (inkl. abgelaufener Leases)"""
+        now = now or time.time()
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            rows = conn.execute(
+                """SELECT * FROM scheduled_calls
+                   WHERE (status = 'pending' AND run_at <= ?)
+                      OR (status = 'leased' AND lease_until < ?)
+                   ORDER BY run_at
+                   LIMIT ?""",
+                (now, now, limit),
+            ).fetchall()
+            ids = [row["id"] for row in rows]
+            if ids:
+                placeholders = ",".join("?" * len(ids))
+                conn.execute(
+                    f"""UPDATE scheduled_calls
+                        SET status = 'leased', lease_owner = ?, lease_until = ?, attempts = attempts + 1
+                        WHERE id IN ({placeholders})""",
+                    (owner, now + lease_seconds, *ids),
+                )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+        jobs = []
+        for row in rows:
+            job = dict(row)
+            job["payload"] = json.loads(job["payload"])
+            job["attempts"] += 1
+            jobs.append(job)
+        return jobs
+
+    def renew(self, job_id: int, owner: str, lease_seconds: int = LEASE_SECONDS) -> bool:
+        """
+        Lease verlängern, solange der Job bearbeitet wird
+
+        Returns:
+            False, wenn die Lease inzwischen einem anderen Worker gehört
+        """
+        cursor = self._conn().execute(
+            """UPDATE scheduled_calls SET lease_until = ?
+               WHERE id = ? AND lease_owner = ? AND status = 'leased'""",
+            (time.time() + lease_seconds, job_id, owner),
+        )
+        return cursor.rowcount == 1
+
+    def complete(self, job_id: int, owner: str):
+        self._conn().execute(
+            """UPDATE scheduled_calls SET status = 'done', lease_until = NULL
+               WHERE id = ? AND lease_owner = ?""",
+            (job_id, owner),
+        )
+
+    def fail(self, job_id: int, owner: str, error: str, attempts: int,
+             retry_delay: int = RETRY_DELAY_SECONDS, max_attempts: int = MAX_ATTEMPTS):
+        """
+        Fehlschlag: später erneut versuchen oder endgültig als failed markieren
+
+        Returns:
+            True, wenn der Job damit endgültig failed ist
+        """
+        status = "failed" if attempts >= max_attempts else "pending"
+        cursor = self._conn().execute(
+            """UPDATE scheduled_calls
+               SET status = ?, run_at = ?, lease_owner = NULL, lease_until = NULL, last_error = ?
+               WHERE id = ? AND lease_owner = ?""",
+            (status, time.time() + retry_delay, error, job_id, owner),
+        )
+        return status == "failed" and cursor.rowcount == 1
+
+    def next_due_at(self) -> Optional[float]:
+        row = self._conn().execute(
+            """SELECT MIN(CASE WHEN status = 'pending' THEN run_at ELSE lease_until END)
+               FROM scheduled_calls WHERE status IN ('pending', 'leased')"""
+        ).fetchone()
+        return row[0]
+
+    def counts(self) -> dict:
+        rows = self._conn().execute(
+            "SELECT status, COUNT(*) FROM scheduled_calls GROUP BY status"
+        ).fetchall()
+        return {row[0]: row[1] for row in rows}
+
+
+class CallDispatcher:
+    """
+    Ein Timer für alle geplanten Anrufe
+
+    Schläft bis zum nächsten fälligen Job und arbeitet dann alle fälligen
+    Jobs in Batches von batch_size ab, mit batch_interval Pause dazwischen
+    (z.B. Montag 08:00: nicht alle Anrufe gleichzeitig).
+    """
+
+    def __init__(self, queue: CallQueue, handler: Callable[[dict], Awaitable[None]],
+                 batch_size: int = BATCH_SIZE, batch_interval: float = BATCH_INTERVAL_SECONDS):
+        self.queue = queue
+        self.handler = handler
+        self.batch_size = batch_size
+        self.batch_interval = batch_interval
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup = asyncio.Event()
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def notify(self):
+        """Neuer Job eingereiht -> Timer neu berechnen"""
+        self._wakeup.set()
+
+    async def release_due(self) -> int:
+        """
+        Arbeitet alles ab, was jetzt fällig ist, in kontrollierten Batches
+
+        Returns:
+            Anzahl verarbeiteter Jobs
+        """
+        processed = 0
+        while True:
+            jobs = await asyncio.to_thread(self.queue.claim_due, self.owner, self.batch_size)
+            if not jobs:
+                return processed
+            await asyncio.gather(*(self._process(job) for job in jobs))
+            processed += len(jobs)
+            print(f"📞 Dispatcher: {len(jobs)} geplante Anrufe gestartet ({processed} gesamt)")
+            if len(jobs) < self.batch_size:
+                return processed
+            await asyncio.sleep(self.batch_interval)
+
+    async def _keep_leased(self, job: dict):
+        """Lease verlängern, bis der Handler fertig ist (er kann lange auf einen Slot warten)"""
+        while True:
+            await asyncio.sleep(LEASE_RENEW_SECONDS)
+            try:
+                renewed = await asyncio.to_thread(self.queue.renew, job["id"], self.owner)
+            except Exception as e:
+                print(f"⚠️ Lease für {job['request_id']} nicht verlängert: {e}")
+                continue
+            if not renewed:
+                print(f"⚠️ Lease für {job['request_id']} verloren, ein anderer Worker hat übernommen")
+                return
+
+    async def _process(self, job: dict):
+        heartbeat = asyncio.create_task(self._keep_leased(job))
+        try:
+            await self.handler(job)
+            await asyncio.to_thread(self.queue.complete, job["id"], self.owner)
+        except Exception as e:
+            print(f"❌ Geplanter Anruf {job['request_id']} fehlgeschlagen: {e}")
+            gave_up = await asyncio.to_thread(self.queue.fail, job["id"], self.owner, str(e), job["attempts"])
+            if gave_up:
+                # Sonst bleibt der Request für den Nutzer ewig auf "scheduled"
+                event_writer.record_event(job["request_id"], "call", f"Call could not be started after {job['attempts']} attempts: {e}")
+                event_writer.set_status(job["request_id"], "failed")
+        finally:
+            heartbeat.cancel()
+
+    async def _run(self):
+        while True:
+            try:
+                await self.release_due()
+                next_due = await asyncio.to_thread(self.queue.next_due_at)
+            except Exception as e:
+                print(f"❌ Dispatcher Fehler: {e}")
+                next_due = None
+
+            delay = POLL_SECONDS
+            if next_due is not None:
+                delay = min(POLL_SECONDS, max(0.0, next_due - time.time()))
+
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+
+
+_queue: Optional[CallQueue] = None
+
+
+def get_call_queue() -> CallQueue:
+    global _queue
+    if _queue is None:
+        _queue = CallQueue()
+    return _queue
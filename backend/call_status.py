@@ -0,0 +1,188 @@
+"""
+Twilio Status-Callbacks -> RequestStatus + Timeline-Events
+Twilio ruft den Webhook bei initiated, ringing, answered und completed auf
+(Fehlschläge kommen als completed-Event mit CallStatus busy/no-answer/failed).
+"""
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import parsedate_to_datetime
+from pathlib import Path
+from typing import Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from twilio.request_validator import RequestValidator
+
+from backend.event_writer import event_writer
+from language_output.tts_cache import get_tts_cache
+from llmcall_method.outcome import CallOutcome
+from twillio.dialer import get_dialer
+from twillio.session_store import get_session_store
+
+
+# Twilio CallStatus -> RequestStatus (frontend/lib/types.ts)
+# completed setzt keinen Status: ob gebucht wurde, entscheidet das Gesprächsergebnis
+CALL_STATUS_MAP = {
+    "queued": "calling",
+    "initiated": "calling",
+    "ringing": "calling",
+    "in-progress": "in_progress",
+    "completed": None,
+    "busy": "waiting_for_callback",
+    "no-answer": "waiting_for_callback",
+    "failed": "failed",
+    "canceled": "canceled",
+}
+
+CALL_STATUS_MESSAGES = {
+    "queued": "Call queued",
+    "initiated": "Dialing",
+    "ringing": "Ringing",
+    "in-progress": "Call answered",
+    "completed": "Call ended",
+    "busy": "Line busy",
+    "no-answer": "No answer",
+    "failed": "Call could not be connected",
+    "canceled": "Call canceled",
+}
+
+FINAL_CALL_STATUSES = {"completed", "busy", "no-answer", "failed", "canceled"}
+
+NO_CONVERSATION_MESSAGE = "Call ended without conversation"
+
+# So lange wartet completed auf das Outcome-Update des letzten Turns (OUTCOME_TIMEOUT_SECONDS + Puffer)
+OUTCOME_WAIT_SECONDS = float(os.getenv("OUTCOME_WAIT_SECONDS", "20"))
+OUTCOME_POLL_SECONDS = 0.25
+
+# Warten aufs Outcome blockiert nicht den Callback (Twilio erwartet schnell eine Antwort)
+_finish_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="call-finish")
+
+
+def _callback_order(params: dict) -> Optional[float]:
+    """
+    Reihenfolge eines Callbacks (sie können out of order ankommen)
+
+    Timestamp (RFC 2822, Sekunden) plus SequenceNumber als Tiebreaker
+    """
+    try:
+        order = parsedate_to_datetime(params["Timestamp"]).timestamp()
+    except (KeyError, TypeError, ValueError):
+        return None
+    try:
+        order += int(params.get("SequenceNumber", 0)) / 1000
+    except ValueError:
+        pass
+    return order
+
+
+def is_valid_signature(url: str, params: dict, signature: Optional[str]) -> bool:
+    """
+    Prüft X-Twilio-Signature eines Callbacks
+
+    Args:
+        url: vollständige URL inkl. Query, wie Twilio sie aufgerufen hat
+    """
+    auth_token = os.getenv("TWILIO_AUTH_TOKEN", "")
+    if not auth_token:
+        print("⚠️ TWILIO_AUTH_TOKEN ist nicht gesetzt, Status-Callbacks werden abgelehnt")
+        return False
+    if not signature:
+        return False
+    return RequestValidator(auth_token).validate(url, params, signature)
+
+
+def public_url(path: str, query: str, fallback: str) -> str:
+    """URL, die Twilio signiert hat (BACKEND_PUBLIC_URL + Pfad, sonst die Request-URL)"""
+    # Hinter einem Proxy kennt nur BACKEND_PUBLIC_URL die öffentliche URL (start_call nutzt dieselbe)
+    backend_url = os.getenv("BACKEND_PUBLIC_URL", "").strip().rstrip("/")
+    if not backend_url:
+        return fallback
+    return f"{backend_url}{path}" + (f"?{query}" if query else "")
+
+
+def handle_status_callback(request_id: Optional[str], params: dict) -> None:
+    """
+    Verarbeitet einen Status-Callback
+
+    Args:
+        request_id: aus der Callback-URL (start_call hängt ihn an)
+        params: Formular-Felder von Twilio (CallSid, CallStatus, CallDuration, ...)
+    """
+    call_sid = params.get("CallSid", "")
+    call_status = params.get("CallStatus", "")
+    print(f"📞 Status-Callback {call_sid}: {call_status} (request {request_id})")
+
+    if call_status in FINAL_CALL_STATUSES and call_sid:
+        # Live-Call-Slot im Dialer und Audio-Pins des Calls sofort freigeben
+        get_dialer().release(call_sid)
+        get_tts_cache().release_call(call_sid)
+
+    if request_id and call_status in CALL_STATUS_MAP:
+        message = CALL_STATUS_MESSAGES[call_status]
+        if call_status == "completed" and params.get("CallDuration"):
+            message = f"{message} after {params['CallDuration']}s"
+        event_writer.record_event(request_id, "call", message)
+
+        status = CALL_STATUS_MAP[call_status]
+        if status:
+            event_writer.set_status(request_id, status, order=_callback_order(params))
+
+    if call_status in FINAL_CALL_STATUSES and call_sid:
+        if call_status == "completed":
+            # Das Update zum letzten Turn kann noch laufen -> im Hintergrund abwarten
+            _finish_pool.submit(_finish_call, call_sid, request_id, _callback_order(params))
+        else:
+            get_session_store().complete(call_sid)
+
+
+def wait_for_outcome(call_sid: str, timeout: float = OUTCOME_WAIT_SECONDS) -> Optional[CallOutcome]:
+    """
+    Gesprächsergebnis lesen, sobald es alle Turns abdeckt
+
+    Während des Gesprächs inkrementell gepflegt, beim Auflegen fehlt
+    höchstens das Update zum letzten Turn. Nach timeout zählt der letzte Stand.
+    """
+    sessions = get_session_store()
+    deadline = time.monotonic() + timeout
+    while True:
+        data = sessions.get_outcome(call_sid)
+        outcome = CallOutcome.from_dict(data) if data else None
+        if outcome is None or outcome.settled:
+            return outcome
+        if time.monotonic() >= deadline:
+            print(f"⚠️ Outcome für {call_sid} deckt nur {outcome.covered_turns}/{outcome.turns} Turns ab")
+            return outcome
+        time.sleep(OUTCOME_POLL_SECONDS)
+
+
+def _finish_call(call_sid: str, request_id: Optional[str], order: Optional[float]) -> None:
+    try:
+        outcome = wait_for_outcome(call_sid)
+        if not request_id:
+            return
+        if outcome is not None:
+            record_outcome(request_id, outcome, order)
+        else:
+            # Aufgelegt vor dem ersten Turn -> nie ein OutcomeTracker, Request nicht ewig in_progress lassen
+            event_writer.record_event(request_id, "summary", NO_CONVERSATION_MESSAGE)
+            event_writer.set_status(request_id, "failed", order=order, summary=NO_CONVERSATION_MESSAGE)
+    except Exception as e:
+        print(f"❌ Fehler beim Abschließen von Call {call_sid}: {e}")
+    finally:
+        # Gesprächszustand erst nach dem Lesen des Outcomes freigeben
+        get_session_store().complete(call_sid)
+
+
+def record_outcome(request_id: str, outcome: CallOutcome, order: Optional[float] = None) -> None:
+    """Gesprächsergebnis -> booked / waiting_for_callback / failed + Summary"""
+    if outcome.booked:
+        status = "booked"
+    elif outcome.callback_requested:
+        status = "waiting_for_callback"
+    else:
+        status = "failed"
+    summary = outcome.summary_text()
+    event_writer.record_event(request_id, "summary", summary)
+    event_writer.set_status(request_id, status, order=order, summary=summary)
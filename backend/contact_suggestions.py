@@ -2,14 +2,44 @@
 Contact Suggestions API
 Findet passende Kontakte basierend auf User-Profil und Description
 """
+import asyncio
 import sys
 import os
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from typing import AsyncIterator
 
 # Add parent directory to path for imports
 sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
 
-from llmcall_method.callgemini import getcontactinfo, get_supabase_client
+from llmcall_method.callgemini import contact_cache_key, getcontactinfo_async
+from llmcall_method.geocoder import geocode_profile, geocode_profiles
+from llmcall_method.records import get_profile_async, get_profiles_async
+from llmcall_method.service_classifier import classify_batch
+
+# Supabase-py ist synchron -> eigener, begrenzter Thread-Pool statt Event Loop blockieren
+SUPABASE_WORKERS = int(os.getenv("SUPABASE_WORKERS", "8"))
+# Maximal so viele gleichzeitige Gemini-Lookups, der Rest wartet (ohne zu blockieren)
+SUGGESTION_CONCURRENCY = int(os.getenv("SUGGESTION_CONCURRENCY", "20"))
+
+# Batch: so viele Gruppen (gleicher Ort + Kategorie) gleichzeitig in Arbeit
+BATCH_CONCURRENCY = int(os.getenv("SUGGESTION_BATCH_CONCURRENCY", "10"))
+
+PROFILE_NOT_FOUND = "⚠️ Profile not found! Please go to /profile and complete your profile with your address (street, postal code, city)."
+INCOMPLETE_ADDRESS = "⚠️ Incomplete address! Please go to /profile and add:\n• Street\n• Postal Code\n• City\n\nThese are required to find contacts nearby."
+SEARCH_TIMED_OUT = "Contact search timed out. Please try again."
+SEARCH_CANCELED = "Contact search was canceled. Please try again."
+
+_db_executor = ThreadPoolExecutor(max_workers=SUPABASE_WORKERS, thread_name_prefix="supabase")
+_llm_slots = asyncio.Semaphore(SUGGESTION_CONCURRENCY)
+
+
+def _address(profile: dict) -> tuple:
+    """(Straße + Hausnummer, PLZ, Stadt) aus einem Profil"""
+    street = profile.get('street') or ''
+    house_number = profile.get('house_number') or ''
+    full_street = f"{street} {house_number}".strip() if house_number else street
+    return full_street, profile.get('postal_code') or '', profile.get('city') or ''
 
 
 async def get_contact_suggestions(user_id: str, description: str, radius_km: int = 10) -> dict:
@@ -27,8 +57,6 @@ async def get_contact_suggestions(user_id: str, description: str, radius_km: int
     
     try:
         # 1. Lade User Profile aus Supabase
-        supabase = get_supabase_client()
-        
         print("\n" + "="*70)
         print("🔍 DEBUG: PROFILE LOOKUP")
         print("="*70)
@@ -36,36 +64,26 @@ async def get_contact_suggestions(user_id: str, description: str, radius_km: int
         print(f"🔗 Supabase URL: {os.getenv('NEXT_PUBLIC_SUPABASE_URL')}")
         print("-"*70)
         
-        # Verwende .execute() statt .single() um Exception zu vermeiden
-        profile_response = supabase.table('profiles').select('*').eq('user_id', user_id).execute()
+        # Read-through Cache, Supabase nur beim ersten Mal bzw. nach TTL/Invalidierung
+        profile = await get_profile_async(user_id, _db_executor)
         
-        print(f"📊 Query executed successfully")
-        print(f"📊 Response data: {profile_response.data}")
-        print(f"📊 Number of rows: {len(profile_response.data) if profile_response.data else 0}")
+        print(f"📊 Profile: {profile}")
         print("="*70 + "\n")
         
-        if not profile_response.data or len(profile_response.data) == 0:
+        if not profile:
             return {
                 "success": False,
-                "error": "⚠️ Profile not found! Please go to /profile and complete your profile with your address (street, postal code, city).",
+                "error": PROFILE_NOT_FOUND,
                 "contacts": []
             }
         
-        profile = profile_response.data[0]
-        
         # 2. Extrahiere Adress-Daten
-        street = profile.get('street', '')
-        house_number = profile.get('house_number', '')
-        postal_code = profile.get('postal_code', '')
-        city = profile.get('city', '')
-        
-        # Kombiniere Straße + Hausnummer
-        full_street = f"{street} {house_number}".strip() if house_number else street
+        full_street, postal_code, city = _address(profile)
         
         if not full_street or not postal_code:
             return {
                 "success": False,
-                "error": "⚠️ Incomplete address! Please go to /profile and add:\n• Street\n• Postal Code\n• City\n\nThese are required to find contacts nearby.",
+                "error": INCOMPLETE_ADDRESS,
                 "contacts": []
             }
         
@@ -74,12 +92,19 @@ async def get_contact_suggestions(user_id: str, description: str, radius_km: int
         print(f"📝 Description: {description}")
         print(f"📏 Radius: {radius_km} km\n")
         
-        # 3. Rufe getcontactinfo auf
-        contacts = getcontactinfo(
+        # Koordinaten offline aus PLZ/Straße, gecacht pro user_id bis sich die Adresse ändert
+        coords = geocode_profile(user_id, profile)
+        lat, lon = coords if coords else (None, None)
+        
+        # 3. Rufe getcontactinfo auf (async, LLM Calls begrenzt auf SUGGESTION_CONCURRENCY)
+        contacts = await getcontactinfo_async(
             street=full_street,
             postal_code=postal_code,
             description=description,
-            radius_km=radius_km
+            radius_km=radius_km,
+            limiter=_llm_slots,
+            lat=lat,
+            lon=lon
         )
         
         # 4. Return Ergebnis
@@ -93,6 +118,13 @@ async def get_contact_suggestions(user_id: str, description: str, radius_km: int
             }
         }
         
+    except asyncio.TimeoutError:
+        print("❌ Timeout in get_contact_suggestions")
+        return {
+            "success": False,
+            "error": SEARCH_TIMED_OUT,
+            "contacts": []
+        }
     except Exception as e:
         print(f"❌ Error in get_contact_suggestions: {e}")
         return {
@@ -102,6 +134,102 @@ async def get_contact_suggestions(user_id: str, description: str, radius_km: int
         }
 
 
+async def get_contact_suggestions_batch(items: list) -> AsyncIterator[dict]:
+    """
+    Kontakt-Vorschläge für viele (user_id, description, radius_km) auf einmal
+
+    Profile kommen aus einer einzigen Query, Items mit gleichem Ort,
+    gleicher Kategorie und gleichem Radius werden gruppiert und nur einmal
+    aufgelöst. Ergebnisse werden geliefert, sobald ihre Gruppe fertig ist.
+
+    Args:
+        items: Liste von dicts mit user_id, description, radius_km
+
+    Yields:
+        Pro Item ein Dictionary wie bei get_contact_suggestions() plus index und user_id
+    """
+    try:
+        profiles = await get_profiles_async((item["user_id"] for item in items), _db_executor)
+    except Exception as e:
+        print(f"❌ Error loading profiles for batch: {e}")
+        for index, item in enumerate(items):
+            yield {"index": index, "user_id": item["user_id"], "success": False, "error": str(e), "contacts": []}
+        return
+
+    coords = geocode_profiles(profile for profile in profiles.values() if profile)
+    service_types = classify_batch(item["description"] for item in items)
+
+    # Gruppen-Key -> Indizes der Items, die dasselbe Ergebnis bekommen
+    groups = {}
+    for index, (item, service_type) in enumerate(zip(items, service_types)):
+        profile = profiles.get(item["user_id"])
+        if not profile:
+            yield {"index": index, "user_id": item["user_id"], "success": False,
+                   "error": PROFILE_NOT_FOUND, "contacts": []}
+            continue
+        full_street, postal_code, city = _address(profile)
+        if not full_street or not postal_code:
+            yield {"index": index, "user_id": item["user_id"], "success": False,
+                   "error": INCOMPLETE_ADDRESS, "contacts": []}
+            continue
+        key = contact_cache_key(full_street, postal_code, service_type, item["radius_km"])
+        groups.setdefault(key, []).append(index)
+
+    print(f"📦 Batch: {len(items)} items, {len(profiles)} profiles, {len(groups)} groups")
+    group_slots = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+    async def resolve(indices: list) -> tuple:
+        first = items[indices[0]]
+        profile = profiles[first["user_id"]]
+        full_street, postal_code, city = _address(profile)
+        lat, lon = coords.get(first["user_id"]) or (None, None)
+        async with group_slots:
+            try:
+                contacts = await getcontactinfo_async(
+                    street=full_street,
+                    postal_code=postal_code,
+                    description=first["description"],
+                    radius_km=first["radius_km"],
+                    limiter=_llm_slots,
+                    lat=lat,
+                    lon=lon
+                )
+            except asyncio.TimeoutError:
+                return indices, {"success": False, "error": SEARCH_TIMED_OUT, "contacts": []}
+            except asyncio.CancelledError:
+                if asyncio.current_task().cancelling():
+                    # Der Stream selbst wird beendet
+                    raise
+                # Nur die geteilte Berechnung wurde abgebrochen -> Fehler für diese Gruppe
+                print(f"❌ Batch group {postal_code} canceled")
+                return indices, {"success": False, "error": SEARCH_CANCELED, "contacts": []}
+            except Exception as e:
+                print(f"❌ Error in batch group {postal_code}: {e}")
+                return indices, {"success": False, "error": str(e), "contacts": []}
+        return indices, {
+            "success": True,
+            "contacts": contacts,
+            "metadata": {
+                "location": f"{full_street}, {postal_code} {city}",
+                "radius_km": first["radius_km"],
+                "count": len(contacts)
+            }
+        }
+
+    tasks = [asyncio.create_task(resolve(indices)) for indices in groups.values()]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            indices, result = await next_done
+            for index in indices:
+                yield {"index": index, "user_id": items[index]["user_id"], **result}
+    finally:
+        # Client hat abgebrochen -> nicht mehr auf offene Gruppen warten. Die
+        # Suche selbst läuft im Single-Flight Task des Caches weiter, falls
+        # eine andere Anfrage auf denselben Key wartet.
+        for task in tasks:
+            task.cancel()
+
+
 # Test-Funktion
 if __name__ == "__main__":
     import asyncio
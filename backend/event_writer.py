@@ -0,0 +1,175 @@
+"""
+Gepufferter Writer für requests.status und die events Tabelle
+Statt einer Supabase-Schreiboperation pro Zustandswechsel wird gesammelt
+und periodisch geschrieben: alle Events als ein Bulk-Insert, Status pro
+Request zusammengefasst (nur der neueste zählt).
+
+Das SSE-Delta geht sofort raus, unabhängig davon, wann geschrieben wird.
+"""
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from clients.registry import get_supabase_client
+from backend.request_events import event_bus
+
+
+FLUSH_INTERVAL = float(os.getenv("EVENT_WRITER_FLUSH_SECONDS", "1.0"))
+MAX_BATCH = int(os.getenv("EVENT_WRITER_MAX_BATCH", "500"))
+MAX_PENDING = int(os.getenv("EVENT_WRITER_MAX_PENDING", "10000"))
+
+
+class EventWriter:
+    """
+    record_event() / set_status() sind thread-safe und blockieren nie auf Supabase
+
+    Ein Hintergrund-Thread schreibt alle FLUSH_INTERVAL Sekunden oder sobald
+    MAX_BATCH Events anstehen. Schlägt ein Flush fehl, bleibt alles für den
+    nächsten Versuch liegen (Events bis MAX_PENDING, ältere werden verworfen).
+    """
+
+    def __init__(self, flush_interval: float = FLUSH_INTERVAL, max_batch: int = MAX_BATCH):
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self._events: List[dict] = []
+        # request_id -> (order, fields), höhere order gewinnt
+        self._statuses: Dict[str, Tuple[float, dict]] = {}
+        # Zuletzt angenommene order pro Request, auch über Flushes hinweg
+        self._last_order: "OrderedDict[str, float]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        self.events_written = 0
+        self.status_writes = 0
+        self.status_coalesced = 0
+        self.flush_errors = 0
+
+    def record_event(self, request_id: str, event_type: str, message: str) -> dict:
+        """Neues Event für die Timeline, ID und Zeitstempel werden hier vergeben"""
+        event = {
+            "id": str(uuid.uuid4()),
+            "request_id": request_id,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "type": event_type,
+            "message": message,
+        }
+        with self._lock:
+            self._events.append(event)
+            if len(self._events) > MAX_PENDING:
+                del self._events[:len(self._events) - MAX_PENDING]
+            full = len(self._events) >= self.max_batch
+        event_bus.publish_event(request_id, event)
+        if full:
+            self._wake.set()
+        return event
+
+    def set_status(self, request_id: str, status: str, order: Optional[float] = None, **fields):
+        """
+        Status eines Requests setzen (wird mit späteren Updates zusammengefasst)
+
+        Args:
+            order: Zeitpunkt des Updates als Epoch-Sekunden (Default: jetzt),
+                ältere Updates, die zu spät ankommen, werden ignoriert
+        """
+        order = order if order is not None else datetime.now(timezone.utc).timestamp()
+        update = {"status": status, **fields}
+        with self._lock:
+            if self._last_order.get(request_id, float("-inf")) > order:
+                return
+            self._last_order[request_id] = order
+            self._last_order.move_to_end(request_id)
+            while len(self._last_order) > MAX_PENDING:
+                self._last_order.popitem(last=False)
+            if request_id in self._statuses:
+                self.status_coalesced += 1
+            self._statuses[request_id] = (order, update)
+        event_bus.publish_status(request_id, status, **fields)
+
+    def flush(self):
+        with self._lock:
+            events, self._events = self._events, []
+            statuses, self._statuses = self._statuses, {}
+        if not events and not statuses:
+            return
+
+        written = 0
+        try:
+            supabase = get_supabase_client()
+            while written < len(events):
+                batch = events[written:written + self.max_batch]
+                supabase.table("events").insert(batch).execute()
+                written += len(batch)
+                self.events_written += len(batch)
+        except Exception as e:
+            self.flush_errors += 1
+            print(f"❌ Event writer flush failed: {e}")
+            # Bereits geschriebene Batches nicht nochmal einfügen
+            self._requeue(events[written:], statuses)
+            return
+
+        # Gleiche Updates (z.B. viele Requests -> 'calling') als eine Query
+        grouped: Dict[tuple, List[str]] = {}
+        for request_id, (_, update) in statuses.items():
+            key = tuple(sorted(update.items()))
+            grouped.setdefault(key, []).append(request_id)
+        failed = {}
+        for key, request_ids in grouped.items():
+            update = dict(key)
+            update["updated_at"] = datetime.now(timezone.utc).isoformat()
+            try:
+                supabase.table("requests").update(update).in_("id", request_ids).execute()
+                self.status_writes += 1
+            except Exception as e:
+                self.flush_errors += 1
+                print(f"❌ Status update failed for {len(request_ids)} requests: {e}")
+                failed.update({request_id: statuses[request_id] for request_id in request_ids})
+        if failed:
+            self._requeue([], failed)
+
+    def _requeue(self, events: List[dict], statuses: Dict[str, Tuple[float, dict]]):
+        with self._lock:
+            self._events = (events + self._events)[-MAX_PENDING:]
+            for request_id, entry in statuses.items():
+                # Neuere Updates, die inzwischen kamen, haben Vorrang
+                current = self._statuses.get(request_id)
+                if current is None or current[0] < entry[0]:
+                    self._statuses[request_id] = entry
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+        self.flush()
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="event-writer", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 10.0):
+        """Letzter Flush, damit beim Shutdown nichts verloren geht"""
+        self._stopped.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "pending_events": len(self._events),
+                "pending_statuses": len(self._statuses),
+                "events_written": self.events_written,
+                "status_writes": self.status_writes,
+                "status_coalesced": self.status_coalesced,
+                "flush_errors": self.flush_errors,
+            }
+
+
+event_writer = EventWriter()
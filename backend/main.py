@@ -1,22 +1,36 @@
 from __future__ import annotations
 
 import asyncio
+import json
 import time
+import urllib.parse
 from datetime import datetime, timedelta, time as dtime
 import os
 import sys
 from pathlib import Path
-from typing import Optional
+from typing import List, Literal, Optional
 
 # Füge das Root-Verzeichnis zum Python-Pfad hinzu, damit 'twillio' gefunden wird
 sys.path.append(str(Path(__file__).resolve().parent.parent))
 
 from dotenv import load_dotenv
-from fastapi import FastAPI, HTTPException, BackgroundTasks
+from fastapi import FastAPI, HTTPException, BackgroundTasks, Cookie, Header, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response, StreamingResponse
 from pydantic import BaseModel, Field
 from twillio.start_call import start_call
-from backend.contact_suggestions import get_contact_suggestions
+from twillio.dialer import get_dialer
+from twillio.opener_store import prepare_opener
+from backend.contact_suggestions import get_contact_suggestions, get_contact_suggestions_batch
+from clients.registry import prewarm_async
+from backend.call_queue import CallDispatcher, get_call_queue
+from backend.request_events import event_bus, format_sse
+from backend.event_writer import event_writer
+from backend.call_status import handle_status_callback, is_valid_signature, public_url
+from backend.stream_auth import ACCESS_TOKEN_COOKIE, StreamAccessError, authorize_stream
+from llmcall_method.lookup_cache import contact_cache
+from llmcall_method.records import invalidate_profile, invalidate_request, profile_cache, request_cache
+from llmcall_method.geocoder import load_geocoder_async, user_locations
 
 load_dotenv()
 
@@ -51,6 +65,8 @@ class ProcessRequestPayload(BaseModel):
     number_to_call: Optional[str] = None
     preferred_time: str = Field(..., min_length=1)
     user_profile: Optional[UserProfile] = None
+    # None -> CALL_MODE des Servers (Default gather)
+    call_mode: Optional[Literal["gather", "stream"]] = None
 
 
 class ProcessRequestResponse(BaseModel):
@@ -64,6 +80,10 @@ class ContactSuggestionsPayload(BaseModel):
     radius_km: int = Field(default=10, ge=5, le=20)
 
 
+class ContactSuggestionsBatchPayload(BaseModel):
+    items: List[ContactSuggestionsPayload] = Field(..., min_length=1, max_length=1000)
+
+
 class ContactSuggestionsResponse(BaseModel):
     success: bool
     contacts: list
@@ -71,6 +91,51 @@ class ContactSuggestionsResponse(BaseModel):
     error: Optional[str] = None
 
 
+class CacheInvalidatePayload(BaseModel):
+    user_id: Optional[str] = None
+    request_id: Optional[str] = None
+
+
+dispatcher: Optional[CallDispatcher] = None
+
+
+@app.on_event("startup")
+async def warm_clients() -> None:
+    # TLS-Verbindungen zu Gemini/Supabase/Twilio vorab öffnen
+    prewarm_async()
+
+
+@app.on_event("startup")
+async def load_geocoder() -> None:
+    # PLZ-Tabelle per mmap öffnen (bzw. einmalig bauen), ohne den ersten Request zu blockieren
+    load_geocoder_async()
+
+
+@app.on_event("startup")
+async def start_dispatcher() -> None:
+    # Ein Timer für alle geplanten Anrufe (überlebt Restarts, da in SQLite)
+    global dispatcher
+    dispatcher = CallDispatcher(get_call_queue(), dispatch_scheduled_call)
+    dispatcher.start()
+
+
+@app.on_event("startup")
+async def start_event_writer() -> None:
+    event_writer.start()
+
+
+@app.on_event("shutdown")
+async def stop_dispatcher() -> None:
+    if dispatcher is not None:
+        await dispatcher.stop()
+
+
+@app.on_event("shutdown")
+async def stop_event_writer() -> None:
+    # Letzter Flush, ausstehende Events/Status nicht verlieren
+    await asyncio.to_thread(event_writer.stop)
+
+
 @app.get("/health")
 def health_check() -> dict:
     return {"status": "ok"}
@@ -95,6 +160,120 @@ async def get_contact_suggestions_endpoint(payload: ContactSuggestionsPayload) -
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/api/get-contact-suggestions/batch")
+async def get_contact_suggestions_batch_endpoint(payload: ContactSuggestionsBatchPayload) -> StreamingResponse:
+    """
+    Kontakt-Vorschläge für viele User (z.B. Onboarding-Import)
+    Antwortet als NDJSON, eine Zeile pro Item, in der Reihenfolge der Fertigstellung
+    """
+    items = [item.model_dump() for item in payload.items]
+
+    async def lines():
+        async for result in get_contact_suggestions_batch(items):
+            yield json.dumps(result, ensure_ascii=False) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+@app.get("/api/contact-cache")
+async def contact_cache_status() -> dict:
+    return contact_cache.stats()
+
+
+@app.post("/api/cache/invalidate")
+async def invalidate_cache(payload: CacheInvalidatePayload) -> dict:
+    """
+    Vom Frontend nach einem Profil- bzw. Request-Update aufgerufen
+    """
+    if not payload.user_id and not payload.request_id:
+        raise HTTPException(status_code=400, detail="user_id or request_id required")
+    if payload.user_id:
+        invalidate_profile(payload.user_id)
+        user_locations.invalidate(payload.user_id)
+    if payload.request_id:
+        invalidate_request(payload.request_id)
+    return {"status": "ok"}
+
+
+@app.get("/api/record-cache")
+async def record_cache_status() -> dict:
+    return {"profiles": profile_cache.stats(), "requests": request_cache.stats()}
+
+
+@app.get("/api/requests/{request_id}/stream")
+async def stream_request_updates(
+    request_id: str,
+    last_event_id: Optional[str] = Header(default=None, alias="Last-Event-ID"),
+    access_token: Optional[str] = Query(default=None),
+    cookie_token: Optional[str] = Cookie(default=None, alias=ACCESS_TOKEN_COOKIE),
+) -> StreamingResponse:
+    """
+    Server-Sent Events für einen Request: nur Deltas (Status-Wechsel, neue Events)
+    EventSource schickt beim Reconnect automatisch Last-Event-ID mit.
+
+    Nur für den Besitzer des Requests: Supabase Access Token als ?access_token=
+    oder Cookie, da EventSource keine Authorization-Header setzen kann.
+
+    Achtung, nur mit einem Worker betreiben: event_bus ist In-Process, Events
+    aus anderen Workern (Status-Callback, Dispatcher) kämen hier nie an.
+    """
+    try:
+        await asyncio.to_thread(authorize_stream, request_id, access_token or cookie_token)
+    except StreamAccessError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+
+    try:
+        resume_after = int(last_event_id) if last_event_id else None
+    except ValueError:
+        resume_after = None
+
+    async def messages():
+        async for message in event_bus.subscribe(request_id, resume_after):
+            yield format_sse(message)
+
+    return StreamingResponse(
+        messages(),
+        media_type="text/event-stream",
+        # Proxies (nginx) sollen nicht puffern
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.get("/api/request-streams")
+async def request_stream_status() -> dict:
+    return event_bus.stats()
+
+
+@app.post("/api/twilio/status")
+async def twilio_status_callback(request: Request, request_id: Optional[str] = None) -> Response:
+    """
+    Status-Callback von Twilio (initiated, ringing, answered, completed)
+    Twilio schickt application/x-www-form-urlencoded, signiert mit X-Twilio-Signature
+    """
+    body = (await request.body()).decode("utf-8")
+    params = {key: values[-1] for key, values in urllib.parse.parse_qs(body).items()}
+    url = public_url(request.url.path, request.url.query, str(request.url))
+    if not is_valid_signature(url, params, request.headers.get("X-Twilio-Signature")):
+        raise HTTPException(status_code=403, detail="Invalid Twilio signature")
+    handle_status_callback(request_id, params)
+    return Response(status_code=204)
+
+
+@app.get("/api/event-writer")
+async def event_writer_status() -> dict:
+    return event_writer.stats()
+
+
+@app.get("/api/dialer")
+async def dialer_status() -> dict:
+    return get_dialer().stats()
+
+
+@app.get("/api/call-queue")
+async def call_queue_status() -> dict:
+    return await asyncio.to_thread(get_call_queue().counts)
+
+
 @app.post("/api/process-request", response_model=ProcessRequestResponse)
 async def process_request(payload: ProcessRequestPayload, background_tasks: BackgroundTasks) -> ProcessRequestResponse:
     if not payload.request_id or not payload.user_id:
@@ -106,32 +285,70 @@ async def process_request(payload: ProcessRequestPayload, background_tasks: Back
         request_id=payload.request_id,
         number=payload.number_to_call,
         title=payload.title,
-        description=payload.description
+        description=payload.description,
+        call_mode=payload.call_mode,
     )
     
     return ProcessRequestResponse(status="accepted", request_id=payload.request_id)
 
 
-async def start_new_call(request_id, number=None, title=None, description=None):
+async def start_new_call(request_id, number=None, title=None, description=None, call_mode=None):
     """
     Startet den Anruf asynchron. Wenn wir außerhalb der Geschäftszeiten sind,
-    wartet diese Funktion (non-blocking) bis zur nächsten Startzeit.
+    wird der Anruf in die persistente Queue gelegt und vom Dispatcher
+    zur nächsten Startzeit gewählt.
     """
     if is_business_hours():
-        start_call(number=number, request_id=request_id, title=title, description=description)
+        await prepare_opener_before_dial(request_id, title, description)
+        future = start_call(number=number, request_id=request_id, title=title, description=description, mode=call_mode)
+        future.add_done_callback(lambda done: record_dial_failure(request_id, done))
         return
 
     run_at = next_business_datetime()
-    delay_seconds = max(0, (run_at - datetime.now()).total_seconds())
-    
-    if delay_seconds > 0:
-        print(f"Außerhalb der Geschäftszeiten. Warte {delay_seconds:.0f} Sekunden ...")
-        # asyncio.sleep blockiert den Server NICHT. time.sleep würde alles anhalten.
-        await asyncio.sleep(delay_seconds)
+    payload = {"number": number, "title": title, "description": description, "call_mode": call_mode}
+    queued = await asyncio.to_thread(get_call_queue().enqueue, request_id, payload, run_at)
+    if queued:
+        print(f"Außerhalb der Geschäftszeiten. Anruf eingeplant für {run_at:%Y-%m-%d %H:%M}.")
+        event_writer.set_status(request_id, "outside_business_hours")
+        event_writer.record_event(request_id, "scheduled", f"Call scheduled for {run_at:%Y-%m-%d %H:%M}")
+    if dispatcher is not None:
+        dispatcher.notify()
+
+
+def record_dial_failure(request_id, future):
+    """Scheitert schon das Wählen, kommt kein Status-Callback -> selbst eintragen"""
+    if future.exception() is not None:
+        event_writer.record_event(request_id, "call", f"Dialing failed: {future.exception()}")
+        event_writer.set_status(request_id, "failed")
+
+
+async def dispatch_scheduled_call(job: dict):
+    """Handler des Dispatchers für einen fälligen Job"""
+    request_id = job["request_id"]
+    payload = job["payload"]
+    print(f"Geschäftszeit erreicht. Starte Anruf für {request_id} jetzt.")
+    await prepare_opener_before_dial(request_id, payload.get("title"), payload.get("description"))
+    # Erst wenn der Dialer gewählt hat, gilt der Job als erledigt
+    await asyncio.wrap_future(start_call(
+        number=payload.get("number"),
+        request_id=request_id,
+        title=payload.get("title"),
+        description=payload.get("description"),
+        mode=payload.get("call_mode"),
+    ))
+
+
+async def prepare_opener_before_dial(request_id, title=None, description=None):
+    """
+    Erzeugt Eröffnungstext + Audio, bevor gewählt wird, damit /voice
+    nur noch abspielt. Schlägt das fehl, generiert /voice wie bisher live.
+    """
+    try:
+        # LLM + TTS blockieren -> im Thread, damit der Event Loop frei bleibt
+        await asyncio.to_thread(prepare_opener, request_id, title, description)
+    except Exception as e:
+        print(f"⚠️ Opener konnte nicht vorberechnet werden: {e}")
 
-    print("Geschäftszeit erreicht. Starte Anruf jetzt.")
-    start_call(number=number, request_id=request_id, title=title, description=description)
-        
 
 
 def is_business_hours():
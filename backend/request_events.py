@@ -0,0 +1,143 @@
+"""
+In-Process Pub/Sub für Request-Updates (Status-Wechsel und neue Events)
+Eine Änderung wird einmal veröffentlicht und an alle offenen SSE-Streams
+dieses request_id verteilt. Pro Request bleiben die letzten Nachrichten im
+Ringpuffer, damit ein Reconnect mit Last-Event-ID nichts verpasst.
+"""
+import asyncio
+import itertools
+import json
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import AsyncIterator, List, Optional, Tuple
+
+
+REPLAY_BUFFER = int(os.getenv("REQUEST_STREAM_BUFFER", "200"))
+MAX_CHANNELS = int(os.getenv("REQUEST_STREAM_MAX_CHANNELS", "5000"))
+HEARTBEAT_SECONDS = float(os.getenv("REQUEST_STREAM_HEARTBEAT", "15"))
+SUBSCRIBER_QUEUE_SIZE = 500
+
+
+class _Channel:
+    def __init__(self):
+        self.buffer: deque = deque(maxlen=REPLAY_BUFFER)
+        self.subscribers: List[Tuple[asyncio.AbstractEventLoop, asyncio.Queue]] = []
+
+
+class RequestEventBus:
+    """
+    Nachrichten: {"id": int, "type": "status" | "event" | "resync", "data": dict}
+
+    IDs sind prozessweit aufsteigend und starten bei der aktuellen Zeit in µs,
+    damit sie auch nach einem Neustart größer sind als alles, was ein Client
+    schon gesehen hat. publish() ist thread-safe.
+    """
+
+    def __init__(self):
+        self._ids = itertools.count(time.time_ns() // 1000)
+        self._channels: "OrderedDict[str, _Channel]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _channel_locked(self, request_id: str) -> _Channel:
+        channel = self._channels.get(request_id)
+        if channel is None:
+            channel = self._channels[request_id] = _Channel()
+            self._evict_locked()
+        self._channels.move_to_end(request_id)
+        return channel
+
+    def _evict_locked(self):
+        # Älteste Kanäle ohne Zuhörer zuerst verwerfen
+        for request_id in list(self._channels):
+            if len(self._channels) <= MAX_CHANNELS:
+                break
+            if not self._channels[request_id].subscribers:
+                del self._channels[request_id]
+
+    def publish(self, request_id: str, message_type: str, data: dict) -> dict:
+        with self._lock:
+            message = {"id": next(self._ids), "type": message_type, "data": data}
+            channel = self._channel_locked(request_id)
+            channel.buffer.append(message)
+            subscribers = list(channel.subscribers)
+        for loop, queue in subscribers:
+            loop.call_soon_threadsafe(_offer, queue, message)
+        return message
+
+    def publish_status(self, request_id: str, status: str, **fields) -> dict:
+        return self.publish(request_id, "status", {"status": status, **fields})
+
+    def publish_event(self, request_id: str, event: dict) -> dict:
+        return self.publish(request_id, "event", event)
+
+    def _subscribe(self, request_id: str, last_event_id: Optional[int]) -> Tuple[asyncio.Queue, List[dict]]:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        with self._lock:
+            channel = self._channel_locked(request_id)
+            channel.subscribers.append((asyncio.get_running_loop(), queue))
+            buffered = list(channel.buffer)
+
+        if last_event_id is None:
+            # Erstverbindung: Client hat gerade einen Snapshot geladen, alles Gepufferte
+            # nachliefern (Client dedupliziert Events per id)
+            return queue, buffered
+        replay = [message for message in buffered if message["id"] > last_event_id]
+        overflowed = len(buffered) == REPLAY_BUFFER and buffered[0]["id"] > last_event_id
+        if not buffered or overflowed:
+            # Puffer leer (z.B. nach Neustart) oder übergelaufen -> Client soll neu laden
+            replay.insert(0, {"id": buffered[-1]["id"] if buffered else last_event_id, "type": "resync", "data": {}})
+        return queue, replay
+
+    def _unsubscribe(self, request_id: str, queue: asyncio.Queue):
+        with self._lock:
+            channel = self._channels.get(request_id)
+            if channel is not None:
+                channel.subscribers = [(l, q) for l, q in channel.subscribers if q is not queue]
+
+    async def subscribe(self, request_id: str, last_event_id: Optional[int] = None) -> AsyncIterator[Optional[dict]]:
+        """
+        Nachrichten für einen Request, beginnend nach last_event_id
+
+        Yields:
+            Nachricht oder None als Heartbeat (alle HEARTBEAT_SECONDS ohne Verkehr)
+        """
+        queue, replay = self._subscribe(request_id, last_event_id)
+        try:
+            for message in replay:
+                yield message
+            while True:
+                try:
+                    yield await asyncio.wait_for(queue.get(), timeout=HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield None
+        finally:
+            self._unsubscribe(request_id, queue)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "channels": len(self._channels),
+                "subscribers": sum(len(c.subscribers) for c in self._channels.values()),
+            }
+
+
+def _offer(queue: asyncio.Queue, message: dict):
+    try:
+        queue.put_nowait(message)
+    except asyncio.QueueFull:
+        # Langsamer Client: statt unbegrenzt zu puffern neu laden lassen
+        while not queue.empty():
+            queue.get_nowait()
+        queue.put_nowait({"id": message["id"], "type": "resync", "data": {}})
+
+
+def format_sse(message: Optional[dict]) -> str:
+    """Nachricht -> text/event-stream Block (None -> Kommentar als Heartbeat)"""
+    if message is None:
+        return ": keepalive\n\n"
+    return f"id: {message['id']}\nevent: {message['type']}\ndata: {json.dumps(message['data'], ensure_ascii=False, default=str)}\n\n"
+
+
+event_bus = RequestEventBus()
@@ -0,0 +1,66 @@
+"""
+Zugriffsprüfung für den SSE-Stream eines Requests
+EventSource kann keine Header setzen, deshalb kommt das Supabase Access
+Token als Query-Parameter (access_token) oder Cookie (sb-access-token).
+Der Stream wird nur geöffnet, wenn der Request dem User des Tokens gehört.
+"""
+import sys
+from pathlib import Path
+from typing import Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from clients.registry import get_supabase_client
+
+
+ACCESS_TOKEN_COOKIE = "sb-access-token"
+
+
+class StreamAccessError(Exception):
+    """Zugriff verweigert, status_code ist der HTTP Status für die Antwort"""
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+def _user_id_for_token(access_token: str) -> Optional[str]:
+    try:
+        response = get_supabase_client().auth.get_user(access_token)
+    except Exception:
+        # Abgelaufene oder gefälschte Tokens wirft supabase als AuthApiError
+        return None
+    user = getattr(response, "user", None)
+    return getattr(user, "id", None)
+
+
+def _request_owner(request_id: str) -> Optional[str]:
+    response = (
+        get_supabase_client().table("requests").select("user_id").eq("id", request_id).execute()
+    )
+    return response.data[0].get("user_id") if response.data else None
+
+
+def authorize_stream(request_id: str, access_token: Optional[str]) -> str:
+    """
+    Blockierend (Supabase Roundtrips), im Handler per asyncio.to_thread aufrufen
+
+    Returns:
+        user_id des Token-Inhabers
+
+    Raises:
+        StreamAccessError: 401 ohne/ungültiges Token, 404 unbekannter Request,
+            403 wenn der Request einem anderen User gehört
+    """
+    if not access_token:
+        raise StreamAccessError(401, "access token required")
+    user_id = _user_id_for_token(access_token)
+    if not user_id:
+        raise StreamAccessError(401, "invalid access token")
+    owner = _request_owner(request_id)
+    if owner is None:
+        raise StreamAccessError(404, "request not found")
+    if owner != user_id:
+        raise StreamAccessError(403, "request belongs to another user")
+    return user_id
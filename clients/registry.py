@@ -0,0 +1,161 @@
+"""
+Prozessweite Client-Registry für ElevenLabs, Gemini, Supabase und Twilio
+Jeder Client wird einmal gebaut und hält seinen Keep-Alive Connection Pool
+"""
+import os
+import threading
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+HTTP_TIMEOUT_SECONDS = float(os.getenv("HTTP_TIMEOUT_SECONDS", "30"))
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "50"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "20"))
+
+_clients = {}
+_lock = threading.RLock()
+_gemini_configured = False
+
+
+def _get_or_create(key, factory):
+    client = _clients.get(key)
+    if client is None:
+        with _lock:
+            client = _clients.get(key)
+            if client is None:
+                client = factory()
+                _clients[key] = client
+    return client
+
+
+def get_elevenlabs_client():
+    def create():
+        import httpx
+        from elevenlabs.client import ElevenLabs
+
+        api_key = os.getenv("meinapitoken") or os.getenv("ELEVENLABS_API_TOKEN")
+        if not api_key:
+            raise ValueError("ElevenLabs API token (meinapitoken) is not set in environment variables.")
+        http_client = httpx.Client(
+            timeout=HTTP_TIMEOUT_SECONDS,
+            limits=httpx.Limits(
+                max_connections=HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+            ),
+        )
+        _clients["elevenlabs_http"] = http_client
+        return ElevenLabs(api_key=api_key, httpx_client=http_client)
+
+    return _get_or_create("elevenlabs", create)
+
+
+def _configure_gemini():
+    global _gemini_configured
+    if _gemini_configured:
+        return
+    import google.generativeai as genai
+
+    api_key = os.environ.get("GOOGLE_API_KEY")
+    if not api_key:
+        raise ValueError("GOOGLE_API_KEY is not set in environment variables.")
+    genai.configure(api_key=api_key)
+    _gemini_configured = True
+
+
+def get_gemini_model(model_name="gemini-2.5-flash", **kwargs):
+    """
+    GenerativeModel pro (Modellname, Optionen) nur einmal bauen
+
+    Args:
+        model_name: z.B. 'gemini-2.5-flash'
+        kwargs: weitere GenerativeModel Parameter (z.B. system_instruction)
+    """
+    def create():
+        import google.generativeai as genai
+
+        _configure_gemini()
+        return genai.GenerativeModel(model_name, **kwargs)
+
+    key = ("gemini", model_name, repr(sorted(kwargs.items())))
+    return _get_or_create(key, create)
+
+
+def get_supabase_client():
+    def create():
+        from supabase import create_client
+
+        url = os.environ.get("NEXT_PUBLIC_SUPABASE_URL")
+        key = os.environ.get("NEXT_PUBLIC_SUPABASE_ANON_KEY")
+        if not url or not key:
+             # Fallback to standard env vars if NEXT_PUBLIC aliases are not used
+            url = os.environ.get("SUPABASE_URL")
+            key = os.environ.get("SUPABASE_KEY")
+
+        if not url or not key:
+            raise ValueError("Supabase URL or Key not set in environment variables.")
+        return create_client(url, key)
+
+    return _get_or_create("supabase", create)
+
+
+def get_twilio_client():
+    def create():
+        from twilio.http.http_client import TwilioHttpClient
+        from twilio.rest import Client
+
+        http_client = TwilioHttpClient(pool_connections=True, timeout=HTTP_TIMEOUT_SECONDS)
+        client = Client(
+            os.getenv('TWILIO_ACCOUNT_SID'),
+            os.getenv('TWILIO_AUTH_TOKEN'),
+            http_client=http_client,
+        )
+        # Lokaler Stand-in (twillio/test/fake_twilio.py) statt api.twilio.com
+        base_url = os.getenv("TWILIO_API_BASE_URL")
+        if base_url:
+            client.api.base_url = base_url.rstrip("/")
+        return client
+
+    return _get_or_create("twilio", create)
+
+
+def prewarm():
+    """
+    Baut alle Clients und öffnet je eine TLS-Verbindung vorab,
+    damit der erste Gesprächs-Turn keinen Handshake mehr bezahlt
+    """
+    def warm(name, fn):
+        try:
+            fn()
+            print(f"🔥 {name} client warm")
+        except Exception as e:
+            print(f"⚠️ Prewarm {name} failed: {e}")
+
+    def elevenlabs():
+        get_elevenlabs_client()
+        _clients["elevenlabs_http"].head("https://api.elevenlabs.io")
+
+    def gemini():
+        import google.generativeai as genai
+
+        get_gemini_model()
+        genai.get_model("models/gemini-2.5-flash")
+
+    def supabase():
+        get_supabase_client().table('profiles').select('user_id').limit(1).execute()
+
+    def twilio():
+        client = get_twilio_client()
+        client.http_client.session.head("https://api.twilio.com")
+
+    for name, fn in [("ElevenLabs", elevenlabs), ("Gemini", gemini), ("Supabase", supabase), ("Twilio", twilio)]:
+        warm(name, fn)
+
+
+def prewarm_async():
+    """Prewarm im Hintergrund, wenn PREWARM_CLIENTS nicht auf 0 steht"""
+    if os.getenv("PREWARM_CLIENTS", "1") == "0":
+        return None
+    thread = threading.Thread(target=prewarm, name="client-prewarm", daemon=True)
+    thread.start()
+    return thread
@@ -105,6 +105,18 @@ export default function ProfilePage() {
 
       if (error) throw error;
 
+      // Backend caches profiles; drop the stale copy so suggestions use the new address
+      const backendUrl = process.env.NEXT_PUBLIC_BACKEND_URL;
+      if (backendUrl) {
+        fetch(`${backendUrl}/api/cache/invalidate`, {
+          method: "POST",
+          headers: {
+            "Content-Type": "application/json",
+          },
+          body: JSON.stringify({ user_id: profile.user_id }),
+        }).catch((err) => console.error("Failed to invalidate profile cache", err));
+      }
+
       toast.success("Profile saved successfully!");
       setIsEditing(false);
       // Reload profile to get fresh data
@@ -1,6 +1,6 @@
 'use client';
 
-import { useEffect, useState } from 'react';
+import { useEffect, useRef, useState } from 'react';
 import { useRouter, useParams } from 'next/navigation';
 import { supabase } from '@/lib/supabase';
 import { Request, Event } from '@/lib/types';
@@ -13,6 +13,13 @@ import { Timeline } from '@/components/timeline';
 import { ArrowLeft, Phone, MapPin, Calendar, AlertCircle, Trash2, Loader2 } from 'lucide-react';
 import { toast } from 'sonner';
 
+// Neue Events vorne einsortieren, schon bekannte (gleiche id) ignorieren
+function mergeEvents(events: Event[], incoming: Event[]): Event[] {
+  const known = new Set(events.map((event) => event.id));
+  const fresh = incoming.filter((event) => !known.has(event.id));
+  return fresh.length ? [...fresh.reverse(), ...events] : events;
+}
+
 export default function RequestDetailPage() {
   const router = useRouter();
   const params = useParams();
@@ -23,16 +30,54 @@ export default function RequestDetailPage() {
   const [loading, setLoading] = useState(true);
   const [deleting, setDeleting] = useState(false);
   const [showDeleteConfirm, setShowDeleteConfirm] = useState(false);
+  // Deltas seit Beginn des letzten Snapshot-Ladens: der Snapshot kann älter sein
+  // als sie (oder request noch null) -> nach dem Laden erneut anwenden
+  const deltas = useRef<{ status: Partial<Request>; events: Event[] }>({ status: {}, events: [] });
 
   useEffect(() => {
     fetchRequestData();
 
-    // Polling alle 3 Sekunden
-    const interval = setInterval(() => {
-      fetchRequestData(true);
-    }, 3000);
+    const backendUrl = process.env.NEXT_PUBLIC_BACKEND_URL;
+    if (!backendUrl) {
+      // Kein Backend konfiguriert -> Polling alle 3 Sekunden
+      const interval = setInterval(() => {
+        fetchRequestData(true);
+      }, 3000);
+      return () => clearInterval(interval);
+    }
 
-    return () => clearInterval(interval);
+    // Server-Push: nur Deltas, EventSource reconnectet selbst mit Last-Event-ID.
+    // EventSource kann keine Header setzen -> Access Token als Query-Parameter
+    let source: EventSource | null = null;
+    let closed = false;
+
+    supabase.auth.getSession().then(({ data: { session } }) => {
+      if (closed || !session) return;
+      const token = encodeURIComponent(session.access_token);
+      source = new EventSource(`${backendUrl}/api/requests/${requestId}/stream?access_token=${token}`);
+
+      source.addEventListener('status', (e) => {
+        const update = JSON.parse((e as MessageEvent).data);
+        deltas.current.status = { ...deltas.current.status, ...update };
+        setRequest((prev) => (prev ? { ...prev, ...update } : prev));
+      });
+
+      source.addEventListener('event', (e) => {
+        const event: Event = JSON.parse((e as MessageEvent).data);
+        deltas.current.events.push(event);
+        setEvents((prev) => mergeEvents(prev, [event]));
+      });
+
+      // Verpasste Deltas (Server-Neustart, Puffer übergelaufen) -> einmal neu laden
+      source.addEventListener('resync', () => {
+        fetchRequestData(true);
+      });
+    });
+
+    return () => {
+      closed = true;
+      source?.close();
+    };
   }, [requestId]);
 
   const handleDelete = async () => {
@@ -58,6 +103,8 @@ export default function RequestDetailPage() {
   };
 
   const fetchRequestData = async (silent = false) => {
+    // Was ab jetzt per Stream kommt, ist evtl. nicht im Snapshot enthalten
+    deltas.current = { status: {}, events: [] };
     try {
       const { data: { user } } = await supabase.auth.getUser();
       
@@ -76,7 +123,7 @@ export default function RequestDetailPage() {
 
       if (requestError) throw requestError;
 
-      setRequest(requestData);
+      setRequest({ ...requestData, ...deltas.current.status });
 
       // Fetch events
       const { data: eventsData, error: eventsError } = await supabase
@@ -87,7 +134,7 @@ export default function RequestDetailPage() {
 
       if (eventsError) throw eventsError;
 
-      setEvents(eventsData || []);
+      setEvents(mergeEvents(eventsData || [], deltas.current.events));
     } catch (error: any) {
       if (!silent) {
         toast.error('Failed to load request');
@@ -0,0 +1,181 @@
+"""
+Streaming-STT-Stufe für Twilio Media Streams
+Bekommt die eingehenden μ-law Frames (8 kHz, 20 ms) eines Calls und meldet
+Sprachbeginn (für Barge-in) und fertige Äußerungen. Welche Engine die
+Äußerung in Text umwandelt, ist austauschbar (STT_ENGINE, register_recognizer).
+"""
+import io
+import os
+import wave
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from clients.registry import get_elevenlabs_client
+
+
+SAMPLE_RATE = 8000
+# STT_ENGINE wird erst beim Anlegen eines Recognizers gelesen (pro Call)
+DEFAULT_STT_ENGINE = "elevenlabs"
+STT_MODEL = os.getenv("STT_MODEL", "scribe_v1")
+STT_LANGUAGE = os.getenv("STT_LANGUAGE", "en")
+
+# RMS (16 bit) ab dem ein Frame als Sprache zählt, Telefon-Rauschen liegt meist < 300
+VAD_THRESHOLD = float(os.getenv("STT_VAD_THRESHOLD", "600"))
+# So lange muss gesprochen werden, damit es kein Knacken/Atmen ist
+MIN_SPEECH_MS = int(os.getenv("STT_MIN_SPEECH_MS", "120"))
+# So lange Stille beendet eine Äußerung
+END_SILENCE_MS = int(os.getenv("STT_END_SILENCE_MS", "600"))
+MAX_UTTERANCE_MS = int(os.getenv("STT_MAX_UTTERANCE_MS", "15000"))
+# Audio vor dem erkannten Sprachbeginn, damit der erste Laut nicht fehlt
+PREROLL_MS = 200
+
+
+def _ulaw_table() -> np.ndarray:
+    codes = ~np.arange(256, dtype=np.int32) & 0xFF
+    exponent = (codes >> 4) & 0x07
+    mantissa = codes & 0x0F
+    magnitude = (((mantissa << 3) + 0x84) << exponent) - 0x84
+    return np.where(codes & 0x80, -magnitude, magnitude).astype(np.int16)
+
+
+_ULAW_TO_PCM = _ulaw_table()
+
+
+def ulaw_to_pcm16(data: bytes) -> np.ndarray:
+    """G.711 μ-law -> 16 bit PCM"""
+    return _ULAW_TO_PCM[np.frombuffer(data, dtype=np.uint8)]
+
+
+def pcm16_to_ulaw(samples: np.ndarray) -> bytes:
+    """16 bit PCM -> G.711 μ-law"""
+    pcm = samples.astype(np.int32)
+    sign = np.where(pcm < 0, 0x80, 0)
+    # Auf 14 bit wie G.711, negative Werte runden dadurch Richtung -inf
+    magnitude = np.minimum(np.abs(pcm >> 2) << 2, 32635) + 0x84
+    exponent = np.floor(np.log2(magnitude)).astype(np.int32) - 7
+    mantissa = (magnitude >> (exponent + 3)) & 0x0F
+    return (~(sign | (exponent << 4) | mantissa) & 0xFF).astype(np.uint8).tobytes()
+
+
+def ulaw_to_wav(data: bytes) -> bytes:
+    """μ-law Äußerung -> WAV (16 bit PCM), das versteht jede STT-API"""
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(SAMPLE_RATE)
+        wav.writeframes(ulaw_to_pcm16(data).tobytes())
+    return buffer.getvalue()
+
+
+@dataclass
+class SpeechEvent:
+    """kind: 'start' (Gegenüber fängt an zu sprechen) oder 'end' (audio = ganze Äußerung)"""
+    kind: str
+    audio: bytes = b""
+
+
+class UtteranceSegmenter:
+    """Energie-basierte Endpunkt-Erkennung über die μ-law Frames"""
+
+    def __init__(self, threshold: float = VAD_THRESHOLD, min_speech_ms: int = MIN_SPEECH_MS,
+                 end_silence_ms: int = END_SILENCE_MS, max_utterance_ms: int = MAX_UTTERANCE_MS):
+        self.threshold = threshold
+        self.min_speech_ms = min_speech_ms
+        self.end_silence_ms = end_silence_ms
+        self.max_utterance_ms = max_utterance_ms
+        self.in_speech = False
+        self._frames: List[bytes] = []
+        self._voiced_ms = 0
+        self._silence_ms = 0
+        self._buffered_ms = 0
+
+    def accept(self, frame: bytes) -> Optional[SpeechEvent]:
+        duration_ms = len(frame) * 1000 // SAMPLE_RATE
+        samples = ulaw_to_pcm16(frame).astype(np.float32)
+        voiced = bool(samples.size) and float(np.sqrt(np.mean(samples * samples))) >= self.threshold
+
+        self._frames.append(frame)
+        self._buffered_ms += duration_ms
+
+        if not self.in_speech:
+            self._voiced_ms = self._voiced_ms + duration_ms if voiced else 0
+            # Nur den Vorlauf behalten
+            while self._buffered_ms - len(self._frames[0]) * 1000 // SAMPLE_RATE >= PREROLL_MS + self._voiced_ms:
+                self._buffered_ms -= len(self._frames.pop(0)) * 1000 // SAMPLE_RATE
+            if self._voiced_ms >= self.min_speech_ms:
+                self.in_speech = True
+                self._silence_ms = 0
+                return SpeechEvent("start")
+            return None
+
+        self._silence_ms = 0 if voiced else self._silence_ms + duration_ms
+        if self._silence_ms >= self.end_silence_ms or self._buffered_ms >= self.max_utterance_ms:
+            audio = b"".join(self._frames)
+            self.reset()
+            return SpeechEvent("end", audio)
+        return None
+
+    def reset(self):
+        self.in_speech = False
+        self._frames = []
+        self._voiced_ms = 0
+        self._silence_ms = 0
+        self._buffered_ms = 0
+
+
+class SpeechRecognizer(ABC):
+    """
+    Basisklasse einer STT-Engine, eine Instanz pro Call
+
+    accept() läuft für jeden Frame im Event Loop und muss billig bleiben.
+    transcribe() wird pro Äußerung in einem Thread aufgerufen. Eine echte
+    Streaming-Engine schickt die Frames schon in accept() weiter und liefert
+    in transcribe() nur noch ihr finales Ergebnis.
+    """
+
+    def __init__(self, segmenter: Optional[UtteranceSegmenter] = None):
+        self.segmenter = segmenter or UtteranceSegmenter()
+
+    def accept(self, frame: bytes) -> Optional[SpeechEvent]:
+        return self.segmenter.accept(frame)
+
+    @abstractmethod
+    def transcribe(self, audio: bytes) -> str:
+        """Ganze Äußerung (μ-law 8 kHz) -> Text, leer wenn nichts verstanden wurde"""
+
+    def close(self):
+        pass
+
+
+class ElevenLabsRecognizer(SpeechRecognizer):
+    """Scribe über den gemeinsamen ElevenLabs Client (keep-alive)"""
+
+    def transcribe(self, audio: bytes) -> str:
+        result = get_elevenlabs_client().speech_to_text.convert(
+            model_id=STT_MODEL,
+            file=("utterance.wav", ulaw_to_wav(audio), "audio/wav"),
+            language_code=STT_LANGUAGE,
+            tag_audio_events=False,
+        )
+        return (result.text or "").strip()
+
+
+_recognizers: Dict[str, Callable[[], SpeechRecognizer]] = {
+    "elevenlabs": ElevenLabsRecognizer,
+}
+
+
+def register_recognizer(name: str, factory: Callable[[], SpeechRecognizer]):
+    """Weitere Engine verfügbar machen (STT_ENGINE=name)"""
+    _recognizers[name] = factory
+
+
+def create_recognizer(name: Optional[str] = None) -> SpeechRecognizer:
+    name = name or os.getenv("STT_ENGINE", DEFAULT_STT_ENGINE)
+    if name not in _recognizers:
+        raise ValueError(f"Unknown STT engine: {name} (available: {', '.join(sorted(_recognizers))})")
+    return _recognizers[name]()
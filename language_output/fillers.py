@@ -0,0 +1,178 @@
+"""
+Audio-Bank für kurze Füllsätze ("Einen Moment bitte", "Verstehe")
+Wird einmal pro Stimme synthetisiert und dann nur noch abgespielt
+"""
+import hashlib
+import json
+import os
+import random
+import shutil
+import threading
+import time
+from typing import Optional
+
+from language_output.language_output import talk, VOICE_ID, MODEL_ID, OUTPUT_FORMAT
+from language_output.tts_cache import extension_for
+
+
+FILLER_PHRASES = {
+    "de": {
+        "wait": ["Einen Moment bitte.", "Ich schaue kurz nach.", "Einen kleinen Augenblick."],
+        "ack": ["Verstehe.", "Alles klar.", "Okay."],
+    },
+    "en": {
+        "wait": ["One moment, please.", "Let me check that.", "Just a second."],
+        "ack": ["I see.", "Alright.", "Okay."],
+    },
+}
+
+BANK_SUBDIR = "fillers"
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+# Unvollständige Bank (z.B. ElevenLabs kurz nicht erreichbar) frühestens nach so vielen Sekunden neu bauen
+RETRY_SECONDS = float(os.getenv("FILLER_RETRY_SECONDS", "60"))
+
+_manifest: Optional[dict] = None
+_build_lock = threading.Lock()
+# monotonic() ab dem get_filler() einen neuen Versuch anstößt, 0 = Bank vollständig
+_retry_at = 0.0
+
+
+def bank_version(voice_id=VOICE_ID, model_id=MODEL_ID, output_format=OUTPUT_FORMAT, phrases=FILLER_PHRASES) -> str:
+    """Ändert sich mit Stimme, Modell, Format oder Sätzen -> Bank wird neu erzeugt"""
+    raw = json.dumps([voice_id, model_id, output_format, phrases], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:12]
+
+
+def _manifest_path() -> str:
+    return os.path.join(BASE_DIR, BANK_SUBDIR, "manifest.json")
+
+
+def _load_manifest(version: str) -> Optional[dict]:
+    try:
+        with open(_manifest_path(), encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+    if manifest.get("version") != version:
+        return None
+    for kinds in manifest["phrases"].values():
+        for filenames in kinds.values():
+            if not all(os.path.exists(os.path.join(BASE_DIR, name)) for name in filenames):
+                return None
+    return manifest
+
+
+def build_filler_bank(voice_id=VOICE_ID, model_id=MODEL_ID, output_format=OUTPUT_FORMAT, phrases=FILLER_PHRASES) -> dict:
+    """
+    Synthetisiert alle Füllsätze (falls nicht schon für diese Version vorhanden)
+
+    Die Dateien werden aus dem TTS-Cache nach fillers/<version>/ kopiert,
+    damit die LRU-Verdrängung des Caches sie nie löscht.
+
+    Returns:
+        Manifest {version, phrases: {lang: {kind: [dateinamen]}}}
+    """
+    global _manifest, _retry_at
+    version = bank_version(voice_id, model_id, output_format, phrases)
+
+    with _build_lock:
+        manifest = _load_manifest(version)
+        if manifest:
+            _manifest = manifest
+            _retry_at = 0.0
+            return manifest
+
+        print(f"🎙️ Building filler bank {version} ...")
+        bank_dir = os.path.join(BASE_DIR, BANK_SUBDIR)
+        version_dir = os.path.join(bank_dir, version)
+        os.makedirs(version_dir, exist_ok=True)
+        ext = extension_for(output_format)
+
+        files = {}
+        complete = True
+        for lang, kinds in phrases.items():
+            files[lang] = {}
+            for kind, texts in kinds.items():
+                files[lang][kind] = []
+                for i, text in enumerate(texts):
+                    cached = talk(text, voice_id=voice_id, model_id=model_id, output_format=output_format)
+                    if not cached:
+                        complete = False
+                        continue
+                    filename = f"{BANK_SUBDIR}/{version}/{lang}_{kind}_{i}.{ext}"
+                    shutil.copyfile(os.path.join(BASE_DIR, cached), os.path.join(BASE_DIR, filename))
+                    files[lang][kind].append(filename)
+
+        manifest = {
+            "version": version,
+            "voice_id": voice_id,
+            "model_id": model_id,
+            "output_format": output_format,
+            "phrases": files,
+        }
+        if not complete:
+            # Nicht persistieren, get_filler() stößt nach RETRY_SECONDS einen neuen Versuch an
+            # (schon synthetisierte Sätze sind dann Cache-Treffer)
+            print(f"⚠️ Filler bank {version} incomplete, retrying in {RETRY_SECONDS:.0f}s")
+            _manifest = manifest
+            _retry_at = time.monotonic() + RETRY_SECONDS
+            return manifest
+
+        tmp_path = _manifest_path() + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, _manifest_path())
+
+        # Alte Versionen (andere Stimme) wegräumen
+        for name in os.listdir(bank_dir):
+            path = os.path.join(bank_dir, name)
+            if os.path.isdir(path) and name != version:
+                shutil.rmtree(path, ignore_errors=True)
+
+        _manifest = manifest
+        _retry_at = 0.0
+        print(f"✅ Filler bank {version} ready")
+        return manifest
+
+
+def warmup_async():
+    """Baut die Bank im Hintergrund, der Server startet trotzdem sofort"""
+    thread = threading.Thread(target=build_filler_bank, name="filler-warmup", daemon=True)
+    thread.start()
+    return thread
+
+
+def _retry_incomplete():
+    """Unvollständige Bank nach Ablauf des Backoffs im Hintergrund neu bauen"""
+    global _retry_at
+    if not _retry_at or time.monotonic() < _retry_at or _build_lock.locked():
+        return
+    # Nur ein Versuch pro Backoff, auch wenn viele Requests gleichzeitig kommen
+    _retry_at = time.monotonic() + RETRY_SECONDS
+    warmup_async()
+
+
+def get_filler(lang: str = "en", kind: str = "wait") -> Optional[str]:
+    """
+    Zufälliger Füllsatz als Dateiname relativ zu /audio/
+
+    Returns:
+        None, solange die Bank noch nicht gebaut ist
+    """
+    global _manifest
+    _retry_incomplete()
+    if _manifest is None:
+        # Evtl. von einem anderen Worker oder zur Build-Time gebaut
+        _manifest = _load_manifest(bank_version())
+        if _manifest is None:
+            return None
+    filenames = _manifest["phrases"].get(lang, {}).get(kind, [])
+    if not filenames:
+        return None
+    return random.choice(filenames)
+
+
+if __name__ == "__main__":
+    # Build-Time: python -m language_output.fillers
+    result = build_filler_bank()
+    print(json.dumps(result, indent=2, ensure_ascii=False))
@@ -1,45 +1,288 @@
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 from elevenlabs.client import ElevenLabs
- 
-import uuid
 
-def talk(a):
-    load_dotenv(override=True)
-    # ... (restlicher Auth Code) ...
-    client = ElevenLabs(api_key=os.getenv("meinapitoken"))
-    api_key = os.getenv("meinapitoken")
-    voice_1 = "9BWtsMINqrJLrRacOk9x"
-    
+from clients.registry import get_elevenlabs_client
+from language_output.tts_cache import SynthesisAborted, get_tts_cache
+
+VOICE_ID = os.getenv("ELEVENLABS_VOICE_ID", "9BWtsMINqrJLrRacOk9x")
+MODEL_ID = "eleven_multilingual_v2"
+OUTPUT_FORMAT = "mp3_44100_128"
+STREAM_SUBDIR = "stream"
+# So oft übernimmt ein Mitleser, wenn der synthetisierende Worker abbricht
+MAX_TAKEOVERS = 3
+
+# Hintergrund-Synthese für prefetch_speech(), key -> _SpeechJob
+_prefetch_pool = ThreadPoolExecutor(
+    max_workers=int(os.getenv("TTS_PREFETCH_WORKERS", "4")),
+    thread_name_prefix="tts-prefetch",
+)
+_jobs = {}
+_jobs_lock = threading.Lock()
+
+
+def _open_stream(a, voice_id, model_id, output_format):
+    # Ein Client pro Prozess, Verbindungen bleiben offen (keep-alive)
+    client = get_elevenlabs_client()
+
     print("Generating dialogue...")
-    if not api_key:
-        print("❌ TokenERROR")
-        exit()
+    return client.text_to_speech.stream(
+        voice_id=voice_id,
+        output_format=output_format,
+        text=a,
+        model_id=model_id
+    )
+
+
+def talk(a, voice_id=VOICE_ID, model_id=MODEL_ID, output_format=OUTPUT_FORMAT):
+    # Gleicher Text mit gleicher Stimme -> vorhandene Datei, kein API Call
+    cache = get_tts_cache()
+    key = cache.key_for(a, voice_id, model_id, output_format)
+    cached = cache.get(key, output_format)
+    if cached:
+        print(f"🔁 TTS cache hit: {cached}")
+        return cached
  
     try:
-        audio_stream = client.text_to_speech.stream(
-                voice_id=voice_1,
-                output_format="mp3_44100_128",
-                text=a,
-                model_id="eleven_multilingual_v2"
-            )
- 
-        output_dir = os.path.dirname(os.path.abspath(__file__))
-        
-        # FIX: Eindeutigen Dateinamen generieren!
-        unique_filename = f"output_{uuid.uuid4().hex[:8]}.mp3"
-        output_path = os.path.join(output_dir, unique_filename)
-
-        with open(output_path, "wb") as f:
-            for chunk in audio_stream:
-                f.write(chunk)
-        
-        # Den neuen, eindeutigen Namen zurückgeben
-        return unique_filename
+        audio_stream = _open_stream(a, voice_id, model_id, output_format)
+
+        # Dateiname leitet sich aus dem Inhalt ab (cache/tts_<hash>.mp3)
+        return cache.put(key, output_format, audio_stream)
 
     except Exception as e:
         print(f"An error occurred: {e}")
         return None
+
+
+def prepare_speech(a, voice_id=VOICE_ID, model_id=MODEL_ID, output_format=OUTPUT_FORMAT):
+    """
+    Wie talk(), wartet aber nicht auf die Synthese
+
+    Returns:
+        Dateiname relativ zu /audio/: bei einem Cache-Treffer die fertige
+        Datei, sonst stream/<key>.<ext>, das beim Abruf live synthetisiert wird
+    """
+    cache = get_tts_cache()
+    key = cache.key_for(a, voice_id, model_id, output_format)
+    cached = cache.get(key, output_format)
+    if cached:
+        return cached
+
+    cache.register_pending(key, {
+        "text": a,
+        "voice_id": voice_id,
+        "model_id": model_id,
+        "output_format": output_format,
+    })
+    ext = cache.filename_for(key, output_format).rsplit(".", 1)[1]
+    return f"{STREAM_SUBDIR}/{key}.{ext}"
+
+
+class _SpeechJob:
+    """Laufende Synthese, an die sich beliebig viele Leser hängen können"""
+
+    def __init__(self):
+        self.chunks = []
+        self.done = False
+        self._cond = threading.Condition()
+
+    def append(self, chunk):
+        with self._cond:
+            self.chunks.append(chunk)
+            self._cond.notify_all()
+
+    def finish(self):
+        with self._cond:
+            self.done = True
+            self._cond.notify_all()
+
+    def follow(self):
+        index = 0
+        while True:
+            with self._cond:
+                while index >= len(self.chunks) and not self.done:
+                    self._cond.wait()
+                if index >= len(self.chunks):
+                    return
+                chunk = self.chunks[index]
+            index += 1
+            yield chunk
+
+
+def _claim_or_follow(cache, key, output_format, chunk_size=4096):
+    """
+    Synthese für key übernehmen, falls kein anderer Worker sie schon macht
+
+    Returns:
+        (writer, None) wenn dieser Worker synthetisieren soll, sonst
+        (None, chunks) mit der laufenden Synthese des anderen Workers
+        bzw. der inzwischen fertigen Datei
+    """
+    path = cache.path_for(key, output_format)
+    writer = cache.claim(key, output_format)
+    if writer is not None and os.path.exists(path):
+        # Gerade von einem anderen Worker fertig geworden
+        writer.abort()
+        writer = None
+    if writer is not None:
+        return writer, None
+    chunks = cache.follow(key, output_format, chunk_size)
+    if chunks is None and os.path.exists(path):
+        chunks = _read_file(path, chunk_size)
+    return None, chunks
+
+
+def _skip_bytes(chunks, offset):
+    """chunks ohne die ersten offset Bytes (die sind schon ausgeliefert)"""
+    position = 0
+    for chunk in chunks:
+        end = position + len(chunk)
+        if end > offset:
+            yield chunk[max(0, offset - position):]
+        position = end
+
+
+def _synthesize(cache, key, params, chunk_size=4096):
+    """
+    Chunks für key: selbst synthetisieren (Tee in den Cache) oder die
+    Synthese eines anderen Workers mitlesen
+
+    Bricht der andere Worker ab, übernimmt dieser Aufruf die Synthese und
+    liefert ab dem Byte weiter, bis zu dem schon ausgeliefert wurde. Sonst
+    hätte der Hörer nur den Anfang der Ansage.
+    """
+    output_format = params["output_format"]
+    sent = 0
+    for _ in range(MAX_TAKEOVERS):
+        writer, chunks = _claim_or_follow(cache, key, output_format, chunk_size)
+        if writer is None:
+            # chunks None: der andere Worker hat zwischen claim() und follow() abgebrochen
+            try:
+                for chunk in _skip_bytes(chunks or (), sent):
+                    sent += len(chunk)
+                    yield chunk
+            except SynthesisAborted:
+                print(f"⚠️ Synthese für {key} in anderem Worker abgebrochen, übernehme")
+                continue
+            if chunks is not None:
+                return
+            continue
+        try:
+            # Die Datei bekommt alles, der Hörer nur, was er noch nicht hat
+            position = 0
+            for chunk in _open_stream(params["text"], params["voice_id"], params["model_id"], output_format):
+                writer.write(chunk)
+                position += len(chunk)
+                if position > sent:
+                    yield chunk[len(chunk) - (position - sent):]
+                    sent = position
+        except BaseException as e:
+            # Auch GeneratorExit (Twilio legt auf) -> halbe Datei verwerfen
+            writer.abort()
+            if isinstance(e, Exception):
+                print(f"An error occurred: {e}")
+                return
+            raise
+        writer.commit()
+        cache.drop_pending(key)
+        return
+    print(f"❌ Synthese für {key} nach {MAX_TAKEOVERS} Versuchen aufgegeben")
+
+
+def _run_job(key, params, job):
+    try:
+        for chunk in _synthesize(get_tts_cache(), key, params):
+            job.append(chunk)
+    finally:
+        job.finish()
+        with _jobs_lock:
+            _jobs.pop(key, None)
+
+
+def prefetch_speech(a, voice_id=VOICE_ID, model_id=MODEL_ID, output_format=OUTPUT_FORMAT):
+    """
+    Wie prepare_speech(), startet die Synthese aber sofort im Hintergrund
+
+    Der spätere Abruf von stream/<key> hängt sich an die laufende Synthese
+    und bekommt auch die Chunks, die schon vorher angekommen sind.
+    """
+    filename = prepare_speech(a, voice_id, model_id, output_format)
+    if not filename.startswith(f"{STREAM_SUBDIR}/"):
+        return filename
+
+    key = filename.split("/", 1)[1].rsplit(".", 1)[0]
+    with _jobs_lock:
+        if key in _jobs:
+            return filename
+        job = _jobs[key] = _SpeechJob()
+    params = {"text": a, "voice_id": voice_id, "model_id": model_id, "output_format": output_format}
+    _prefetch_pool.submit(_run_job, key, params, job)
+    return filename
+
+
+def stream_speech(name, chunk_size=4096):
+    """
+    Liefert die Audio-Chunks für stream/<key>.<ext> sobald ElevenLabs sie schickt
+
+    Die Chunks werden parallel in den Cache geschrieben (Tee), der nächste
+    Abruf desselben Texts ist dann ein normaler Cache-Treffer. Synthetisiert
+    gerade ein anderer Worker denselben key, wird dessen In-flight-Datei
+    mitgelesen statt ElevenLabs ein zweites Mal aufzurufen.
+
+    Returns:
+        Iterator über bytes oder None wenn der key unbekannt ist
+    """
+    cache = get_tts_cache()
+    key = name.rsplit(".", 1)[0]
+
+    # Läuft schon per prefetch_speech() in diesem Prozess
+    with _jobs_lock:
+        job = _jobs.get(key)
+    if job is not None:
+        return job.follow()
+
+    # Schon fertig (z.B. Twilio ruft die URL ein zweites Mal ab)
+    cached_path = os.path.join(cache.cache_dir, f"tts_{name}")
+    if os.path.exists(cached_path):
+        return _read_file(cached_path, chunk_size)
+
+    params = cache.load_pending(key)
+    if params is None:
+        return None
+    output_format = params["output_format"]
+
+    # Läuft die Synthese schon in einem anderen Worker (prefetch_speech() oder
+    # ein Stream-Abruf), wird dessen In-flight-Datei mitgelesen
+    return _synthesize(cache, key, params, chunk_size)
+
+
+def speech_chunks(filename, chunk_size=4096):
+    """
+    Audio-Chunks zu einem Dateinamen aus prepare_speech() / prefetch_speech()
+
+    Für Aufrufer ohne HTTP-Umweg (Media Streams): fertige Cache-Dateien
+    werden gelesen, stream/<key> wie bei /audio/stream live synthetisiert.
+
+    Returns:
+        Iterator über bytes oder None wenn die Datei unbekannt ist
+    """
+    if filename.startswith(f"{STREAM_SUBDIR}/"):
+        return stream_speech(filename.split("/", 1)[1], chunk_size)
+    path = os.path.join(get_tts_cache().base_dir, filename)
+    if not os.path.exists(path):
+        return None
+    return _read_file(path, chunk_size)
+
+
+def _read_file(path, chunk_size):
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
  
  
 def newvoice():
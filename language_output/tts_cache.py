@@ -0,0 +1,470 @@
+"""
+Content-addressed Cache für ElevenLabs Audio
+Gleicher Text + gleiche Stimme/Modell/Format -> gleiche Datei, kein API Call
+
+Der Cache ist gleichzeitig der Lebenszyklus-Manager für alle generierten
+Audiodateien: Byte-Budget, TTL, Pins für laufende Calls und ein Sweeper.
+Alles, was mehrere Worker gemeinsam sehen müssen (letzte Nutzung, Pins),
+liegt im Dateisystem: mtime der Audiodatei bzw. Pin-Dateien unter cache/pins/.
+"""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, Iterator, Optional, Set
+
+
+CACHE_SUBDIR = "cache"
+PINS_SUBDIR = "pins"
+DEFAULT_MAX_BYTES = int(float(os.getenv("TTS_CACHE_MAX_MB", "200")) * 1024 * 1024)
+DEFAULT_TTL_SECONDS = int(os.getenv("AUDIO_TTL_SECONDS", str(6 * 3600)))
+DEFAULT_PIN_SECONDS = int(os.getenv("AUDIO_PIN_SECONDS", "1800"))
+DEFAULT_SWEEP_INTERVAL = int(os.getenv("AUDIO_SWEEP_INTERVAL", "60"))
+# Halb geschriebene Temp-Dateien abgebrochener Streams
+STALE_TMP_SECONDS = 3600
+# Laufende Synthese unter festem Namen, andere Worker lesen mit statt neu zu synthetisieren
+INFLIGHT_PREFIX = ".tmp_inflight_"
+# Kommt so lange kein Chunk, gilt der Schreiber als tot (Worker abgestürzt)
+INFLIGHT_STALE_SECONDS = 30
+INFLIGHT_POLL_SECONDS = 0.05
+
+
+class SynthesisAborted(Exception):
+    """follow(): der Schreiber hat abgebrochen, die Datei wird nie vollständig"""
+
+
+def extension_for(output_format: str) -> str:
+    """mp3_44100_128 -> mp3, ulaw_8000 -> ulaw, pcm_16000 -> pcm"""
+    return output_format.split("_", 1)[0]
+
+
+class TTSCache:
+    """
+    Datei-Cache mit In-Memory Index
+
+    Der Index (key -> Dateigröße) liegt in LRU-Reihenfolge im Speicher,
+    die Dateien selbst unter <base_dir>/cache/. Überschreitet die Summe
+    max_bytes, werden die am längsten nicht genutzten Dateien gelöscht,
+    ebenso alles, was länger als ttl_seconds nicht abgespielt wurde.
+    Dateien, die ein laufender Call noch braucht (pin), bleiben liegen.
+
+    Die LRU-Reihenfolge kennt nur die Zugriffe dieses Prozesses, vor dem
+    Löschen wird deshalb die mtime der Datei (get() setzt sie in jedem
+    Worker) noch einmal geprüft.
+    """
+
+    def __init__(self, base_dir: str, max_bytes: int = DEFAULT_MAX_BYTES,
+                 ttl_seconds: int = DEFAULT_TTL_SECONDS):
+        self.base_dir = base_dir
+        self.cache_dir = os.path.join(base_dir, CACHE_SUBDIR)
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expired = 0
+        self.evicted_bytes = 0
+        self._index: "OrderedDict[str, int]" = OrderedDict()
+        self._last_used: Dict[str, float] = {}
+        # <call_sid>@<name>, mtime = Ablauf des Pins (für alle Worker sichtbar)
+        self.pins_dir = os.path.join(self.cache_dir, PINS_SUBDIR)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._sweeper: Optional[threading.Thread] = None
+        os.makedirs(self.pins_dir, exist_ok=True)
+        self._load_index()
+
+    @staticmethod
+    def key_for(text: str, voice_id: str, model_id: str, output_format: str) -> str:
+        raw = "\x1f".join([voice_id, model_id, output_format, text.strip()])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32]
+
+    @staticmethod
+    def filename_for(key: str, output_format: str) -> str:
+        """Dateiname relativ zu base_dir (so wie ihn /audio/<path> erwartet)"""
+        return f"{CACHE_SUBDIR}/tts_{key}.{extension_for(output_format)}"
+
+    def path_for(self, key: str, output_format: str) -> str:
+        return os.path.join(self.base_dir, self.filename_for(key, output_format))
+
+    def _load_index(self):
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.startswith("tts_"):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            stat = os.stat(path)
+            entries.append((stat.st_mtime, name, stat.st_size))
+        # Älteste zuerst -> landen vorne in der LRU
+        for mtime, name, size in sorted(entries):
+            self._index[name] = size
+            self._last_used[name] = mtime
+            self._bytes += size
+
+    def get(self, key: str, output_format: str) -> Optional[str]:
+        """Gibt den Dateinamen bei einem Treffer zurück, sonst None"""
+        filename = self.filename_for(key, output_format)
+        name = os.path.basename(filename)
+        path = self.path_for(key, output_format)
+        with self._lock:
+            if name not in self._index and os.path.exists(path):
+                # Von einem anderen Worker geschrieben
+                size = os.path.getsize(path)
+                self._index[name] = size
+                self._bytes += size
+            if name in self._index and os.path.exists(path):
+                self._index.move_to_end(name)
+                self._last_used[name] = time.time()
+                self.hits += 1
+                try:
+                    os.utime(path)
+                except OSError:
+                    pass
+                return filename
+            if name in self._index:
+                # Datei wurde extern gelöscht
+                self._bytes -= self._index.pop(name)
+                self._last_used.pop(name, None)
+            self.misses += 1
+            return None
+
+    def put(self, key: str, output_format: str, chunks: Iterable[bytes]) -> str:
+        """Schreibt die Chunks atomar (tmp + rename) in den Cache"""
+        writer = self.writer(key, output_format)
+        try:
+            for chunk in chunks:
+                writer.write(chunk)
+        except BaseException:
+            writer.abort()
+            raise
+        return writer.commit()
+
+    def writer(self, key: str, output_format: str) -> "CacheWriter":
+        """Schreiber für Tee-Streaming: Chunks gehen raus und gleichzeitig in den Cache"""
+        return CacheWriter(self, key, output_format)
+
+    def inflight_path(self, key: str, output_format: str) -> str:
+        return os.path.join(self.cache_dir, f"{INFLIGHT_PREFIX}{key}.{extension_for(output_format)}")
+
+    def claim(self, key: str, output_format: str) -> Optional["CacheWriter"]:
+        """
+        Schreiber unter dem festen In-flight-Namen, den nur ein Worker bekommt
+
+        Returns:
+            None, wenn schon ein anderer Worker diese Datei erzeugt -> follow()
+        """
+        path = self.inflight_path(key, output_format)
+        for _ in range(2):
+            try:
+                fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+                return CacheWriter(self, key, output_format, fd=fd, tmp_path=path)
+            except FileExistsError:
+                # Verwaist (Schreiber abgestürzt) -> übernehmen, sonst mitlesen
+                if not self._remove_if_older(path, time.time() - INFLIGHT_STALE_SECONDS):
+                    return None
+        return None
+
+    def follow(self, key: str, output_format: str, chunk_size: int = 4096) -> Optional[Iterator[bytes]]:
+        """
+        Liest eine laufende Synthese (claim() eines beliebigen Workers) mit
+
+        Liefert, was schon geschrieben ist, und wartet dann auf weitere
+        Chunks, bis commit() die Datei umbenennt oder abort() sie löscht.
+
+        Returns:
+            Iterator über bytes oder None, wenn gerade niemand schreibt
+
+        Raises (beim Iterieren):
+            SynthesisAborted: abort() oder der Schreiber hängt, die bisher
+                gelieferten Bytes sind nur ein Anfang der Audiodatei
+        """
+        path = self.inflight_path(key, output_format)
+        final_path = self.path_for(key, output_format)
+        try:
+            f = open(path, "rb")
+        except FileNotFoundError:
+            return None
+
+        def tail():
+            with f:
+                last_data = time.monotonic()
+                while True:
+                    chunk = f.read(chunk_size)
+                    if chunk:
+                        last_data = time.monotonic()
+                        yield chunk
+                        continue
+                    if not os.path.exists(path):
+                        # Umbenannt (fertig) oder verworfen: der Rest steht schon in der Datei
+                        while True:
+                            chunk = f.read(chunk_size)
+                            if not chunk:
+                                break
+                            yield chunk
+                        # commit() benennt atomar um, ohne fertige Datei war es abort()
+                        if not os.path.exists(final_path):
+                            raise SynthesisAborted(key)
+                        return
+                    if time.monotonic() - last_data > INFLIGHT_STALE_SECONDS:
+                        print(f"⚠️ In-flight Audio {key} kommt nicht weiter, Abbruch")
+                        raise SynthesisAborted(key)
+                    time.sleep(INFLIGHT_POLL_SECONDS)
+
+        return tail()
+
+    def register_pending(self, key: str, params: dict):
+        """
+        Merkt sich die Parameter einer noch nicht erzeugten Datei
+
+        Liegt als JSON neben den Audiodateien, damit jeder Worker den
+        Stream-Request bedienen kann.
+        """
+        path = os.path.join(self.cache_dir, f"pending_{key}.json")
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, prefix=".tmp_")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(params, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def load_pending(self, key: str) -> Optional[dict]:
+        path = os.path.join(self.cache_dir, f"pending_{key}.json")
+        try:
+            with open(path, encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def drop_pending(self, key: str):
+        try:
+            os.remove(os.path.join(self.cache_dir, f"pending_{key}.json"))
+        except FileNotFoundError:
+            pass
+
+    def _add(self, name: str, size: int):
+        with self._lock:
+            if name in self._index:
+                self._bytes -= self._index.pop(name)
+            self._index[name] = size
+            self._last_used[name] = time.time()
+            self._bytes += size
+            self._evict_locked()
+
+    @staticmethod
+    def _cache_name(filename: str) -> Optional[str]:
+        """cache/tts_<key>.mp3 oder stream/<key>.mp3 -> tts_<key>.mp3"""
+        folder, _, name = filename.rpartition("/")
+        if folder.endswith(CACHE_SUBDIR) and name.startswith("tts_"):
+            return name
+        if folder.endswith("stream"):
+            return f"tts_{name}"
+        return None
+
+    def pin(self, call_sid: str, filename: str, seconds: int = DEFAULT_PIN_SECONDS):
+        """
+        Schützt eine Datei vor dem Löschen, solange der Call läuft
+
+        Ein Pin läuft nach seconds ab, falls release_call() nie kommt.
+        """
+        name = self._cache_name(filename)
+        if not name or not call_sid:
+            return
+        path = os.path.join(self.pins_dir, f"{call_sid}@{name}")
+        expires_at = time.time() + seconds
+        with open(path, "a"):
+            pass
+        os.utime(path, (expires_at, expires_at))
+
+    def release_call(self, call_sid: str):
+        """Alle Pins eines beendeten Calls freigeben (egal welcher Worker sie gesetzt hat)"""
+        if not call_sid:
+            return
+        prefix = f"{call_sid}@"
+        for entry in os.listdir(self.pins_dir):
+            if entry.startswith(prefix):
+                try:
+                    os.remove(os.path.join(self.pins_dir, entry))
+                except FileNotFoundError:
+                    pass
+
+    def _pinned_names(self, now: float) -> Set[str]:
+        """Gepinnte Dateien aller Worker, abgelaufene Pins werden dabei entfernt"""
+        pinned = set()
+        for entry in os.listdir(self.pins_dir):
+            path = os.path.join(self.pins_dir, entry)
+            try:
+                if os.path.getmtime(path) >= now:
+                    pinned.add(entry.partition("@")[2])
+                else:
+                    os.remove(path)
+            except FileNotFoundError:
+                pass
+        return pinned
+
+    def _used_elsewhere_locked(self, name: str) -> bool:
+        """Hat ein anderer Worker die Datei seit unserem letzten Zugriff benutzt?"""
+        try:
+            mtime = os.path.getmtime(os.path.join(self.cache_dir, name))
+        except FileNotFoundError:
+            return False
+        # Toleranz: get() setzt die mtime kurz nach _last_used
+        if mtime <= self._last_used.get(name, 0) + 1:
+            return False
+        self._last_used[name] = mtime
+        self._index.move_to_end(name)
+        return True
+
+    def _remove_locked(self, name: str):
+        size = self._index.pop(name)
+        self._last_used.pop(name, None)
+        self._bytes -= size
+        self.evicted_bytes += size
+        try:
+            os.remove(os.path.join(self.cache_dir, name))
+        except FileNotFoundError:
+            pass
+
+    def _evict_locked(self):
+        if self._bytes <= self.max_bytes:
+            return
+        pinned = self._pinned_names(time.time())
+        # Älteste zuerst, gepinnte und woanders frisch benutzte überspringen
+        for name in list(self._index):
+            if self._bytes <= self.max_bytes or len(self._index) <= 1:
+                break
+            if name in pinned or self._used_elsewhere_locked(name):
+                continue
+            self._remove_locked(name)
+            self.evictions += 1
+
+    def sweep(self) -> int:
+        """
+        Räumt auf: abgelaufene Dateien, Budget, verwaiste Temp-/Pending-Dateien
+        und Altlasten (output_<uuid>.mp3) im Basisverzeichnis
+
+        Returns:
+            Anzahl gelöschter Audiodateien
+        """
+        now = time.time()
+        removed = 0
+        with self._lock:
+            pinned = self._pinned_names(now)
+            for name in list(self._index):
+                if now - self._last_used.get(name, now) <= self.ttl_seconds:
+                    continue
+                if name in pinned or self._used_elsewhere_locked(name):
+                    continue
+                self._remove_locked(name)
+                self.expired += 1
+                removed += 1
+            before = self.evictions
+            self._evict_locked()
+            removed += self.evictions - before
+
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            max_age = STALE_TMP_SECONDS if name.startswith(".tmp_") else self.ttl_seconds
+            if name.startswith((".tmp_", "pending_")):
+                self._remove_if_older(path, now - max_age)
+
+        for name in os.listdir(self.base_dir):
+            if name.startswith("output_") and name.endswith(".mp3"):
+                if self._remove_if_older(os.path.join(self.base_dir, name), now - self.ttl_seconds):
+                    with self._lock:
+                        self.expired += 1
+                    removed += 1
+        return removed
+
+    @staticmethod
+    def _remove_if_older(path: str, cutoff: float) -> bool:
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+                return True
+        except FileNotFoundError:
+            pass
+        return False
+
+    def start_sweeper(self, interval: int = DEFAULT_SWEEP_INTERVAL) -> threading.Thread:
+        """Startet (einmal pro Prozess) den Hintergrund-Sweeper"""
+        with self._lock:
+            if self._sweeper is not None:
+                return self._sweeper
+
+            def run():
+                while True:
+                    time.sleep(interval)
+                    try:
+                        removed = self.sweep()
+                        if removed:
+                            print(f"🧹 Audio sweeper removed {removed} files")
+                    except Exception as e:
+                        print(f"❌ Audio sweeper error: {e}")
+
+            self._sweeper = threading.Thread(target=run, name="audio-sweeper", daemon=True)
+            self._sweeper.start()
+            return self._sweeper
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "evictions": self.evictions,
+                "expired": self.expired,
+                "evicted_bytes": self.evicted_bytes,
+                "files": len(self._index),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl_seconds,
+                "pinned_files": len(self._pinned_names(time.time())),
+            }
+
+
+class CacheWriter:
+    """Schreibt in eine Temp-Datei, erst commit() macht sie im Cache sichtbar"""
+
+    def __init__(self, cache: TTSCache, key: str, output_format: str,
+                 fd: Optional[int] = None, tmp_path: Optional[str] = None):
+        self.cache = cache
+        self.key = key
+        self.output_format = output_format
+        if fd is None:
+            fd, tmp_path = tempfile.mkstemp(dir=cache.cache_dir, prefix=".tmp_")
+        self.tmp_path = tmp_path
+        self._file = os.fdopen(fd, "wb")
+
+    def write(self, chunk: bytes):
+        if chunk:
+            self._file.write(chunk)
+            # Mitleser (follow()) sehen den Chunk sofort
+            self._file.flush()
+
+    def commit(self) -> str:
+        self._file.close()
+        filename = self.cache.filename_for(self.key, self.output_format)
+        path = self.cache.path_for(self.key, self.output_format)
+        os.replace(self.tmp_path, path)
+        self.cache._add(os.path.basename(filename), os.path.getsize(path))
+        return filename
+
+    def abort(self):
+        self._file.close()
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+
+
+_cache: Optional[TTSCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_tts_cache() -> TTSCache:
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = TTSCache(os.path.dirname(os.path.abspath(__file__)))
+    return _cache
@@ -2,18 +2,54 @@
 Appointment Booking Agent mit Gemini LLM
 Verwaltet die Konversation für Terminbuchungen
 """
+import asyncio
 import os
-from typing import Dict, Optional, List
+import sys
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Deque, Dict, Optional, Tuple
 from dotenv import load_dotenv
 import google.generativeai as genai
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from clients.registry import get_gemini_model
+from llmcall_method.outcome import OutcomeTracker
+
 load_dotenv()
 
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "20"))
+MODEL_NAME = 'gemini-2.0-flash-exp'
+# Ab so vielen Input-Tokens pro Turn werden ältere Turns zusammengefasst
+HISTORY_TOKEN_BUDGET = int(os.getenv("AGENT_HISTORY_TOKEN_BUDGET", "1500"))
+# So viele Nachrichten (User + Agent) bleiben nach dem Zusammenfassen wörtlich erhalten
+KEEP_RECENT_MESSAGES = 4
+# Transkript im Speicher (für Logs), ältere Zeilen stecken in rolling_summary
+MAX_TRANSCRIPT_LINES = 40
+# So lange wartet get_conversation_summary() höchstens auf ein laufendes Outcome-Update
+SUMMARY_WAIT_SECONDS = float(os.getenv("AGENT_SUMMARY_WAIT_SECONDS", "2"))
+
+GREETING_INSTRUCTION = """Generiere jetzt die ERSTE Begrüßung für den Anruf.
+Sei kurz, freundlich und erkläre den Grund des Anrufs.
+Maximal 2-3 kurze Sätze!"""
+
+# Zusammenfassen läuft im Hintergrund, nicht auf dem Antwortpfad
+_compression_pool = ThreadPoolExecutor(max_workers=int(os.getenv("AGENT_SUMMARY_WORKERS", "2")),
+                                       thread_name_prefix="agent-summary")
+
 
 class AppointmentAgent:
     """
     KI-Agent für Terminbuchungen via Telefon
     Nutzt Gemini LLM für natürliche Konversation
+
+    Der System-Prompt steckt als system_instruction in einer Chat-Session,
+    pro Turn wird nur noch die neue Äußerung gesendet. Überschreitet der
+    Input das Token-Budget, werden ältere Turns im Hintergrund zu einer
+    rollierenden Zusammenfassung verdichtet. Bis sie fertig ist, läuft das
+    Gespräch auf der bisherigen Chat-Session weiter, getauscht wird erst
+    zu Beginn des nächsten Turns danach (kein Warten auf dem Antwortpfad).
     """
     
     def __init__(self):
@@ -22,11 +58,17 @@ class AppointmentAgent:
         if not api_key:
             raise ValueError("GOOGLE_API_KEY nicht in .env gefunden!")
         
-        genai.configure(api_key=api_key)
-        self.model = genai.GenerativeModel('gemini-2.0-flash-exp')
-        self.conversation_history: List[str] = []
+        # Geteiltes Modell - mehrere Agents (Calls) bauen keinen eigenen Client
+        self.model = get_gemini_model(MODEL_NAME)
+        self.conversation_history: Deque[str] = deque(maxlen=MAX_TRANSCRIPT_LINES)
         self.request_context: Dict = {}
         self.system_prompt: str = ""
+        self.rolling_summary: str = ""
+        self.chat = None
+        self._compression: Optional[Future] = None
+        # Strukturiertes Ergebnis (booked, slot, notes), nach jedem Turn im Hintergrund aktualisiert
+        self.outcome = OutcomeTracker(self.model)
+        self._last_user_input: Optional[str] = None
     
     def set_context(self, request_data: Dict):
         """
@@ -88,7 +130,126 @@ Agent: "Wunderbar! Wir suchen einen Termin für nächste Woche. Welche Tage hät
 User: "Mittwoch um 14 Uhr wäre möglich."
 Agent: "Perfekt! Mittwoch, 14 Uhr ist notiert. Vielen Dank und einen schönen Tag!"
 """
+        self._start_chat([])
+
+    def _start_chat(self, history: list):
+        # Eigenes Modell-Objekt pro Call (system_instruction ist call-spezifisch,
+        # gehört daher nicht in den geteilten Registry-Cache); der API-Client ist geteilt
+        chat_model = genai.GenerativeModel(MODEL_NAME, system_instruction=self.system_prompt)
+        self.chat = chat_model.start_chat(history=history)
     
+    def _message_for(self, user_input: Optional[str]) -> str:
+        if self.chat is None:
+            self._start_chat([])
+        if not user_input:
+            # Erste Nachricht - Begrüßung
+            return GREETING_INSTRUCTION
+
+        # Füge User Input zur History hinzu
+        self.conversation_history.append(f"User: {user_input}")
+        self._last_user_input = user_input
+        return user_input
+
+    @staticmethod
+    def _generation_config():
+        return genai.types.GenerationConfig(
+            temperature=0.7,
+            max_output_tokens=150,  # Kurze Antworten erzwingen
+        )
+
+    def _handle_response(self, response) -> str:
+        agent_response = response.text.strip()
+        
+        # Füge zur History hinzu
+        self.conversation_history.append(f"Agent: {agent_response}")
+        self.outcome.observe(self._last_user_input, agent_response)
+        self._last_user_input = None
+
+        usage = getattr(response, "usage_metadata", None)
+        prompt_tokens = getattr(usage, "prompt_token_count", 0) or 0
+        if prompt_tokens > HISTORY_TOKEN_BUDGET and self._compression is None:
+            self._compression = _compression_pool.submit(
+                self._compress_history, list(self.chat.history), self.rolling_summary
+            )
+        
+        return agent_response
+
+    def _compress_history(self, history: list, rolling_summary: str) -> Optional[Tuple[str, int]]:
+        """
+        Ältere Turns + bisherige Zusammenfassung -> neue rolling_summary
+
+        Läuft im Thread-Pool auf einer Kopie der History, die Chat-Session
+        selbst tauscht erst _swap_compressed_chat() auf dem Antwortpfad.
+
+        Returns:
+            (Zusammenfassung, Anzahl zusammengefasster Nachrichten) oder None
+        """
+        # Immer ab einer User-Nachricht weitermachen, damit sich die Rollen abwechseln
+        cut = len(history) - KEEP_RECENT_MESSAGES
+        while cut > 0 and history[cut].role != "user":
+            cut -= 1
+        if cut <= 0:
+            return
+
+        older = "\n".join(
+            f"{'Agent' if content.role == 'model' else 'User'}: {''.join(part.text for part in content.parts)}"
+            for content in history[:cut]
+        )
+        prompt = f"""Fasse den bisherigen Verlauf eines Telefonats zur Terminbuchung knapp zusammen.
+Behalte alle genannten Termine, Uhrzeiten, Namen und offenen Fragen.
+
+BISHERIGE ZUSAMMENFASSUNG:
+{rolling_summary or "-"}
+
+NEUE GESPRÄCHSTEILE:
+{older}
+
+Maximal 5 kurze Sätze."""
+        response = self.model.generate_content(prompt, request_options={"timeout": LLM_TIMEOUT_SECONDS})
+        return response.text.strip(), cut
+
+    def _swap_compressed_chat(self):
+        """
+        Fertige Zusammenfassung übernehmen, eine laufende nie abwarten
+
+        Schlägt sie fehl, wird sie verworfen, der nächste Turn über dem
+        Budget startet eine neue.
+        """
+        future = self._compression
+        if future is None or not future.done():
+            return
+        self._compression = None
+        try:
+            result = future.result()
+        except Exception as e:
+            print(f"❌ Fehler beim Zusammenfassen der History: {e}")
+            return
+        if result is None or self.chat is None:
+            return
+
+        summary, cut = result
+        self.rolling_summary = summary
+        # Nachrichten, die während des Zusammenfassens dazukamen, bleiben erhalten
+        recent = list(self.chat.history)[cut:]
+        self._start_chat([
+            {"role": "user", "parts": [f"BISHERIGER GESPRÄCHSVERLAUF (Zusammenfassung):\n{summary}"]},
+            {"role": "model", "parts": ["Verstanden."]},
+            *recent,
+        ])
+
+    def _drop_compression(self):
+        if self._compression is not None:
+            # Läuft sie schon, wird ihr Ergebnis einfach nicht mehr abgeholt
+            self._compression.cancel()
+            self._compression = None
+
+    @staticmethod
+    def _fallback(user_input: Optional[str]) -> str:
+        if not user_input:
+            return "Guten Tag! Hier spricht der Termin-Service. Ich möchte einen Termin vereinbaren. Haben Sie einen Moment Zeit?"
+        else:
+            return "Entschuldigung, könnten Sie das bitte wiederholen?"
+
     def get_response(self, user_input: Optional[str] = None) -> str:
         """
         Generiere eine Antwort basierend auf User Input
@@ -99,92 +260,74 @@ Agent: "Perfekt! Mittwoch, 14 Uhr ist notiert. Vielen Dank und einen schönen Ta
         Returns:
             Die generierte Antwort des Agenten
         """
+        self._swap_compressed_chat()
+        message = self._message_for(user_input)
         
-        if not user_input:
-            # Erste Nachricht - Begrüßung
-            prompt = f"""{self.system_prompt}
-
-Generiere jetzt die ERSTE Begrüßung für den Anruf.
-Sei kurz, freundlich und erkläre den Grund des Anrufs.
-Maximal 2-3 kurze Sätze!"""
-        else:
-            # Füge User Input zur History hinzu
-            self.conversation_history.append(f"User: {user_input}")
-            
-            # Generiere Antwort basierend auf Konversation
-            history_text = "\n".join(self.conversation_history[-6:])  # Nur letzte 6 Nachrichten
+        try:
+            # Nur die neue Äußerung senden, Kontext liegt in der Chat-Session
+            response = self.chat.send_message(
+                message,
+                generation_config=self._generation_config(),
+                request_options={"timeout": LLM_TIMEOUT_SECONDS},
+            )
+            return self._handle_response(response)
             
-            prompt = f"""{self.system_prompt}
+        except Exception as e:
+            print(f"❌ Fehler bei LLM Call: {e}")
+            # Fallback
+            return self._fallback(user_input)
 
-BISHERIGE KONVERSATION:
-{history_text}
+    async def get_response_async(self, user_input: Optional[str] = None,
+                                 timeout: float = LLM_TIMEOUT_SECONDS) -> str:
+        """
+        Async Variante von get_response() für FastAPI/ASGI Handler
 
-User sagt jetzt: "{user_input}"
+        Nach timeout Sekunden wird der Gemini Call abgebrochen und der
+        Fallback-Satz zurückgegeben. Wird der aufrufende Task selbst
+        abgebrochen, wird CancelledError weitergereicht.
+        """
+        self._swap_compressed_chat()
+        message = self._message_for(user_input)
 
-Generiere eine passende, KURZE Antwort (maximal 2-3 kurze Sätze).
-Stelle nur EINE Frage.
-Wenn ein Termin bestätigt wurde, beende das Gespräch höflich."""
-        
         try:
-            # Generiere Antwort mit Gemini
-            response = self.model.generate_content(
-                prompt,
-                generation_config=genai.types.GenerationConfig(
-                    temperature=0.7,
-                    max_output_tokens=150,  # Kurze Antworten erzwingen
-                )
+            response = await asyncio.wait_for(
+                self.chat.send_message_async(
+                    message,
+                    generation_config=self._generation_config(),
+                ),
+                timeout=timeout,
             )
-            
-            agent_response = response.text.strip()
-            
-            # Füge zur History hinzu
-            self.conversation_history.append(f"Agent: {agent_response}")
-            
-            return agent_response
-            
+            return self._handle_response(response)
+
+        except asyncio.TimeoutError:
+            print(f"❌ LLM Call Timeout nach {timeout}s")
+            return self._fallback(user_input)
         except Exception as e:
             print(f"❌ Fehler bei LLM Call: {e}")
-            # Fallback
-            if not user_input:
-                return "Guten Tag! Hier spricht der Termin-Service. Ich möchte einen Termin vereinbaren. Haben Sie einen Moment Zeit?"
-            else:
-                return "Entschuldigung, könnten Sie das bitte wiederholen?"
+            return self._fallback(user_input)
     
     def get_conversation_summary(self) -> str:
         """
         Erstelle eine Zusammenfassung der Konversation
+
+        Das Ergebnis wird während des Gesprächs inkrementell gepflegt,
+        hier wird nur noch kurz auf ein eventuell laufendes Update gewartet.
         
         Returns:
             Zusammenfassung als String
         """
-        if not self.conversation_history:
-            return "Keine Konversation vorhanden."
-        
-        history_text = "\n".join(self.conversation_history)
-        
-        prompt = f"""Fasse diese Telefon-Konversation kurz zusammen:
-
-{history_text}
-
-Erstelle eine kurze Zusammenfassung mit:
-- Wurde ein Termin vereinbart? (Ja/Nein)
-- Wenn ja: Wann?
-- Besondere Notizen
-
-Maximal 3-4 Sätze."""
-        
-        try:
-            response = self.model.generate_content(prompt)
-            return response.text.strip()
-        except Exception as e:
-            print(f"❌ Fehler bei Summary: {e}")
-            return "Zusammenfassung konnte nicht erstellt werden."
+        return self.outcome.wait(SUMMARY_WAIT_SECONDS).summary_text()
     
     def reset(self):
         """Setze den Agent zurück für einen neuen Call"""
-        self.conversation_history = []
+        self._drop_compression()
+        self.conversation_history.clear()
         self.request_context = {}
         self.system_prompt = ""
+        self.rolling_summary = ""
+        self.chat = None
+        self.outcome = OutcomeTracker(self.model)
+        self._last_user_input = None
 
 
 # Test-Funktion
@@ -0,0 +1,110 @@
+"""
+Benchmark: Ranking von 100k synthetischen Anbietern um Karlsruhe
+Vergleicht die vektorisierte Stufe (allein und hinter der KD-Tree-Vorauswahl
+des ProviderDirectory) mit einer reinen Python-Schleife und prüft, dass alle
+dieselben Treffer liefern.
+
+    python llmcall_method/bench_ranking.py
+"""
+import math
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from llmcall_method.provider_directory import ProviderDirectory
+from llmcall_method.ranking import EARTH_RADIUS_KM, CandidateSet, normalize_phone
+
+PROVIDERS = 100_000
+QUERIES = 50
+RADIUS_KM = 10
+TOP_K = 10
+CENTER = (49.0069, 8.4037)   # Karlsruhe
+SPREAD_DEG = 1.0
+DUPLICATE_SHARE = 0.1        # Anteil Einträge mit bereits vergebener Nummer
+
+
+def synthetic_providers(count: int, seed: int = 42) -> list:
+    rng = random.Random(seed)
+    providers = []
+    for i in range(count):
+        if providers and rng.random() < DUPLICATE_SHARE:
+            # Gleiche Praxis, andere Schreibweise der Nummer
+            phone = "+49 " + normalize_phone(rng.choice(providers)["telefonnummer"])[1:]
+        else:
+            phone = f"0721 {i:06d}"
+        providers.append({
+            "name": f"Anbieter {i}",
+            "telefonnummer": phone,
+            "category": "Zahnarztpraxen",
+            "lat": CENTER[0] + rng.uniform(-SPREAD_DEG, SPREAD_DEG),
+            "lon": CENTER[1] + rng.uniform(-SPREAD_DEG, SPREAD_DEG),
+        })
+    return providers
+
+
+def rank_loop(lat: float, lon: float, providers: list, radius_km: float, k: int) -> list:
+    """Referenz: ein Kandidat nach dem anderen"""
+    hits = []
+    for provider in providers:
+        dlat = math.radians(provider["lat"] - lat)
+        dlon = math.radians(provider["lon"] - lon)
+        a = (math.sin(dlat / 2) ** 2
+             + math.cos(math.radians(lat)) * math.cos(math.radians(provider["lat"])) * math.sin(dlon / 2) ** 2)
+        distance = 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(min(a, 1.0)))
+        if distance <= radius_km:
+            hits.append((distance, provider))
+    hits.sort(key=lambda hit: hit[0])
+    seen = set()
+    results = []
+    for distance, provider in hits:
+        phone = normalize_phone(provider["telefonnummer"])
+        if phone in seen:
+            continue
+        seen.add(phone)
+        results.append({"name": provider["name"], "telefonnummer": provider["telefonnummer"],
+                        "distance_km": round(distance, 2)})
+        if len(results) == k:
+            break
+    return results
+
+
+def timed(fn, *args) -> tuple:
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, (time.perf_counter() - start) * 1000
+
+
+def main():
+    providers = synthetic_providers(PROVIDERS)
+    _, build_ms = timed(CandidateSet, providers)
+    candidates = CandidateSet(providers)
+    print(f"🏗️ CandidateSet für {PROVIDERS} Anbieter in {build_ms:.0f} ms")
+    directory, build_ms = timed(ProviderDirectory, providers)
+    print(f"🏗️ ProviderDirectory (KD-Tree + CandidateSet) in {build_ms:.0f} ms")
+
+    rng = random.Random(7)
+    queries = [(CENTER[0] + rng.uniform(-0.5, 0.5), CENTER[1] + rng.uniform(-0.5, 0.5)) for _ in range(QUERIES)]
+
+    tree_ms, vector_ms, loop_ms = [], [], []
+    for lat, lon in queries:
+        indexed, ms = timed(directory.nearest, "Zahnarztpraxen", lat, lon, RADIUS_KM, TOP_K)
+        tree_ms.append(ms)
+        fast, ms = timed(candidates.rank, lat, lon, RADIUS_KM, TOP_K)
+        vector_ms.append(ms)
+        slow, ms = timed(rank_loop, lat, lon, providers, RADIUS_KM, TOP_K)
+        loop_ms.append(ms)
+        assert [c["name"] for c in fast] == [c["name"] for c in slow], (lat, lon)
+        assert [c["name"] for c in indexed] == [c["name"] for c in slow], (lat, lon)
+
+    print(f"🌳 KD-Tree + NumPy: p50 {statistics.median(tree_ms):.2f} ms, max {max(tree_ms):.2f} ms")
+    print(f"⚡ NumPy:  p50 {statistics.median(vector_ms):.2f} ms, max {max(vector_ms):.2f} ms")
+    print(f"🐢 Python: p50 {statistics.median(loop_ms):.2f} ms, max {max(loop_ms):.2f} ms")
+    print(f"✅ {QUERIES} Queries identisch, Faktor {statistics.median(loop_ms) / statistics.median(vector_ms):.0f}x")
+
+
+if __name__ == "__main__":
+    main()
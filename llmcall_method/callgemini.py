@@ -1,36 +1,52 @@
 import os
 import json
+import asyncio
 from dotenv import load_dotenv
-import google.generativeai as genai
-from supabase import create_client
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from clients.registry import get_gemini_model, get_supabase_client
+from llmcall_method.lookup_cache import contact_cache
+from llmcall_method.provider_directory import get_provider_directory
+from llmcall_method.records import get_request
+from llmcall_method.service_classifier import get_service_classifier
 
 load_dotenv()
 
-def get_supabase_client():
-    url = os.environ.get("NEXT_PUBLIC_SUPABASE_URL")
-    key = os.environ.get("NEXT_PUBLIC_SUPABASE_ANON_KEY")
-    if not url or not key:
-         # Fallback to standard env vars if NEXT_PUBLIC aliases are not used
-        url = os.environ.get("SUPABASE_URL")
-        key = os.environ.get("SUPABASE_KEY")
-    
-    if not url or not key:
-        raise ValueError("Supabase URL or Key not set in environment variables.")
-    return create_client(url, key)
+# Obergrenze pro Gemini Call, danach wird abgebrochen
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "20"))
 
-def generate_response(prompt):
-    api_key = os.environ.get("GOOGLE_API_KEY")
-    if not api_key:
-        raise ValueError("GOOGLE_API_KEY is not set in environment variables.")
+def generate_response(prompt, timeout=LLM_TIMEOUT_SECONDS):
+    # 1. LLM-Request mit Gemini (kostenlos!) - Modell wird pro Prozess nur einmal gebaut
+    model = get_gemini_model('gemini-2.5-flash')
+    response = model.generate_content(prompt, request_options={"timeout": timeout})
+    return response.text
 
-    # Gemini konfigurieren
-    genai.configure(api_key=api_key)
-    
-    # 1. LLM-Request mit Gemini (kostenlos!)
-    model = genai.GenerativeModel('gemini-2.5-flash')
-    response = model.generate_content(prompt)
+async def generate_response_async(prompt, timeout=LLM_TIMEOUT_SECONDS):
+    """
+    Async Variante von generate_response()
+
+    Wird der aufrufende Task abgebrochen oder läuft timeout ab, wird auch
+    der Gemini Request abgebrochen (asyncio.TimeoutError bzw. CancelledError).
+    """
+    model = get_gemini_model('gemini-2.5-flash')
+    response = await asyncio.wait_for(model.generate_content_async(prompt), timeout=timeout)
     return response.text
 
+def generate_response_stream(prompt):
+    """Wie generate_response(), liefert den Text aber stückweise während Gemini generiert"""
+    model = get_gemini_model('gemini-2.5-flash')
+    for chunk in model.generate_content(prompt, stream=True, request_options={"timeout": LLM_TIMEOUT_SECONDS}):
+        try:
+            text = chunk.text
+        except ValueError:
+            # Chunk ohne Text-Parts (z.B. nur finish_reason)
+            continue
+        if text:
+            yield text
+
 def extract_service_type(description: str) -> str:
     """
     Extrahiert den Service-Typ aus der Description
@@ -41,78 +57,11 @@ def extract_service_type(description: str) -> str:
     Returns:
         Service type string (e.g., "Arztpraxen", "Zahnarztpraxen")
     """
-    description_lower = description.lower()
-    
-    # Keyword Mapping
-    keywords = {
-        'zahnarzt': 'Zahnarztpraxen',
-        'zahn': 'Zahnarztpraxen',
-        'arzt': 'Arztpraxen',
-        'hausarzt': 'Hausarztpraxen',
-        'allgemeinmedizin': 'Arztpraxen',
-        'friseur': 'Friseursalons',
-        'frisör': 'Friseursalons',
-        'haare': 'Friseursalons',
-        'klempner': 'Klempner',
-        'sanitär': 'Klempner',
-        'elektriker': 'Elektriker',
-        'elektro': 'Elektriker',
-        'mechaniker': 'Autowerkstätten',
-        'werkstatt': 'Autowerkstätten',
-        'auto': 'Autowerkstätten',
-        'restaurant': 'Restaurants',
-        'essen': 'Restaurants',
-        'physiotherapie': 'Physiotherapiepraxen',
-        'physio': 'Physiotherapiepraxen',
-        'massage': 'Massagepraxen',
-        'apotheke': 'Apotheken',
-    }
-    
-    # Suche nach Keywords
-    for keyword, service in keywords.items():
-        if keyword in description_lower:
-            return service
-    
-    # Fallback
-    return 'Dienstleister'
+    # Alle Keywords in einem Durchlauf, längster Treffer gewinnt
+    return get_service_classifier().classify(description)
 
-def getcontactinfo(street: str, postal_code: str, description: str, radius_km: int = 10) -> list:
-    """
-    Findet Kontakte in der Nähe basierend auf Description
-    
-    Args:
-        street: Straßenname
-        postal_code: Postleitzahl
-        description: Beschreibung des gewünschten Services
-        radius_km: Suchradius in Kilometern (5, 10, 20)
-        
-    Returns:
-        Liste von Kontakten mit Name und Telefonnummer
-    """
-    
-    load_dotenv()
-    
-    # Gemini konfigurieren
-    api_key = os.environ.get("GOOGLE_API_KEY")
-    if not api_key:
-        raise ValueError("GOOGLE_API_KEY is not set in environment variables.")
-    
-    genai.configure(api_key=api_key)
-    
-    # Service-Typ extrahieren
-    service_type = extract_service_type(description)
-    
-    print("\n" + "="*70)
-    print("🔍 CONTACT SEARCH")
-    print("="*70)
-    print(f"📍 Location: {street}, {postal_code}")
-    print(f"🎯 Service Type: {service_type}")
-    print(f"📏 Radius: {radius_km} km")
-    print(f"📝 Description: {description}")
-    print("="*70)
-    
-    # Prompt erstellen
-    prompt = f"""Gebe in einem JSON Format ohne sonstigen Inhalt die 10 {service_type} zurück, 
+def _contact_prompt(street: str, postal_code: str, service_type: str, radius_km: int) -> str:
+    return f"""Gebe in einem JSON Format ohne sonstigen Inhalt die 10 {service_type} zurück, 
 die von der Entfernung am kürzesten von {street} in {postal_code} entfernt sind 
 (maximal {radius_km} km Radius).
 
@@ -127,17 +76,25 @@ Beispiel Format:
 ]
 
 Gebe NUR das JSON Array zurück, keine zusätzlichen Erklärungen."""
-    
+
+
+def _log_contact_search(street, postal_code, service_type, radius_km, description, prompt):
+    print("\n" + "="*70)
+    print("🔍 CONTACT SEARCH")
+    print("="*70)
+    print(f"📍 Location: {street}, {postal_code}")
+    print(f"🎯 Service Type: {service_type}")
+    print(f"📏 Radius: {radius_km} km")
+    print(f"📝 Description: {description}")
+    print("="*70)
+
     print("\n📤 PROMPT:")
     print("-"*70)
     print(prompt)
     print("-"*70)
-    
-    # LLM Call
-    model = genai.GenerativeModel('gemini-2.5-flash')
-    response = model.generate_content(prompt)
-    llm_result = response.text
-    
+
+
+def _parse_contacts(llm_result: str) -> list:
     print("\n📥 GEMINI RAW OUTPUT:")
     print("-"*70)
     print(llm_result)
@@ -181,8 +138,101 @@ Gebe NUR das JSON Array zurück, keine zusätzlichen Erklärungen."""
     return extracted_data
 
 
-def generate_llm_reply(user_input, history):
-    prompt = f"""
+def contact_cache_key(street: str, postal_code: str, service_type: str, radius_km: int) -> tuple:
+    return (service_type, postal_code.strip(), " ".join(street.lower().split()), int(radius_km))
+
+
+def _directory_lookup(service_type: str, postal_code: str, radius_km: int, lat=None, lon=None) -> list:
+    """
+    Fragt zuerst das lokale Anbieter-Verzeichnis
+
+    Returns:
+        Treffer oder [] (kein Verzeichnis, keine Koordinaten, nichts im Radius)
+    """
+    directory = get_provider_directory()
+    if directory is None:
+        return []
+    if lat is None or lon is None:
+        located = directory.locate(postal_code)
+        if located is None:
+            return []
+        lat, lon = located
+    contacts = directory.nearest(service_type, lat, lon, radius_km, k=10)
+    if contacts:
+        print(f"📒 {len(contacts)} {service_type} aus dem Verzeichnis (kein LLM Call)")
+    return contacts
+
+
+def getcontactinfo(street: str, postal_code: str, description: str, radius_km: int = 10,
+                   lat=None, lon=None) -> list:
+    """
+    Findet Kontakte in der Nähe basierend auf Description
+    
+    Args:
+        street: Straßenname
+        postal_code: Postleitzahl
+        description: Beschreibung des gewünschten Services
+        radius_km: Suchradius in Kilometern (5, 10, 20)
+        lat, lon: Koordinaten des Users (falls bekannt) für das Verzeichnis
+        
+    Returns:
+        Liste von Kontakten mit Name und Telefonnummer
+    """
+    service_type = extract_service_type(description)
+
+    # 1. Lokales Verzeichnis (Millisekunden), nur bei Miss -> LLM
+    contacts = _directory_lookup(service_type, postal_code, radius_km, lat, lon)
+    if contacts:
+        return contacts
+
+    def lookup():
+        prompt = _contact_prompt(street, postal_code, service_type, radius_km)
+        _log_contact_search(street, postal_code, service_type, radius_km, description, prompt)
+        
+        # LLM Call
+        llm_result = generate_response(prompt)
+        return _parse_contacts(llm_result)
+
+    # Gleiche Kategorie am gleichen Ort -> Cache bzw. ein gemeinsamer LLM Call
+    key = contact_cache_key(street, postal_code, service_type, radius_km)
+    return contact_cache.get_or_compute(key, lookup)
+
+
+async def getcontactinfo_async(street: str, postal_code: str, description: str, radius_km: int = 10,
+                               timeout: float = LLM_TIMEOUT_SECONDS, limiter=None, lat=None, lon=None) -> list:
+    """
+    Async Variante von getcontactinfo() - blockiert den Event Loop nicht
+
+    Args:
+        limiter: optionales asyncio.Semaphore, begrenzt nur echte LLM Calls
+            (Cache-Treffer und gebündelte Anfragen belegen keinen Slot)
+
+    Raises:
+        asyncio.TimeoutError wenn Gemini länger als timeout braucht
+    """
+    service_type = extract_service_type(description)
+
+    contacts = _directory_lookup(service_type, postal_code, radius_km, lat, lon)
+    if contacts:
+        return contacts
+
+    async def lookup():
+        prompt = _contact_prompt(street, postal_code, service_type, radius_km)
+        _log_contact_search(street, postal_code, service_type, radius_km, description, prompt)
+
+        if limiter is None:
+            llm_result = await generate_response_async(prompt, timeout=timeout)
+        else:
+            async with limiter:
+                llm_result = await generate_response_async(prompt, timeout=timeout)
+        return _parse_contacts(llm_result)
+
+    key = contact_cache_key(street, postal_code, service_type, radius_km)
+    return await contact_cache.get_or_compute_async(key, lookup)
+
+
+def _reply_prompt(user_input, history):
+    return f"""
     You are a personal AI assistant calling a service provider (e.g., doctor's office, craftsman).
     Goal: Schedule an appointment for your client.
     
@@ -196,7 +246,18 @@ def generate_llm_reply(user_input, history):
 
     History: {history}
     """
-    return generate_response(prompt)
+
+
+def generate_llm_reply(user_input, history):
+    return generate_response(_reply_prompt(user_input, history))
+
+
+async def generate_llm_reply_async(user_input, history, timeout=LLM_TIMEOUT_SECONDS):
+    return await generate_response_async(_reply_prompt(user_input, history), timeout=timeout)
+
+
+def generate_llm_reply_stream(user_input, history):
+    return generate_response_stream(_reply_prompt(user_input, history))
 
 
 def generate_llm_start(request_id, title=None, description=None):
@@ -208,11 +269,8 @@ def generate_llm_start(request_id, title=None, description=None):
     # 2. Sonst DB-Lookup (falls ID vorhanden)
     elif request_id:
         try:
-            supabase = get_supabase_client()
-            response = supabase.table('requests').select('*').eq('id', request_id).execute()
-            
-            if response.data:
-                request_data = response.data[0]
+            # Read-through Cache (nur id, title, description)
+            request_data = get_request(request_id) or {}
         except Exception as e:
             print(f"Error fetching request: {e}")
             
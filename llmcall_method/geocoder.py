@@ -0,0 +1,331 @@
+"""
+Offline Geocoder: PLZ (und optional Straße) -> lat/lon
+Die Tabelle liegt als kompakte, sortierte Binärdatei vor und wird per mmap
+gelesen, Lookups sind eine binäre Suche ohne Netzwerk.
+
+Quelle ist eine CSV mit den Spalten postal_code, lat, lon und optional
+street (Zeilen mit street = Straßen-Mittelpunkt, ohne = PLZ-Mittelpunkt).
+Die Tabelle liegt nicht im Repo (Lizenz/Größe). PLZ-Mittelpunkte lassen sich
+aus dem GeoNames-Export erzeugen (https://download.geonames.org/export/zip/DE.zip,
+CC BY 4.0), Straßen-Mittelpunkte z.B. aus einem OSM-Extrakt:
+
+    python llmcall_method/geocoder.py geonames DE.txt data/postal_centroids.csv
+    python llmcall_method/geocoder.py build data/postal_centroids.csv data/geocoder.bin
+
+Ohne Tabelle liefert get_geocoder() None und die Kontaktsuche fällt auf das
+PLZ-Mittel des Anbieter-Verzeichnisses bzw. das LLM zurück. Das Backend lädt
+(und baut bei Bedarf) die Tabelle beim Start in einem Thread, load_geocoder_async().
+"""
+import csv
+import mmap
+import os
+import struct
+import sys
+import threading
+import zlib
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+DATA_DIR = Path(__file__).resolve().parents[1] / "data"
+DEFAULT_INDEX_PATH = os.getenv("GEOCODER_INDEX_PATH", str(DATA_DIR / "geocoder.bin"))
+DEFAULT_CSV_PATH = os.getenv("GEOCODER_CSV_PATH", str(DATA_DIR / "postal_centroids.csv"))
+USER_CACHE_SIZE = int(os.getenv("GEOCODER_USER_CACHE_SIZE", "10000"))
+
+MAGIC = b"GEO1"
+HEADER = struct.Struct("<4sII")          # magic, Anzahl PLZ, Anzahl Straßen
+POSTAL_RECORD = struct.Struct("<Iff")    # plz, lat, lon
+STREET_RECORD = struct.Struct("<IIff")   # plz, crc32(straße), lat, lon
+
+
+def normalize_street(street: str) -> str:
+    """'Nancystr. 12' / 'Nancystraße' -> 'nancystrasse'"""
+    street = street.lower().replace("ß", "ss")
+    street = "".join(c for c in street if not c.isdigit()).strip()
+    if street.endswith("str."):
+        street = street[:-4] + "strasse"
+    elif street.endswith("str"):
+        street = street[:-3] + "strasse"
+    return "".join(c for c in street if c.isalnum())
+
+
+def _postal_key(postal_code: str) -> Optional[int]:
+    postal_code = (postal_code or "").strip()
+    if not postal_code.isdigit():
+        return None
+    return int(postal_code)
+
+
+def _street_hash(street: str) -> int:
+    return zlib.crc32(normalize_street(street).encode("utf-8"))
+
+
+def import_geonames(txt_path: str, csv_path: str) -> int:
+    """
+    GeoNames Postleitzahlen-Export (DE.txt, tab-getrennt) -> PLZ-Mittelpunkte als CSV
+
+    Eine PLZ kann mehrere Orte haben, deren Koordinaten werden gemittelt.
+
+    Returns:
+        Anzahl PLZ
+    """
+    sums: Dict[str, List[float]] = {}
+    with open(txt_path, encoding="utf-8") as f:
+        for line in f:
+            fields = line.rstrip("\n").split("\t")
+            if len(fields) < 11 or _postal_key(fields[1]) is None:
+                continue
+            try:
+                lat, lon = float(fields[9]), float(fields[10])
+            except ValueError:
+                continue
+            acc = sums.setdefault(fields[1].strip(), [0.0, 0.0, 0])
+            acc[0] += lat
+            acc[1] += lon
+            acc[2] += 1
+
+    with open(csv_path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["postal_code", "lat", "lon"])
+        for postal_code, (lat, lon, count) in sorted(sums.items()):
+            writer.writerow([postal_code, round(lat / count, 6), round(lon / count, 6)])
+    return len(sums)
+
+
+def build_index(csv_path: str, index_path: str) -> Tuple[int, int]:
+    """
+    Baut die Binärdatei aus der CSV
+
+    Returns:
+        (Anzahl PLZ, Anzahl Straßen)
+    """
+    postal: Dict[int, Tuple[float, float]] = {}
+    streets: Dict[Tuple[int, int], Tuple[float, float]] = {}
+    with open(csv_path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            key = _postal_key(row.get("postal_code", ""))
+            try:
+                lat, lon = float(row["lat"]), float(row["lon"])
+            except (KeyError, TypeError, ValueError):
+                continue
+            if key is None:
+                continue
+            street = (row.get("street") or "").strip()
+            if street:
+                streets[(key, _street_hash(street))] = (lat, lon)
+            else:
+                postal[key] = (lat, lon)
+
+    tmp_path = index_path + ".tmp"
+    os.makedirs(os.path.dirname(os.path.abspath(index_path)), exist_ok=True)
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, len(postal), len(streets)))
+        for key in sorted(postal):
+            f.write(POSTAL_RECORD.pack(key, *postal[key]))
+        for key in sorted(streets):
+            f.write(STREET_RECORD.pack(key[0], key[1], *streets[key]))
+    os.replace(tmp_path, index_path)
+    return len(postal), len(streets)
+
+
+class Geocoder:
+    """Liest die Binärdatei per mmap, nichts davon liegt als Python-Objekte im Speicher"""
+
+    def __init__(self, index_path: str):
+        self._file = open(index_path, "rb")
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.postal_count, self.street_count = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{index_path} is not a geocoder index")
+        self._postal_offset = HEADER.size
+        self._street_offset = self._postal_offset + self.postal_count * POSTAL_RECORD.size
+
+    def _find_postal(self, key: int) -> Optional[Tuple[float, float]]:
+        lo, hi = 0, self.postal_count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            plz, lat, lon = POSTAL_RECORD.unpack_from(self._mm, self._postal_offset + mid * POSTAL_RECORD.size)
+            if plz == key:
+                return lat, lon
+            if plz < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return None
+
+    def _find_street(self, key: int, street_hash: int) -> Optional[Tuple[float, float]]:
+        target = (key, street_hash)
+        lo, hi = 0, self.street_count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            plz, h, lat, lon = STREET_RECORD.unpack_from(self._mm, self._street_offset + mid * STREET_RECORD.size)
+            if (plz, h) == target:
+                return lat, lon
+            if (plz, h) < target:
+                lo = mid + 1
+            else:
+                hi = mid
+        return None
+
+    def geocode(self, street: str, postal_code: str) -> Optional[Tuple[float, float]]:
+        """Straßen-Mittelpunkt, sonst PLZ-Mittelpunkt, sonst None"""
+        key = _postal_key(postal_code)
+        if key is None:
+            return None
+        if street and self.street_count:
+            found = self._find_street(key, _street_hash(street))
+            if found:
+                return found
+        return self._find_postal(key)
+
+    def geocode_batch(self, addresses: Iterable[Tuple[str, str]]) -> List[Optional[Tuple[float, float]]]:
+        """Viele (street, postal_code) auf einmal, gleiche Adressen nur einmal"""
+        seen: Dict[Tuple[str, str], Optional[Tuple[float, float]]] = {}
+        results = []
+        for street, postal_code in addresses:
+            key = (normalize_street(street or ""), (postal_code or "").strip())
+            if key not in seen:
+                seen[key] = self.geocode(street, postal_code)
+            results.append(seen[key])
+        return results
+
+
+class UserLocationCache:
+    """
+    Koordinaten pro user_id, gültig solange sich die Adresse nicht ändert
+
+    Der Fingerprint aus Straße/Hausnummer/PLZ/Stadt wird bei jedem Zugriff
+    verglichen -> eine geänderte Profiladresse invalidiert automatisch.
+    """
+
+    def __init__(self, max_entries: int = USER_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[tuple, Optional[Tuple[float, float]]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def fingerprint(profile: dict) -> tuple:
+        return tuple(
+            (profile.get(field) or "").strip().lower()
+            for field in ("street", "house_number", "postal_code", "city")
+        )
+
+    def get(self, user_id: str, profile: dict):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None or entry[0] != self.fingerprint(profile):
+                return False, None
+            self._entries.move_to_end(user_id)
+            return True, entry[1]
+
+    def put(self, user_id: str, profile: dict, coords: Optional[Tuple[float, float]]):
+        with self._lock:
+            self._entries[user_id] = (self.fingerprint(profile), coords)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: str):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+
+_geocoder: Optional[Geocoder] = None
+_geocoder_loaded = False
+_geocoder_lock = threading.Lock()
+_geocoder_loader: Optional[threading.Thread] = None
+user_locations = UserLocationCache()
+
+
+def get_geocoder() -> Optional[Geocoder]:
+    """
+    Geocoder aus GEOCODER_INDEX_PATH, wird bei Bedarf aus GEOCODER_CSV_PATH gebaut
+
+    Returns:
+        None, wenn keine Tabelle vorhanden ist oder sie gerade im
+        Hintergrund geladen wird (Aufrufer im Event Loop warten nicht)
+    """
+    global _geocoder, _geocoder_loaded
+    if not _geocoder_loaded:
+        loader = _geocoder_loader
+        if loader is not None and loader.is_alive() and loader is not threading.current_thread():
+            return None
+        with _geocoder_lock:
+            if not _geocoder_loaded:
+                try:
+                    if not os.path.exists(DEFAULT_INDEX_PATH) and os.path.exists(DEFAULT_CSV_PATH):
+                        counts = build_index(DEFAULT_CSV_PATH, DEFAULT_INDEX_PATH)
+                        print(f"🗺️ Geocoder index built: {counts[0]} postal codes, {counts[1]} streets")
+                    if os.path.exists(DEFAULT_INDEX_PATH):
+                        _geocoder = Geocoder(DEFAULT_INDEX_PATH)
+                except Exception as e:
+                    print(f"❌ Could not load geocoder: {e}")
+                _geocoder_loaded = True
+    return _geocoder
+
+
+def load_geocoder_async() -> threading.Thread:
+    """Beim Start aufrufen: Tabelle im Hintergrund laden bzw. aus der CSV bauen"""
+    global _geocoder_loader
+    with _geocoder_lock:
+        if _geocoder_loader is None:
+            _geocoder_loader = threading.Thread(target=get_geocoder, name="geocoder-load", daemon=True)
+            _geocoder_loader.start()
+        return _geocoder_loader
+
+
+def geocode_profile(user_id: str, profile: dict) -> Optional[Tuple[float, float]]:
+    """lat/lon für ein Profil, gecacht pro user_id"""
+    found, coords = user_locations.get(user_id, profile)
+    if found:
+        return coords
+    geocoder = get_geocoder()
+    if geocoder is None:
+        return None
+    coords = geocoder.geocode(profile.get("street") or "", profile.get("postal_code") or "")
+    user_locations.put(user_id, profile, coords)
+    return coords
+
+
+def geocode_profiles(profiles: Iterable[dict]) -> Dict[str, Optional[Tuple[float, float]]]:
+    """
+    Batch-Variante für viele Profile (z.B. Onboarding-Import)
+
+    Returns:
+        user_id -> (lat, lon) oder None
+    """
+    profiles = list(profiles)
+    results: Dict[str, Optional[Tuple[float, float]]] = {}
+    missing = []
+    for profile in profiles:
+        found, coords = user_locations.get(profile["user_id"], profile)
+        if found:
+            results[profile["user_id"]] = coords
+        else:
+            missing.append(profile)
+
+    geocoder = get_geocoder()
+    if geocoder is None:
+        results.update({profile["user_id"]: None for profile in missing})
+        return results
+
+    coords_list = geocoder.geocode_batch(
+        (profile.get("street") or "", profile.get("postal_code") or "") for profile in missing
+    )
+    for profile, coords in zip(missing, coords_list):
+        user_locations.put(profile["user_id"], profile, coords)
+        results[profile["user_id"]] = coords
+    return results
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 4 and sys.argv[1] == "build":
+        postal_count, street_count = build_index(sys.argv[2], sys.argv[3])
+        print(f"✅ {postal_count} postal codes, {street_count} streets -> {sys.argv[3]}")
+    elif len(sys.argv) == 4 and sys.argv[1] == "geonames":
+        postal_count = import_geonames(sys.argv[2], sys.argv[3])
+        print(f"✅ {postal_count} postal codes -> {sys.argv[3]}")
+    else:
+        print("Usage: python llmcall_method/geocoder.py build <centroids.csv> <index.bin>")
+        print("       python llmcall_method/geocoder.py geonames <DE.txt> <centroids.csv>")
@@ -0,0 +1,178 @@
+"""
+TTL/LRU Cache mit Single-Flight für teure Lookups (z.B. Gemini Kontaktsuche)
+N gleichzeitige identische Anfragen lösen genau einen LLM Call aus
+"""
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+
+class LookupCache:
+    """
+    Ergebnis-Cache mit TTL und maximaler Größe (LRU)
+
+    Während ein Key berechnet wird, warten weitere Anfragen auf dasselbe
+    Ergebnis statt selbst zu rechnen. Fehler werden nicht gecacht.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 3600,
+                 should_cache: Callable[[Any], bool] = lambda value: True):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.should_cache = should_cache
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._inflight: Dict[Hashable, "_Flight"] = {}
+        self._inflight_async: Dict[tuple, asyncio.Task] = {}
+
+    def _lookup_locked(self, key) -> tuple:
+        entry = self._entries.get(key)
+        if entry is None:
+            return False, None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return False, None
+        self._entries.move_to_end(key)
+        return True, value
+
+    def _store(self, key, value):
+        if not self.should_cache(value):
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def put(self, key, value):
+        """Von außen geladenen Wert übernehmen (z.B. aus einer Bulk-Query)"""
+        self._store(key, value)
+
+    def get(self, key) -> Optional[Any]:
+        with self._lock:
+            return self._lookup_locked(key)[1]
+
+    def invalidate(self, key=None):
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def get_or_compute(self, key, compute: Callable[[], Any]) -> Any:
+        """Sync Variante (Flask / Threads)"""
+        with self._lock:
+            found, value = self._lookup_locked(key)
+            if found:
+                self.hits += 1
+                return value
+            flight = self._inflight.get(key)
+            if flight is None:
+                flight = self._inflight[key] = _Flight()
+                leader = True
+                self.misses += 1
+            else:
+                leader = False
+                self.coalesced += 1
+
+        if not leader:
+            return flight.wait()
+
+        try:
+            value = compute()
+            self._store(key, value)
+            flight.resolve(value=value)
+            return value
+        except BaseException as e:
+            flight.resolve(error=e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    async def get_or_compute_async(self, key, compute: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Async Variante (FastAPI): Wartende blockieren den Event Loop nicht
+
+        Die Berechnung läuft in einem eigenen Task. Bricht ein Aufrufer ab
+        (auch der erste), rechnet der Task für alle anderen weiter.
+        """
+        loop = asyncio.get_running_loop()
+        flight_key = (id(loop), key)
+        with self._lock:
+            found, value = self._lookup_locked(key)
+            if found:
+                self.hits += 1
+                return value
+            task = self._inflight_async.get(flight_key)
+            if task is None:
+                task = loop.create_task(self._compute_async(flight_key, key, compute))
+                task.add_done_callback(_retrieve_exception)
+                self._inflight_async[flight_key] = task
+                self.misses += 1
+            else:
+                self.coalesced += 1
+
+        return await asyncio.shield(task)
+
+    async def _compute_async(self, flight_key, key, compute: Callable[[], Awaitable[Any]]) -> Any:
+        try:
+            value = await compute()
+            self._store(key, value)
+            return value
+        finally:
+            with self._lock:
+                self._inflight_async.pop(flight_key, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses + self.coalesced
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                # Coalesced Anfragen haben auch keinen eigenen LLM Call ausgelöst
+                "hit_rate": (self.hits + self.coalesced) / lookups if lookups else 0.0,
+            }
+
+
+def _retrieve_exception(task: asyncio.Task):
+    # Fehler gilt als abgerufen, auch wenn alle Wartenden schon abgebrochen haben
+    if not task.cancelled():
+        task.exception()
+
+
+class _Flight:
+    def __init__(self):
+        self._event = threading.Event()
+        self._value = None
+        self._error: Optional[BaseException] = None
+
+    def resolve(self, value=None, error=None):
+        self._value = value
+        self._error = error
+        self._event.set()
+
+    def wait(self):
+        self._event.wait()
+        if self._error is not None:
+            raise self._error
+        return self._value
+
+
+# Kontaktsuche: leere Ergebnisse (z.B. JSON nicht parsebar) nicht cachen
+contact_cache = LookupCache(
+    max_entries=int(os.getenv("CONTACT_CACHE_MAX_ENTRIES", "2048")),
+    ttl_seconds=float(os.getenv("CONTACT_CACHE_TTL_SECONDS", str(24 * 3600))),
+    should_cache=bool,
+)
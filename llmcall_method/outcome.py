@@ -0,0 +1,215 @@
+"""
+Inkrementelle Gesprächs-Zusammenfassung als strukturiertes Ergebnis
+Nach jedem Turn wird im Hintergrund (nicht auf dem Antwortpfad) der
+bisherige Stand + nur die neuen Zeilen an Gemini geschickt. Beim Auflegen
+liegt das Ergebnis damit schon vor, die Kosten pro Turn sind konstant.
+"""
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, fields, replace
+from typing import Callable, List, Optional
+
+import google.generativeai as genai
+
+from clients.registry import get_gemini_model
+
+
+OUTCOME_MODEL = os.getenv("OUTCOME_MODEL", "gemini-2.5-flash")
+OUTCOME_TIMEOUT_SECONDS = float(os.getenv("OUTCOME_TIMEOUT_SECONDS", "15"))
+# Höchstens so viele neue Turns pro Update, der Rest folgt im nächsten Update
+MAX_PENDING_TURNS = 4
+# Fehlgeschlagene Updates so oft wiederholen, danach mit dem nächsten Turn erneut
+OUTCOME_RETRIES = 2
+# Exponentieller Backoff mit Full Jitter zwischen den Versuchen (wie im Dialer)
+OUTCOME_BACKOFF_BASE_SECONDS = 0.5
+OUTCOME_BACKOFF_MAX_SECONDS = 8.0
+
+_outcome_pool = ThreadPoolExecutor(max_workers=int(os.getenv("OUTCOME_WORKERS", "4")),
+                                   thread_name_prefix="outcome")
+
+
+@dataclass
+class CallOutcome:
+    """Ergebnis eines Anrufs, wie es nach dem letzten Turn aussieht"""
+    booked: bool = False
+    slot: Optional[str] = None
+    callback_requested: bool = False
+    notes: str = ""
+    turns: int = 0
+    # So viele Turns sind schon im Stand verarbeitet (< turns: Update läuft noch)
+    covered_turns: int = 0
+
+    @property
+    def settled(self) -> bool:
+        return self.covered_turns >= self.turns
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: Optional[dict]) -> "CallOutcome":
+        known = {f.name for f in fields(cls)}
+        return cls(**{k: v for k, v in (data or {}).items() if k in known})
+
+    def summary_text(self) -> str:
+        """Kurzfassung wie bisher von get_conversation_summary()"""
+        if not self.turns:
+            return "Keine Konversation vorhanden."
+        parts = [f"Termin vereinbart: {'Ja' if self.booked else 'Nein'}"]
+        if self.slot:
+            parts.append(f"Wann: {self.slot}")
+        if self.callback_requested:
+            parts.append("Rückruf erbeten")
+        if self.notes:
+            parts.append(f"Notizen: {self.notes}")
+        return ". ".join(parts) + "."
+
+
+def _update_prompt(outcome: CallOutcome, lines: List[str]) -> str:
+    state = {k: v for k, v in outcome.to_dict().items() if k not in ("turns", "covered_turns")}
+    new_lines = "\n".join(lines)
+    return f"""Du verfolgst ein laufendes Telefonat zur Terminbuchung.
+
+BISHERIGER STAND (JSON):
+{json.dumps(state, ensure_ascii=False)}
+
+NEUE GESPRÄCHSZEILEN:
+{new_lines}
+
+Aktualisiere den Stand anhand der neuen Zeilen und antworte NUR mit JSON:
+{{"booked": true/false, "slot": "Datum/Uhrzeit oder null", "callback_requested": true/false, "notes": "max. 2 kurze Sätze"}}
+booked ist nur true, wenn ein konkreter Termin bestätigt wurde."""
+
+
+def _parse_outcome(raw: str, previous: CallOutcome) -> CallOutcome:
+    start, end = raw.find("{"), raw.rfind("}") + 1
+    if start == -1 or end == 0:
+        raise ValueError(f"No JSON object in outcome response: {raw[:80]!r}")
+    data = json.loads(raw[start:end])
+    return CallOutcome(
+        booked=bool(data.get("booked", previous.booked)),
+        # slot: null heißt Termin wieder offen, nur ein fehlender Key behält den alten
+        slot=(data["slot"] or None) if "slot" in data else previous.slot,
+        callback_requested=bool(data.get("callback_requested", previous.callback_requested)),
+        notes=str(data.get("notes") or previous.notes),
+        turns=previous.turns,
+        covered_turns=previous.covered_turns,
+    )
+
+
+class OutcomeTracker:
+    """
+    Hält das CallOutcome eines Anrufs aktuell
+
+    observe() kehrt sofort zurück. Läuft gerade ein Update, werden neue
+    Turns gesammelt und im nächsten Update gemeinsam verarbeitet, pro Call
+    ist also immer höchstens ein Gemini Call unterwegs. Kein Turn geht
+    verloren: zu viele werden auf mehrere Updates verteilt, ein
+    fehlgeschlagenes Update behält seine Turns für den nächsten Versuch.
+
+    on_update bekommt jeden Stand, auch direkt nach observe() (dann mit
+    covered_turns < turns). Wer das Ergebnis beim Auflegen liest, sieht
+    daran, ob noch ein Update aussteht.
+    """
+
+    def __init__(self, model=None, on_update: Optional[Callable[[CallOutcome], None]] = None,
+                 outcome: Optional[CallOutcome] = None):
+        self.model = model
+        self.on_update = on_update
+        self.outcome = outcome or CallOutcome()
+        # Ein Eintrag pro Turn (Zeilen von Gegenüber + Agent)
+        self._pending: List[List[str]] = []
+        self._lock = threading.Lock()
+        # Hält die Reihenfolge der on_update-Aufrufe gleich der der Stände
+        self._publish_lock = threading.Lock()
+        self._idle = threading.Event()
+        self._idle.set()
+
+    def _get_model(self):
+        if self.model is None:
+            self.model = get_gemini_model(OUTCOME_MODEL)
+        return self.model
+
+    def observe(self, caller_text: Optional[str], agent_text: Optional[str]):
+        """Einen Turn (Gegenüber + Agent) vormerken und Update anstoßen"""
+        lines = []
+        if caller_text:
+            lines.append(f"Gegenüber: {caller_text}")
+        if agent_text:
+            lines.append(f"Agent: {agent_text}")
+        with self._lock:
+            self.outcome.turns += 1
+            if lines:
+                self._pending.append(lines)
+            else:
+                self.outcome.covered_turns += 1
+            start = self._idle.is_set() and bool(self._pending)
+            if start:
+                self._idle.clear()
+        self._publish()
+        if start:
+            _outcome_pool.submit(self._drain)
+
+    def _publish(self):
+        if self.on_update is None:
+            return
+        with self._publish_lock:
+            with self._lock:
+                snapshot = replace(self.outcome)
+            try:
+                self.on_update(snapshot)
+            except Exception as e:
+                print(f"❌ Fehler beim Speichern des Outcomes: {e}")
+
+    def _drain(self):
+        failures = 0
+        while True:
+            with self._lock:
+                batch = self._pending[:MAX_PENDING_TURNS]
+                del self._pending[:MAX_PENDING_TURNS]
+                if not batch:
+                    self._idle.set()
+                    return
+                previous = replace(self.outcome)
+            try:
+                response = self._get_model().generate_content(
+                    _update_prompt(previous, [line for turn in batch for line in turn]),
+                    generation_config=genai.types.GenerationConfig(
+                        temperature=0,
+                        response_mime_type="application/json",
+                    ),
+                    request_options={"timeout": OUTCOME_TIMEOUT_SECONDS},
+                )
+                updated = _parse_outcome(response.text, previous)
+            except Exception as e:
+                print(f"❌ Fehler beim Outcome-Update: {e}")
+                failures += 1
+                with self._lock:
+                    # Turns zurücklegen, sie gehen mit dem nächsten Versuch in den Stand ein
+                    self._pending[:0] = batch
+                    if failures >= OUTCOME_RETRIES:
+                        self._idle.set()
+                        return
+                delay = random.uniform(
+                    0, min(OUTCOME_BACKOFF_MAX_SECONDS, OUTCOME_BACKOFF_BASE_SECONDS * 2 ** (failures - 1))
+                )
+                print(f"⏳ Outcome-Update, retry {failures}/{OUTCOME_RETRIES - 1} in {delay:.2f}s")
+                time.sleep(delay)
+                continue
+            failures = 0
+            with self._lock:
+                # turns kann inzwischen weitergezählt haben
+                updated.turns = self.outcome.turns
+                updated.covered_turns = self.outcome.covered_turns + len(batch)
+                self.outcome = updated
+            self._publish()
+
+    def wait(self, timeout: Optional[float] = None) -> CallOutcome:
+        """Auf ein laufendes Update warten (höchstens timeout) und den Stand liefern"""
+        self._idle.wait(timeout)
+        with self._lock:
+            return self.outcome
@@ -0,0 +1,208 @@
+"""
+Lokales Anbieter-Verzeichnis (Praxen, Handwerker, ...) mit räumlichem Index
+Beantwortet "die k nächsten innerhalb radius_km" in Millisekunden, ohne LLM:
+der KD-Tree der Kategorie liefert die Kandidaten im Radius, ranking.CandidateSet
+rankt nur diese (vektorisiert, Dedupe nach Telefonnummer)
+
+Erwartete Spalten (CSV oder Parquet):
+    name, phone (oder telefonnummer), category, lat, lon
+    optional: postal_code, street
+
+category entspricht den Service-Typen aus extract_service_type(),
+z.B. "Zahnarztpraxen" oder "Friseursalons".
+"""
+import csv
+import math
+import os
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from llmcall_method.ranking import EARTH_RADIUS_KM, CandidateSet
+
+
+DEFAULT_DIRECTORY_PATH = os.getenv(
+    "PROVIDER_DIRECTORY_PATH",
+    str(Path(__file__).resolve().parents[1] / "data" / "providers.csv"),
+)
+
+
+def _to_xyz(lat: float, lon: float) -> Tuple[float, float, float]:
+    """lat/lon -> Punkt auf der Einheitskugel (euklidisch monoton zur Großkreisdistanz)"""
+    lat_r = math.radians(lat)
+    lon_r = math.radians(lon)
+    cos_lat = math.cos(lat_r)
+    return (cos_lat * math.cos(lon_r), cos_lat * math.sin(lon_r), math.sin(lat_r))
+
+
+def _chord_for_km(distance_km: float) -> float:
+    """Großkreisdistanz -> Sehnenlänge auf der Einheitskugel"""
+    return 2 * math.sin(min(math.pi, distance_km / EARTH_RADIUS_KM) / 2)
+
+
+class KDTree:
+    """
+    Balancierter 3D KD-Tree, implizit in einem Index-Array gespeichert
+
+    Knoten = Median von idx[lo:hi], Split-Achse = Tiefe % 3. Bereiche bis
+    LEAF_SIZE Punkte werden nicht weiter geteilt, within() gibt sie als
+    Ganzes zurück, die exakte Distanz prüft das vektorisierte Ranking.
+    """
+
+    LEAF_SIZE = 64
+
+    def __init__(self, points: Sequence[Tuple[float, float, float]]):
+        self.points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+        self.idx = np.arange(len(self.points))
+        self._build(0, len(self.points), 0)
+
+    def _build(self, lo: int, hi: int, depth: int):
+        if hi - lo <= self.LEAF_SIZE:
+            return
+        axis = depth % 3
+        block = self.idx[lo:hi]
+        self.idx[lo:hi] = block[np.argsort(self.points[block, axis], kind="stable")]
+        mid = (lo + hi) // 2
+        self._build(lo, mid, depth + 1)
+        self._build(mid + 1, hi, depth + 1)
+
+    def within(self, target: Tuple[float, float, float], max_distance: float) -> np.ndarray:
+        """
+        Returns:
+            Punkt-Indizes, unter denen alle mit (euklidischer) Distanz
+            <= max_distance sind (Obermenge, unsortiert)
+        """
+        hits: List[np.ndarray] = []
+        points = self.points
+        idx = self.idx
+        stack = [(0, len(idx), 0)]
+        while stack:
+            lo, hi, depth = stack.pop()
+            if hi - lo <= self.LEAF_SIZE:
+                if lo < hi:
+                    hits.append(idx[lo:hi])
+                continue
+            mid = (lo + hi) // 2
+            hits.append(idx[mid:mid + 1])
+
+            # Links liegen Koordinaten <= Median, rechts >= Median
+            axis = depth % 3
+            diff = target[axis] - points[idx[mid], axis]
+            if diff <= max_distance:
+                stack.append((lo, mid, depth + 1))
+            if -diff <= max_distance:
+                stack.append((mid + 1, hi, depth + 1))
+        return np.concatenate(hits) if hits else idx[:0]
+
+
+class ProviderDirectory:
+    """
+    Alle Anbieter, pro Kategorie ein KD-Tree (Radius-Vorauswahl)
+    und ein CandidateSet (Ranking) über dieselben Einträge
+    """
+
+    def __init__(self, providers: List[dict]):
+        self.providers = providers
+        by_category: Dict[str, List[dict]] = {}
+        for provider in providers:
+            by_category.setdefault(provider["category"].lower(), []).append(provider)
+
+        # Kategorie -> (CandidateSet, KD-Tree über dieselben Einträge in derselben Reihenfolge)
+        self._categories: Dict[str, Tuple[CandidateSet, KDTree]] = {}
+        for category, members in by_category.items():
+            points = [_to_xyz(provider["lat"], provider["lon"]) for provider in members]
+            self._categories[category] = (CandidateSet(members), KDTree(points))
+
+        # Fallback-Koordinaten pro PLZ (Mittelpunkt aller Anbieter dort)
+        sums: Dict[str, List[float]] = {}
+        for provider in providers:
+            postal_code = provider.get("postal_code")
+            if postal_code:
+                acc = sums.setdefault(postal_code, [0.0, 0.0, 0])
+                acc[0] += provider["lat"]
+                acc[1] += provider["lon"]
+                acc[2] += 1
+        self._postal_centroids = {pc: (acc[0] / acc[2], acc[1] / acc[2]) for pc, acc in sums.items()}
+
+    @classmethod
+    def load(cls, path: str) -> "ProviderDirectory":
+        """Lädt CSV oder Parquet (Parquet braucht pandas + pyarrow)"""
+        if path.endswith(".parquet"):
+            try:
+                import pandas as pd
+            except ImportError as e:
+                raise ImportError("Parquet provider directories need pandas and pyarrow installed.") from e
+            rows = pd.read_parquet(path).to_dict(orient="records")
+        else:
+            with open(path, newline="", encoding="utf-8") as f:
+                rows = list(csv.DictReader(f))
+
+        providers = []
+        for row in rows:
+            try:
+                providers.append({
+                    "name": str(row["name"]).strip(),
+                    "telefonnummer": str(row.get("phone") or row.get("telefonnummer") or "").strip(),
+                    "category": str(row["category"]).strip(),
+                    "lat": float(row["lat"]),
+                    "lon": float(row["lon"]),
+                    "postal_code": str(row.get("postal_code") or "").strip(),
+                    "street": str(row.get("street") or "").strip(),
+                })
+            except (KeyError, TypeError, ValueError):
+                # Unvollständige Zeilen überspringen
+                continue
+        print(f"📒 Provider directory loaded: {len(providers)} entries from {path}")
+        return cls(providers)
+
+    def __len__(self) -> int:
+        return len(self.providers)
+
+    def categories(self) -> List[str]:
+        return sorted(self._categories)
+
+    def locate(self, postal_code: str) -> Optional[Tuple[float, float]]:
+        return self._postal_centroids.get(postal_code.strip())
+
+    def nearest(self, category: str, lat: float, lon: float, radius_km: float, k: int = 10) -> List[dict]:
+        """
+        Die k nächsten Anbieter einer Kategorie innerhalb radius_km
+
+        Returns:
+            Liste von {name, telefonnummer, distance_km}, nächster zuerst,
+            jede Telefonnummer nur einmal
+        """
+        entry = self._categories.get(category.lower())
+        if entry is None:
+            return []
+        candidates, tree = entry
+        # Sehne minimal größer, die exakte Haversine-Grenze zieht das Ranking
+        inside = tree.within(_to_xyz(lat, lon), _chord_for_km(radius_km) * (1 + 1e-9))
+        return candidates.rank(lat, lon, radius_km, k, indices=inside)
+
+
+_directory: Optional[ProviderDirectory] = None
+_directory_loaded = False
+_directory_lock = threading.Lock()
+
+
+def get_provider_directory() -> Optional[ProviderDirectory]:
+    """
+    Verzeichnis aus PROVIDER_DIRECTORY_PATH (Default data/providers.csv)
+
+    Returns:
+        None, wenn keine Datei vorhanden ist -> Aufrufer nutzt das LLM
+    """
+    global _directory, _directory_loaded
+    if not _directory_loaded:
+        with _directory_lock:
+            if not _directory_loaded:
+                if os.path.exists(DEFAULT_DIRECTORY_PATH):
+                    try:
+                        _directory = ProviderDirectory.load(DEFAULT_DIRECTORY_PATH)
+                    except Exception as e:
+                        print(f"❌ Could not load provider directory: {e}")
+                _directory_loaded = True
+    return _directory
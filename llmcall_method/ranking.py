@@ -0,0 +1,105 @@
+"""
+Vektorisierte Ranking-Stufe für Kontakt-Kandidaten
+Haversine-Distanzen für alle Kandidaten in einem NumPy-Durchlauf,
+dann Radius-Filter, Dedupe nach Telefonnummer und Top-k.
+
+    python llmcall_method/bench_ranking.py   # 100k synthetische Anbieter
+"""
+import re
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+
+EARTH_RADIUS_KM = 6371.0088
+_NON_DIGITS = re.compile(r"\D")
+
+
+def normalize_phone(phone: Optional[str]) -> str:
+    """'+49 721 123-456' / '0049721123456' / '0721 123456' -> '0721123456'"""
+    if not phone:
+        return ""
+    digits = _NON_DIGITS.sub("", phone)
+    if phone.strip().startswith("+"):
+        digits = "00" + digits
+    if digits.startswith("0049"):
+        digits = "0" + digits[4:]
+    return digits
+
+
+class CandidateSet:
+    """
+    Kandidaten als Spalten-Arrays, einmal aufgebaut und oft gerankt
+
+    Radiant und cos(lat) werden beim Aufbau vorberechnet, die Telefonnummer
+    wird auf eine Integer-ID abgebildet (leere Nummern bekommen je eine
+    eigene ID und werden nie zusammengelegt).
+    """
+
+    def __init__(self, candidates: Sequence[dict]):
+        self.candidates = list(candidates)
+        lats = np.fromiter((c["lat"] for c in self.candidates), dtype=np.float64, count=len(self.candidates))
+        lons = np.fromiter((c["lon"] for c in self.candidates), dtype=np.float64, count=len(self.candidates))
+        self._lat_r = np.radians(lats)
+        self._lon_r = np.radians(lons)
+        self._cos_lat = np.cos(self._lat_r)
+
+        ids: Dict[str, int] = {}
+        phone_ids = np.empty(len(self.candidates), dtype=np.int64)
+        for i, candidate in enumerate(self.candidates):
+            phone = normalize_phone(candidate.get("telefonnummer"))
+            phone_ids[i] = ids.setdefault(phone, len(ids)) if phone else -(i + 1)
+        self._phone_ids = phone_ids
+
+    def __len__(self) -> int:
+        return len(self.candidates)
+
+    def distances(self, lat: float, lon: float, indices: Optional[np.ndarray] = None) -> np.ndarray:
+        """Haversine-Distanzen zu allen Kandidaten oder nur zu indices"""
+        lat_rs, lon_rs, cos_lats = self._lat_r, self._lon_r, self._cos_lat
+        if indices is not None:
+            lat_rs, lon_rs, cos_lats = lat_rs[indices], lon_rs[indices], cos_lats[indices]
+        lat_r = np.radians(lat)
+        dlat = lat_rs - lat_r
+        dlon = lon_rs - np.radians(lon)
+        a = np.sin(dlat / 2) ** 2 + np.cos(lat_r) * cos_lats * np.sin(dlon / 2) ** 2
+        return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+    def rank(self, lat: float, lon: float, radius_km: float, k: int = 10,
+             indices: Optional[Sequence[int]] = None) -> List[dict]:
+        """
+        Die k nächsten Kandidaten innerhalb radius_km, eine Nummer nur einmal
+
+        Args:
+            indices: nur diese Kandidaten ranken (z.B. Vorauswahl eines räumlichen Index)
+
+        Returns:
+            Liste von {name, telefonnummer, distance_km}, nächster zuerst
+        """
+        if not self.candidates or k <= 0:
+            return []
+        pool = None if indices is None else np.asarray(indices, dtype=np.intp)
+        if pool is not None and pool.size == 0:
+            return []
+        distances = self.distances(lat, lon, pool)
+        inside = np.flatnonzero(distances <= radius_km)
+        if inside.size == 0:
+            return []
+        order = inside[np.argsort(distances[inside], kind="stable")]
+        members = order if pool is None else pool[order]
+        # np.unique liefert das erste Vorkommen jeder Nummer -> das nächste, da nach Distanz sortiert
+        _, first = np.unique(self._phone_ids[members], return_index=True)
+        keep = np.sort(first)[:k]
+        return [
+            {
+                "name": self.candidates[i]["name"],
+                "telefonnummer": self.candidates[i]["telefonnummer"],
+                "distance_km": round(float(distance), 2),
+            }
+            for i, distance in zip(members[keep], distances[order[keep]])
+        ]
+
+
+def rank_contacts(lat: float, lon: float, candidates: Sequence[dict], radius_km: float, k: int = 10) -> List[dict]:
+    """Einmaliges Ranking einer Kandidatenliste (dicts mit name, telefonnummer, lat, lon)"""
+    return CandidateSet(candidates).rank(lat, lon, radius_km, k)
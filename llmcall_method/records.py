@@ -0,0 +1,110 @@
+"""
+Read-through Cache für Profil- und Request-Zeilen aus Supabase
+Hot Paths (Kontakt-Vorschläge, Eröffnung im Live-Call) sparen sich so den
+DB Roundtrip pro Aufruf. Geladen werden nur die Spalten, die wirklich
+gebraucht werden.
+
+Der Cache ist pro Prozess: invalidate_*() wirkt sofort im aufrufenden
+Prozess, andere Worker sehen Änderungen spätestens nach der TTL.
+"""
+import asyncio
+import os
+from concurrent.futures import Executor
+from typing import Dict, Iterable, List, Optional
+
+from clients.registry import get_supabase_client
+from llmcall_method.lookup_cache import LookupCache
+
+
+PROFILE_COLUMNS = "user_id, street, house_number, postal_code, city"
+REQUEST_COLUMNS = "id, title, description"
+
+# Nicht gefundene Zeilen (None) werden nicht gecacht, sonst sähe ein
+# frisch angelegtes Profil bis zum Ablauf der TTL "fehlend" aus
+profile_cache = LookupCache(
+    max_entries=int(os.getenv("PROFILE_CACHE_MAX_ENTRIES", "10000")),
+    ttl_seconds=float(os.getenv("PROFILE_CACHE_TTL_SECONDS", "300")),
+    should_cache=lambda row: row is not None,
+)
+request_cache = LookupCache(
+    max_entries=int(os.getenv("REQUEST_CACHE_MAX_ENTRIES", "10000")),
+    ttl_seconds=float(os.getenv("REQUEST_CACHE_TTL_SECONDS", "900")),
+    should_cache=lambda row: row is not None,
+)
+
+
+def _fetch_one(table: str, columns: str, key_column: str, key: str) -> Optional[dict]:
+    # .execute() statt .single(), damit "keine Zeile" keine Exception ist
+    response = get_supabase_client().table(table).select(columns).eq(key_column, key).execute()
+    return response.data[0] if response.data else None
+
+
+def _fetch_profile(user_id: str) -> Optional[dict]:
+    return _fetch_one("profiles", PROFILE_COLUMNS, "user_id", user_id)
+
+
+def _fetch_request(request_id: str) -> Optional[dict]:
+    return _fetch_one("requests", REQUEST_COLUMNS, "id", request_id)
+
+
+def get_profile(user_id: str) -> Optional[dict]:
+    """Profil (Adressfelder) oder None"""
+    return profile_cache.get_or_compute(user_id, lambda: _fetch_profile(user_id))
+
+
+async def get_profile_async(user_id: str, executor: Optional[Executor] = None) -> Optional[dict]:
+    """
+    Async Variante, der Supabase Call läuft im executor
+
+    Args:
+        user_id: Supabase User ID
+        executor: Thread-Pool für den blockierenden Call (None = Default-Pool)
+    """
+    loop = asyncio.get_running_loop()
+    return await profile_cache.get_or_compute_async(
+        user_id, lambda: loop.run_in_executor(executor, _fetch_profile, user_id)
+    )
+
+
+def _fetch_profiles(user_ids: List[str]) -> List[dict]:
+    response = get_supabase_client().table("profiles").select(PROFILE_COLUMNS).in_("user_id", user_ids).execute()
+    return response.data or []
+
+
+async def get_profiles_async(user_ids: Iterable[str], executor: Optional[Executor] = None) -> Dict[str, Optional[dict]]:
+    """
+    Viele Profile auf einmal: Cache-Treffer direkt, der Rest mit einer einzigen in_() Query
+
+    Returns:
+        user_id -> Profil oder None
+    """
+    profiles: Dict[str, Optional[dict]] = {}
+    missing = []
+    for user_id in dict.fromkeys(user_ids):
+        cached = profile_cache.get(user_id)
+        if cached is None:
+            missing.append(user_id)
+        else:
+            profiles[user_id] = cached
+    if missing:
+        loop = asyncio.get_running_loop()
+        rows = await loop.run_in_executor(executor, _fetch_profiles, missing)
+        found = {row["user_id"]: row for row in rows}
+        for user_id in missing:
+            profiles[user_id] = found.get(user_id)
+            if user_id in found:
+                profile_cache.put(user_id, found[user_id])
+    return profiles
+
+
+def get_request(request_id: str) -> Optional[dict]:
+    """Request (id, title, description) oder None"""
+    return request_cache.get_or_compute(request_id, lambda: _fetch_request(request_id))
+
+
+def invalidate_profile(user_id: str):
+    profile_cache.invalidate(user_id)
+
+
+def invalidate_request(request_id: str):
+    request_cache.invalidate(request_id)
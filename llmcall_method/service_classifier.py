@@ -0,0 +1,179 @@
+"""
+Service-Typ aus einer Beschreibung, alle Keywords in einem Durchlauf
+Aho–Corasick Automat über die Keyword-Tabelle, längster Treffer gewinnt
+('zahnarzt' schlägt 'arzt', unabhängig von der Reihenfolge der Tabelle).
+
+Die Tabelle ist eine CSV mit keyword,service_type (Default: service_keywords.csv
+neben diesem Modul, überschreibbar mit SERVICE_KEYWORDS_PATH).
+
+    python llmcall_method/service_classifier.py backfill requests_service_types.csv
+"""
+import csv
+import os
+import sys
+import threading
+from collections import deque
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+DEFAULT_KEYWORDS_PATH = os.getenv(
+    "SERVICE_KEYWORDS_PATH",
+    str(Path(__file__).resolve().parent / "service_keywords.csv"),
+)
+FALLBACK_SERVICE = "Dienstleister"
+
+
+def load_keywords(path: str) -> Dict[str, str]:
+    """CSV keyword,service_type -> {keyword: service_type}, Keywords kleingeschrieben"""
+    keywords = {}
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            keyword = (row.get("keyword") or "").strip().lower()
+            service = (row.get("service_type") or "").strip()
+            if keyword and service:
+                keywords[keyword] = service
+    return keywords
+
+
+class ServiceClassifier:
+    """
+    Aho–Corasick Automat, Zustände als parallele Listen
+
+    Pro Zustand wird der längste Treffer, der dort endet, vorberechnet
+    (eigenes Keyword oder der Treffer des Fail-Zustands), damit die Suche
+    nie die Fail-Kette entlanglaufen muss.
+    """
+
+    def __init__(self, keywords: Dict[str, str], fallback: str = FALLBACK_SERVICE):
+        self.fallback = fallback
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        # Längster Treffer, der in diesem Zustand endet: (Länge, Service) oder None
+        self._match: List[Optional[Tuple[int, str]]] = [None]
+
+        for keyword, service in keywords.items():
+            state = 0
+            for char in keyword.lower():
+                nxt = self._goto[state].get(char)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[state][char] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._match.append(None)
+                state = nxt
+            self._match[state] = (len(keyword), service)
+
+        # Fail-Links per BFS, Kinder der Wurzel zeigen auf die Wurzel
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[nxt] = target if target != nxt else 0
+                if self._match[nxt] is None:
+                    self._match[nxt] = self._match[self._fail[nxt]]
+
+    @classmethod
+    def from_file(cls, path: str = DEFAULT_KEYWORDS_PATH) -> "ServiceClassifier":
+        return cls(load_keywords(path))
+
+    def matches(self, text: str) -> List[Tuple[int, int, str]]:
+        """
+        Returns:
+            (start, länge, service) für den längsten Treffer an jeder Endposition
+        """
+        goto, fail, match = self._goto, self._fail, self._match
+        state = 0
+        found = []
+        for pos, char in enumerate(text.lower()):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            hit = match[state]
+            if hit is not None:
+                found.append((pos - hit[0] + 1, hit[0], hit[1]))
+        return found
+
+    def classify(self, text: str) -> str:
+        """Längster Treffer gewinnt, bei gleicher Länge der frühere"""
+        best = None
+        for start, length, service in self.matches(text or ""):
+            if best is None or length > best[0] or (length == best[0] and start < best[1]):
+                best = (length, start, service)
+        return best[2] if best else self.fallback
+
+    def classify_batch(self, texts: Iterable[str]) -> List[str]:
+        """Viele Beschreibungen, identische nur einmal klassifiziert"""
+        seen: Dict[str, str] = {}
+        results = []
+        for text in texts:
+            text = text or ""
+            service = seen.get(text)
+            if service is None:
+                service = seen[text] = self.classify(text)
+            results.append(service)
+        return results
+
+
+_classifier: Optional[ServiceClassifier] = None
+_classifier_lock = threading.Lock()
+
+
+def get_service_classifier() -> ServiceClassifier:
+    global _classifier
+    if _classifier is None:
+        with _classifier_lock:
+            if _classifier is None:
+                _classifier = ServiceClassifier.from_file(DEFAULT_KEYWORDS_PATH)
+    return _classifier
+
+
+def classify_batch(descriptions: Iterable[str]) -> List[str]:
+    return get_service_classifier().classify_batch(descriptions)
+
+
+def backfill(output_path: str, page_size: int = 1000) -> int:
+    """
+    Klassifiziert alle bisherigen Requests und schreibt id,service_type als CSV
+
+    Returns:
+        Anzahl klassifizierter Requests
+    """
+    sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+    from clients.registry import get_supabase_client
+
+    supabase = get_supabase_client()
+    classifier = get_service_classifier()
+    total = 0
+    with open(output_path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["id", "service_type"])
+        while True:
+            rows = (
+                supabase.table("requests")
+                .select("id, description")
+                .order("created_at")
+                .range(total, total + page_size - 1)
+                .execute()
+                .data
+            ) or []
+            services = classifier.classify_batch(row.get("description") for row in rows)
+            writer.writerows((row["id"], service) for row, service in zip(rows, services))
+            total += len(rows)
+            if len(rows) < page_size:
+                break
+    return total
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 3 and sys.argv[1] == "backfill":
+        count = backfill(sys.argv[2])
+        print(f"✅ {count} requests classified -> {sys.argv[2]}")
+    else:
+        print("Usage: python llmcall_method/service_classifier.py backfill <output.csv>")
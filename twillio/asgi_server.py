@@ -0,0 +1,320 @@
+"""
+ASGI-Server für die Twilio Webhooks (Deployment)
+Gleiche Routen wie call_server.py, aber ein Request blockiert keinen
+Worker mehr: Gemini + ElevenLabs laufen in einem Thread-Pool und werden
+awaited, der Event Loop bedient derweil alle anderen Calls.
+
+    uvicorn twillio.asgi_server:app --port 5001
+    gunicorn -c twillio/gunicorn.conf.py twillio.asgi_server:app
+
+Mit mehreren Workern SESSION_STORE=sqlite setzen, sonst kennt der Worker,
+bei dem der nächste Webhook eines Calls landet, dessen Session nicht.
+"""
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional
+import asyncio
+import os
+import sys
+import time
+import urllib.parse
+
+# Pfad erweitern, damit Module im Root-Verzeichnis gefunden werden
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from fastapi import FastAPI, HTTPException, Request, WebSocket
+from fastapi.responses import FileResponse, Response, StreamingResponse
+from twilio.twiml.voice_response import VoiceResponse
+from language_output.language_output import stream_speech
+from language_output.tts_cache import get_tts_cache
+from language_output.fillers import get_filler
+from twillio.call_flow import (
+    AUDIO_DIR, AUDIO_MIMETYPES, CALL_LANGUAGE, MAX_REPLY_REDIRECTS, REPLY_WAIT_SECONDS,
+    active_outcome_trackers, build_gather, llm_reply, llm_start, play_for_call,
+    store_reply, take_reply, warmup,
+)
+from twillio.media_stream import MediaStreamCall, build_stream_twiml
+
+# Twilio bricht einen Webhook nach 15 s ab -> vorher selbst antworten
+ROUTE_TIMEOUT_SECONDS = float(os.getenv("CALL_ROUTE_TIMEOUT_SECONDS", "10"))
+# So lange darf ein Deploy auf laufende Antworten und Outcome-Updates warten
+DRAIN_TIMEOUT_SECONDS = float(os.getenv("CALL_DRAIN_TIMEOUT_SECONDS", "25"))
+# Sonst wss://<Host des /voice Webhooks>/media-stream
+MEDIA_STREAM_URL = os.getenv("MEDIA_STREAM_URL", "").strip()
+FALLBACK_GREETING = "Hello, I'm calling on behalf of a client who would like to book an appointment."
+
+app = FastAPI(title="Hacknation Call Server", version="0.1.0")
+
+# Gemini/ElevenLabs SDKs sind synchron, jeder Turn belegt einen Thread, nicht den Loop
+_call_pool = ThreadPoolExecutor(
+    max_workers=int(os.getenv("CALL_SERVER_THREADS", "32")),
+    thread_name_prefix="call",
+)
+
+
+class CallDrain:
+    """
+    Zählt laufende Webhooks und Hintergrund-Antworten dieses Workers
+
+    Beim Shutdown (Deploy, SIGTERM) nimmt uvicorn keine neuen Verbindungen
+    mehr an und beantwortet die laufenden Webhooks, danach wartet drain(),
+    bis auch alle Hintergrund-Antworten im Session Store liegen. Der nächste
+    Webhook des Calls kann dann von einem anderen Worker bedient werden.
+
+    Realtime-Calls (Media Streams) hängen dagegen für ihre ganze Dauer an
+    einem Socket, uvicorn schließt ihn beim Shutdown (1012) und Twilio legt auf.
+    """
+
+    def __init__(self):
+        self.draining = False
+        self.inflight = 0
+        self.timeouts = 0
+        self.streams = 0
+        self._tasks: "set[asyncio.Task]" = set()
+
+    def spawn(self, coro) -> asyncio.Task:
+        task = asyncio.get_running_loop().create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    async def drain(self, timeout: float = DRAIN_TIMEOUT_SECONDS):
+        self.draining = True
+        deadline = time.monotonic() + timeout
+        if self._tasks:
+            print(f"⏳ Warte auf {len(self._tasks)} laufende Antworten...")
+            _, pending = await asyncio.wait(set(self._tasks), timeout=timeout)
+            if pending:
+                print(f"❌ {len(pending)} Antworten beim Shutdown abgebrochen")
+        # Gesprächsergebnis landet sonst nicht mehr im Session Store
+        await asyncio.to_thread(_settle_outcomes, deadline)
+
+    def stats(self) -> dict:
+        return {
+            "draining": self.draining,
+            "inflight_requests": self.inflight,
+            "background_replies": len(self._tasks),
+            "media_streams": self.streams,
+            "timeouts": self.timeouts,
+        }
+
+
+def _settle_outcomes(deadline: float):
+    for tracker in active_outcome_trackers():
+        tracker.wait(max(0.0, deadline - time.monotonic()))
+
+
+drain = CallDrain()
+# call_sid -> laufende Antwort in diesem Worker (Fallback: Polling im Session Store)
+_replies: Dict[str, asyncio.Task] = {}
+
+
+async def _run(fn, *args):
+    return await asyncio.get_running_loop().run_in_executor(_call_pool, fn, *args)
+
+
+async def _values(request: Request) -> dict:
+    """Query + Formular wie Flask request.values (Twilio schickt x-www-form-urlencoded)"""
+    values = dict(request.query_params)
+    if request.method == "POST":
+        body = (await request.body()).decode("utf-8")
+        values.update({key: items[-1] for key, items in urllib.parse.parse_qs(body).items()})
+    return values
+
+
+def _twiml(resp: VoiceResponse) -> Response:
+    return Response(str(resp), media_type="application/xml")
+
+
+def _play_reply(resp: VoiceResponse, call_sid: str, reply: Optional[dict]) -> Response:
+    if reply and reply["audio_urls"]:
+        for audio_url in reply["audio_urls"]:
+            play_for_call(resp, call_sid, audio_url)
+    else:
+        resp.say("Sorry, could you please repeat that?", language='en-US')
+    resp.append(build_gather())
+    return _twiml(resp)
+
+
+async def _compute_reply(call_sid: str, user_text: str):
+    """Berechnet die Antwort und legt die URLs in der Session ab"""
+    try:
+        audio_urls = await _run(llm_reply, call_sid, user_text)
+        result = {"status": "ready", "audio_urls": audio_urls}
+    except Exception as e:
+        print(f"❌ Fehler bei Hintergrund-Antwort: {e}")
+        result = {"status": "failed", "audio_urls": []}
+    try:
+        store_reply(call_sid, result)
+    finally:
+        if _replies.get(call_sid) is asyncio.current_task():
+            del _replies[call_sid]
+
+
+async def _await_reply(call_sid: str, timeout: float) -> Optional[dict]:
+    task = _replies.get(call_sid)
+    if task is not None:
+        try:
+            await asyncio.wait_for(asyncio.shield(task), timeout)
+        except asyncio.TimeoutError:
+            return None
+        return take_reply(call_sid)
+
+    # Antwort läuft in einem anderen Worker (oder ist schon fertig)
+    deadline = time.monotonic() + timeout
+    while True:
+        pending = take_reply(call_sid)
+        if pending:
+            return pending
+        if time.monotonic() >= deadline:
+            return None
+        await asyncio.sleep(0.1)
+
+
+@app.on_event("startup")
+async def warm_clients() -> None:
+    warmup()
+
+
+@app.on_event("shutdown")
+async def drain_calls() -> None:
+    # Läuft erst, nachdem uvicorn keine Verbindungen mehr annimmt
+    await drain.drain()
+
+
+@app.middleware("http")
+async def count_inflight(request: Request, call_next):
+    drain.inflight += 1
+    try:
+        return await call_next(request)
+    finally:
+        drain.inflight -= 1
+
+
+@app.get("/health")
+async def health_check() -> dict:
+    return {"status": "ok"}
+
+
+@app.get("/stats/calls")
+async def call_stats() -> dict:
+    return drain.stats()
+
+
+@app.get("/stats/tts-cache")
+async def tts_cache_stats() -> dict:
+    return get_tts_cache().stats()
+
+
+@app.get("/audio/stream/{name}")
+async def stream_audio(name: str):
+    # Kein Content-Length -> Chunked Transfer, Twilio spielt ab dem ersten Chunk
+    chunks = stream_speech(name)
+    if chunks is None:
+        raise HTTPException(status_code=404)
+    ext = name.rsplit(".", 1)[-1]
+    return StreamingResponse(chunks, media_type=AUDIO_MIMETYPES.get(ext, "application/octet-stream"))
+
+
+@app.get("/audio/{filename:path}")
+async def serve_audio(filename: str):
+    path = (AUDIO_DIR / filename).resolve()
+    if not path.is_relative_to(AUDIO_DIR) or not path.is_file():
+        raise HTTPException(status_code=404)
+    return FileResponse(path)
+
+
+@app.api_route("/voice", methods=["GET", "POST"])
+async def voice(request: Request) -> Response:
+    """Start the conversation."""
+    values = await _values(request)
+    call_sid = values.get("CallSid", "")
+
+    if values.get("mode") == "stream":
+        # Realtime: Eröffnung und alle Turns laufen über den WebSocket
+        stream_url = MEDIA_STREAM_URL or f"wss://{request.url.netloc}/media-stream"
+        return _twiml(build_stream_twiml(stream_url, values))
+
+    resp = VoiceResponse()
+    try:
+        audio_url = await asyncio.wait_for(
+            _run(llm_start, call_sid, values.get("request_id"), values.get("title"), values.get("description")),
+            ROUTE_TIMEOUT_SECONDS,
+        )
+        play_for_call(resp, call_sid, audio_url)
+    except asyncio.TimeoutError:
+        drain.timeouts += 1
+        print(f"❌ Eröffnung für {call_sid} nach {ROUTE_TIMEOUT_SECONDS}s nicht fertig")
+        resp.say(FALLBACK_GREETING, language='en-US')
+    resp.append(build_gather())
+    return _twiml(resp)
+
+
+@app.websocket("/media-stream")
+async def media_stream(websocket: WebSocket):
+    await websocket.accept()
+    drain.streams += 1
+    try:
+        await MediaStreamCall(websocket).run()
+    finally:
+        drain.streams -= 1
+
+
+@app.api_route("/gather", methods=["GET", "POST"])
+async def gather(request: Request) -> Response:
+    """Process the user reply."""
+    values = await _values(request)
+    resp = VoiceResponse()
+
+    user_input = values.get('SpeechResult', '').strip().lower()
+    call_sid = values.get('CallSid', '')
+
+    if not user_input:
+        resp.append(build_gather())
+        return _twiml(resp)
+
+    store_reply(call_sid, {"status": "pending", "audio_urls": []})
+    _replies[call_sid] = drain.spawn(_compute_reply(call_sid, user_input))
+
+    filler = get_filler(CALL_LANGUAGE, "wait")
+    if filler:
+        # Sofort ein "Einen Moment bitte", die echte Antwort holt /gather/reply
+        resp.play(f"/audio/{filler}")
+    else:
+        reply = await _await_reply(call_sid, ROUTE_TIMEOUT_SECONDS)
+        if reply is not None:
+            return _play_reply(resp, call_sid, reply)
+        # Zu langsam für diesen Webhook -> weiterrechnen, /gather/reply holt ab
+        drain.timeouts += 1
+    resp.redirect('/gather/reply?attempt=1', method='POST')
+    return _twiml(resp)
+
+
+@app.api_route("/gather/reply", methods=["GET", "POST"])
+async def gather_reply(request: Request) -> Response:
+    """Spielt die im Hintergrund berechnete Antwort ab."""
+    values = await _values(request)
+    resp = VoiceResponse()
+    call_sid = values.get('CallSid', '')
+    attempt = int(values.get('attempt', '1'))
+
+    reply = await _await_reply(call_sid, REPLY_WAIT_SECONDS)
+    if reply is None and attempt < MAX_REPLY_REDIRECTS:
+        filler = get_filler(CALL_LANGUAGE, "wait")
+        if filler:
+            resp.play(f"/audio/{filler}")
+        resp.redirect(f'/gather/reply?attempt={attempt + 1}', method='POST')
+        return _twiml(resp)
+    return _play_reply(resp, call_sid, reply)
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run(
+        "twillio.asgi_server:app",
+        host="0.0.0.0",
+        port=int(os.environ.get("PORT", 5001)),
+        workers=int(os.getenv("CALL_SERVER_WORKERS", "1")),
+        timeout_graceful_shutdown=int(DRAIN_TIMEOUT_SECONDS),
+    )
@@ -0,0 +1,152 @@
+"""
+Gesprächslogik der Twilio Webhooks, unabhängig vom Web-Framework
+Wird vom Flask-Server (call_server.py, lokal) und vom ASGI-Server
+(asgi_server.py, Deployment) gleichermaßen benutzt.
+"""
+from pathlib import Path
+from collections import OrderedDict
+import sys
+import os
+import threading
+
+# Pfad erweitern, damit Module im Root-Verzeichnis gefunden werden
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from twilio.twiml.voice_response import Gather
+from language_output.language_output import prepare_speech
+from language_output.tts_cache import get_tts_cache
+from language_output.fillers import warmup_async
+from llmcall_method.callgemini import generate_llm_reply_stream, generate_llm_start
+from llmcall_method.outcome import OutcomeTracker
+from twillio.session_store import get_session_store
+from twillio.opener_store import get_opener_store
+from twillio.turn_engine import run_turn
+from clients.registry import prewarm_async
+
+sessions = get_session_store()
+
+CALL_LANGUAGE = os.getenv("CALL_LANGUAGE", "en")
+# Wie lange /gather/reply auf die Hintergrund-Antwort wartet, bevor erneut gefüllt wird
+REPLY_WAIT_SECONDS = float(os.getenv("REPLY_WAIT_SECONDS", "6"))
+MAX_REPLY_REDIRECTS = 3
+
+AUDIO_DIR = Path(__file__).resolve().parents[1] / "language_output"
+AUDIO_MIMETYPES = {"mp3": "audio/mpeg", "ulaw": "audio/basic", "pcm": "audio/L16"}
+
+# Laufendes Gesprächsergebnis pro Call, das Backend liest es beim Auflegen aus dem Session Store
+_outcome_trackers: "OrderedDict[str, OutcomeTracker]" = OrderedDict()
+_outcome_lock = threading.Lock()
+
+
+def warmup():
+    """Einmal pro Prozess beim Start aufrufen"""
+    # Clients + TLS-Verbindungen vorab aufbauen
+    prewarm_async()
+    # Füllsätze einmal pro Stimme vorsynthetisieren
+    warmup_async()
+    # Generierte Audiodateien nach TTL/Byte-Budget aufräumen
+    get_tts_cache().start_sweeper()
+
+
+def outcome_tracker(call_sid):
+    with _outcome_lock:
+        tracker = _outcome_trackers.get(call_sid)
+        if tracker is None:
+            tracker = _outcome_trackers[call_sid] = OutcomeTracker(
+                on_update=lambda outcome: sessions.save_outcome(call_sid, outcome.to_dict())
+            )
+            while len(_outcome_trackers) > sessions.max_sessions:
+                _outcome_trackers.popitem(last=False)
+        _outcome_trackers.move_to_end(call_sid)
+        return tracker
+
+
+def active_outcome_trackers():
+    with _outcome_lock:
+        return list(_outcome_trackers.values())
+
+
+def llm_reply(call_sid, user_text):
+    print(f"User sagte: {user_text}") # Debugging
+    session = sessions.append_turn(call_sid, f"Caller: {user_text}")
+    # Satz für Satz: TTS startet, während Gemini noch weiterschreibt
+    text, audio_urls = run_turn(generate_llm_reply_stream(user_text, session.turns))
+    sessions.append_turn(call_sid, f"Assistant: {text}")
+    # Ergebnis (gebucht? wann?) im Hintergrund nachziehen, nicht auf dem Antwortpfad
+    outcome_tracker(call_sid).observe(user_text, text)
+    return audio_urls
+
+
+def play_for_call(resp, call_sid, audio_url):
+    """<Play> + Datei für die Dauer des Calls vor dem Sweeper schützen"""
+    if not audio_url:
+        return
+    get_tts_cache().pin(call_sid, audio_url.removeprefix("/audio/"))
+    resp.play(audio_url)
+
+
+def store_reply(call_sid, result):
+    """Ergebnis einer Hintergrund-Antwort für /gather/reply ablegen"""
+    session = sessions.get_or_create(call_sid)
+    session.pending_reply = result
+    sessions.save(session)
+
+
+def take_reply(call_sid):
+    """Fertige Hintergrund-Antwort abholen (None solange sie noch läuft)"""
+    session = sessions.get(call_sid)
+    pending = session.pending_reply if session else None
+    if pending and pending["status"] != "pending":
+        session.pending_reply = None
+        sessions.save(session)
+        return pending
+    return None
+
+
+def start_conversation(call_sid, request_id, title=None, description=None):
+    """
+    Session anlegen und Eröffnungssatz bestimmen
+
+    Returns:
+        (Text, vorberechnete Audiodatei relativ zu /audio/ oder None)
+    """
+    # Abgelaufene Calls aufräumen, bevor ein neuer dazukommt
+    sessions.purge()
+    sessions.get_or_create(call_sid, request_id=request_id, title=title, description=description)
+
+    # Vom Backend vorberechnete Eröffnung -> sofort abspielen
+    opener = get_opener_store().get(request_id) if request_id else None
+    if opener:
+        sessions.append_turn(call_sid, f"Assistant: {opener['text']}")
+        return opener['text'], opener['audio_filename']
+
+    text = generate_llm_start(request_id, title, description)
+    print("AI Start Text:", text)
+    sessions.append_turn(call_sid, f"Assistant: {text}")
+    return text, None
+
+
+def llm_start(call_sid, request_id, title=None, description=None):
+    text, filename = start_conversation(call_sid, request_id, title, description)
+
+    # TwiML geht sofort raus, das Audio wird erst beim Abruf gestreamt
+    filename = filename or prepare_speech(text)
+
+    if filename:
+        return f"/audio/{filename}"
+    return None
+
+
+def build_gather(prompt_text=None):
+    gather = Gather(
+        input='speech dtmf',
+        action='/gather',
+        language='en-US',
+        timeout=10,
+        speech_timeout='auto',
+        action_on_empty_result=True,
+        num_digits=1
+    )
+    if prompt_text:
+        gather.say(prompt_text, language='en-US')
+    return gather
@@ -1,62 +1,69 @@
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
 import sys
 import os
+import time
 
 # Pfad erweitern, damit Module im Root-Verzeichnis gefunden werden
 sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
 
-from flask import Flask, request, send_from_directory
-from twilio.twiml.voice_response import VoiceResponse, Gather
-from language_output.language_output import talk
-from llmcall_method.callgemini import generate_llm_reply, generate_llm_start
+from flask import Flask, Response, abort, request, send_from_directory, stream_with_context
+from twilio.twiml.voice_response import VoiceResponse
+from language_output.language_output import stream_speech
+from language_output.tts_cache import get_tts_cache
+from language_output.fillers import get_filler
 from test.random_text import test_tts_twillio
+from twillio.call_flow import (
+    AUDIO_DIR, AUDIO_MIMETYPES, CALL_LANGUAGE, MAX_REPLY_REDIRECTS, REPLY_WAIT_SECONDS,
+    build_gather, llm_reply, llm_start, play_for_call, store_reply, take_reply, warmup,
+)
 
+# Lokaler Entwicklungsserver, im Deployment läuft twillio/asgi_server.py
 app = Flask(__name__)
 
-history = []
+reply_pool = ThreadPoolExecutor(
+    max_workers=int(os.getenv("REPLY_WORKERS", "16")),
+    thread_name_prefix="reply",
+)
+
+warmup()
 
 @app.route("/audio/<path:filename>")
 def serve_audio(filename):
-    audio_dir = Path(__file__).resolve().parents[1] / "language_output"
-    return send_from_directory(audio_dir, filename)
-
-def llm_reply(user_text):
-    print(f"User sagte: {user_text}") # Debugging
-    text = generate_llm_reply(user_text, history)
-    history.append(text)
-    filename = talk(text)
-    if filename:
-        return f"/audio/{filename}"
-    return None
-
-def llm_start(request_id, title=None, description=None):
-    text = generate_llm_start(request_id, title, description)
-    print("AI Start Text:", text)
-    history.append(text)
-    
-    # Jetzt bekommen wir einen eindeutigen Dateinamen zurück (z.B. output_39f8a.mp3)
-    filename = talk(text)
-    
-    if filename:
-        return f"/audio/{filename}"
-    return None
-
-
-def build_gather(prompt_text=None):
-    gather = Gather(
-        input='speech dtmf',
-        action='/gather',
-        language='en-US',
-        timeout=10,
-        speech_timeout='auto',
-        action_on_empty_result=True,
-        num_digits=1
-    )
-    if prompt_text:
-        gather.say(prompt_text, language='en-US')
-    return gather
-
-
+    return send_from_directory(AUDIO_DIR, filename)
+
+@app.route("/audio/stream/<name>")
+def stream_audio(name):
+    # Kein Content-Length -> Chunked Transfer, Twilio spielt ab dem ersten Chunk
+    chunks = stream_speech(name)
+    if chunks is None:
+        abort(404)
+    ext = name.rsplit(".", 1)[-1]
+    return Response(stream_with_context(chunks), mimetype=AUDIO_MIMETYPES.get(ext, "application/octet-stream"))
+
+@app.route("/stats/tts-cache")
+def tts_cache_stats():
+    return get_tts_cache().stats()
+
+def compute_reply_in_background(call_sid, user_text):
+    """Berechnet die Antwort und legt die URLs in der Session ab"""
+    try:
+        audio_urls = llm_reply(call_sid, user_text)
+        result = {"status": "ready", "audio_urls": audio_urls}
+    except Exception as e:
+        print(f"❌ Fehler bei Hintergrund-Antwort: {e}")
+        result = {"status": "failed", "audio_urls": []}
+    store_reply(call_sid, result)
+
+def wait_for_reply(call_sid, timeout):
+    deadline = time.monotonic() + timeout
+    while True:
+        pending = take_reply(call_sid)
+        if pending:
+            return pending
+        if time.monotonic() >= deadline:
+            return None
+        time.sleep(0.1)
 
 
 @app.route("/voice", methods=['GET', 'POST'])
@@ -65,9 +72,12 @@ def voice():
     request_id = request.values.get("request_id")
     title = request.values.get("title")
     description = request.values.get("description")
+    call_sid = request.values.get("CallSid", "")
+    if request.values.get("mode") == "stream":
+        print("⚠️ Realtime-Modus braucht den ASGI-Server (twillio/asgi_server.py), nutze Gather")
 
     resp = VoiceResponse()
-    resp.play(llm_start(request_id, title, description))
+    play_for_call(resp, call_sid, llm_start(call_sid, request_id, title, description))
     resp.append(build_gather())
     return str(resp)
 
@@ -79,10 +89,20 @@ def gather():
     values = request.values
 
     user_input = values.get('SpeechResult', '').strip().lower()
+    call_sid = values.get('CallSid', '')
 
     if user_input:
-        audio_url = llm_reply(user_input)
-        resp.play(audio_url)
+        filler = get_filler(CALL_LANGUAGE, "wait")
+        if filler:
+            # Sofort ein "Einen Moment bitte", die echte Antwort holt /gather/reply
+            store_reply(call_sid, {"status": "pending", "audio_urls": []})
+            reply_pool.submit(compute_reply_in_background, call_sid, user_input)
+            resp.play(f"/audio/{filler}")
+            resp.redirect('/gather/reply?attempt=1', method='POST')
+            return str(resp)
+
+        for audio_url in llm_reply(call_sid, user_input):
+            play_for_call(resp, call_sid, audio_url)
         resp.append(build_gather())
         return str(resp)
 
@@ -91,6 +111,30 @@ def gather():
     return str(resp)
 
 
+@app.route("/gather/reply", methods=['GET', 'POST'])
+def gather_reply():
+    """Spielt die im Hintergrund berechnete Antwort ab."""
+    resp = VoiceResponse()
+    call_sid = request.values.get('CallSid', '')
+    attempt = int(request.values.get('attempt', '1'))
+
+    reply = wait_for_reply(call_sid, REPLY_WAIT_SECONDS)
+    if reply is None and attempt < MAX_REPLY_REDIRECTS:
+        filler = get_filler(CALL_LANGUAGE, "wait")
+        if filler:
+            resp.play(f"/audio/{filler}")
+        resp.redirect(f'/gather/reply?attempt={attempt + 1}', method='POST')
+        return str(resp)
+
+    if reply and reply["audio_urls"]:
+        for audio_url in reply["audio_urls"]:
+            play_for_call(resp, call_sid, audio_url)
+    else:
+        resp.say("Sorry, could you please repeat that?", language='en-US')
+    resp.append(build_gather())
+    return str(resp)
+
+
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 5001))
     app.run(debug=True, host='0.0.0.0', port=port)
@@ -0,0 +1,230 @@
+"""
+Outbound Dialer um client.calls.create
+Token Bucket pro Absender-Nummer, Limit für gleichzeitige Calls,
+Retry mit Jitter bei 429 und Metriken für Queue und Wählzeit
+
+Alle Limits gelten pro Prozess: Token Bucket und Live-Call-Zähler liegen im
+Speicher des Workers, der wählt. Das Backend wählt deshalb aus genau einem
+Prozess (uvicorn ohne --workers). Wer mehrere Worker startet, muss
+TWILIO_CALLS_PER_SECOND und MAX_LIVE_CALLS durch die Anzahl der Worker
+teilen; außerdem gibt ein Status-Callback, der bei einem anderen Worker
+landet, den Slot nicht frei (er läuft erst nach MAX_CALL_SECONDS ab).
+"""
+import os
+import queue
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Callable, Dict, Optional
+
+from twilio.base.exceptions import TwilioRestException
+
+
+# Twilio erlaubt standardmäßig 1 Call pro Sekunde pro Account/Nummer
+CALLS_PER_SECOND = float(os.getenv("TWILIO_CALLS_PER_SECOND", "1"))
+BURST = int(os.getenv("TWILIO_CALL_BURST", "1"))
+# 0 = kein Limit. Braucht den Status-Callback (BACKEND_PUBLIC_URL), sonst wird kein Slot frei
+MAX_LIVE_CALLS = int(os.getenv("MAX_LIVE_CALLS", "20"))
+# Kommt kein Status-Callback, gilt ein Call nach dieser Zeit als beendet
+MAX_CALL_SECONDS = int(os.getenv("MAX_CALL_SECONDS", "900"))
+DIAL_WORKERS = int(os.getenv("DIAL_WORKERS", "4"))
+MAX_RETRIES = int(os.getenv("DIAL_MAX_RETRIES", "5"))
+BACKOFF_BASE_SECONDS = 0.5
+BACKOFF_MAX_SECONDS = 30.0
+RETRYABLE_STATUS = {429, 503}
+
+
+class TokenBucket:
+    """Klassischer Token Bucket: rate Tokens pro Sekunde, höchstens capacity gespart"""
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Blockiert, bis ein Token frei ist"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class Dialer:
+    """
+    Nicht-blockierendes Wählen: submit() reiht ein und gibt sofort ein Future zurück
+
+    Worker-Threads holen Aufträge aus der Queue, warten auf einen freien
+    Live-Call-Slot und ein Token der Absender-Nummer und rufen dann
+    create_call(**kwargs) auf.
+    """
+
+    def __init__(self, create_call: Callable[..., object],
+                 calls_per_second: float = CALLS_PER_SECOND,
+                 burst: int = BURST,
+                 max_live_calls: int = MAX_LIVE_CALLS,
+                 max_call_seconds: int = MAX_CALL_SECONDS,
+                 workers: int = DIAL_WORKERS,
+                 max_retries: int = MAX_RETRIES):
+        self.create_call = create_call
+        self.calls_per_second = calls_per_second
+        self.burst = burst
+        self.max_live_calls = max_live_calls
+        self.max_call_seconds = max_call_seconds
+        self.max_retries = max_retries
+
+        self._queue: "queue.Queue" = queue.Queue()
+        self._buckets: Dict[str, TokenBucket] = {}
+        # call_sid -> läuft spätestens ab um (monotonic)
+        self._live: Dict[str, float] = {}
+        self._reserved = 0
+        self._cond = threading.Condition()
+
+        self.dialed = 0
+        self.failed = 0
+        self.retries = 0
+        self._latencies = deque(maxlen=500)
+        self._metrics_lock = threading.Lock()
+
+        self._workers = [
+            threading.Thread(target=self._work, name=f"dialer-{i}", daemon=True)
+            for i in range(workers)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def submit(self, **call_kwargs) -> Future:
+        """
+        Reiht einen Anruf ein
+
+        Args:
+            call_kwargs: Parameter für client.calls.create (to, from_, url, ...)
+
+        Returns:
+            Future, das mit dem Call-Objekt (bzw. der Exception) erfüllt wird
+        """
+        future: Future = Future()
+        self._queue.put((call_kwargs, future, time.monotonic()))
+        return future
+
+    def release(self, call_sid: str):
+        """Call ist beendet (Status-Callback) -> Slot wieder frei"""
+        with self._cond:
+            if self._live.pop(call_sid, None) is not None:
+                self._cond.notify()
+
+    def _bucket(self, from_number: str) -> TokenBucket:
+        with self._cond:
+            bucket = self._buckets.get(from_number)
+            if bucket is None:
+                bucket = self._buckets[from_number] = TokenBucket(self.calls_per_second, self.burst)
+            return bucket
+
+    def _live_count_locked(self) -> int:
+        now = time.monotonic()
+        for call_sid, expires_at in list(self._live.items()):
+            if expires_at < now:
+                del self._live[call_sid]
+        return len(self._live) + self._reserved
+
+    def _reserve_slot(self):
+        with self._cond:
+            while self.max_live_calls > 0 and self._live_count_locked() >= self.max_live_calls:
+                # Timeout, damit abgelaufene Calls auch ohne release() frei werden
+                self._cond.wait(timeout=1.0)
+            self._reserved += 1
+
+    def _commit_slot(self, call_sid: Optional[str]):
+        with self._cond:
+            self._reserved -= 1
+            if call_sid:
+                self._live[call_sid] = time.monotonic() + self.max_call_seconds
+            self._cond.notify()
+
+    def _work(self):
+        while True:
+            call_kwargs, future, submitted_at = self._queue.get()
+            if not future.set_running_or_notify_cancel():
+                continue
+            self._reserve_slot()
+            call = None
+            try:
+                call = self._dial(call_kwargs)
+                with self._metrics_lock:
+                    self.dialed += 1
+                    self._latencies.append(time.monotonic() - submitted_at)
+                future.set_result(call)
+            except Exception as e:
+                with self._metrics_lock:
+                    self.failed += 1
+                future.set_exception(e)
+            finally:
+                self._commit_slot(getattr(call, "sid", None))
+
+    def _dial(self, call_kwargs: dict):
+        bucket = self._bucket(call_kwargs.get("from_") or "")
+        attempt = 0
+        while True:
+            bucket.acquire()
+            try:
+                return self.create_call(**call_kwargs)
+            except TwilioRestException as e:
+                if e.status not in RETRYABLE_STATUS or attempt >= self.max_retries:
+                    raise
+                # Full Jitter: zufällig zwischen 0 und dem exponentiellen Backoff
+                delay = random.uniform(0, min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** attempt))
+                attempt += 1
+                with self._metrics_lock:
+                    self.retries += 1
+                print(f"⏳ Twilio {e.status}, retry {attempt}/{self.max_retries} in {delay:.2f}s")
+                time.sleep(delay)
+
+    def stats(self) -> dict:
+        with self._metrics_lock:
+            latencies = sorted(self._latencies)
+            dialed, failed, retries = self.dialed, self.failed, self.retries
+        with self._cond:
+            live = self._live_count_locked()
+        return {
+            "queue_depth": self._queue.qsize(),
+            "live_calls": live,
+            "max_live_calls": self.max_live_calls,
+            "dialed": dialed,
+            "failed": failed,
+            "retries": retries,
+            "dial_latency_avg_s": sum(latencies) / len(latencies) if latencies else 0.0,
+            "dial_latency_p95_s": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] if latencies else 0.0,
+        }
+
+
+_dialer: Optional[Dialer] = None
+_dialer_lock = threading.Lock()
+
+
+def get_dialer() -> Dialer:
+    global _dialer
+    if _dialer is None:
+        with _dialer_lock:
+            if _dialer is None:
+                from clients.registry import get_twilio_client
+
+                max_live_calls = MAX_LIVE_CALLS
+                if max_live_calls > 0 and not os.getenv("BACKEND_PUBLIC_URL", "").strip():
+                    # Ohne Status-Callback erfährt der Dialer nie, dass ein Call vorbei ist
+                    print("⚠️ BACKEND_PUBLIC_URL ist nicht gesetzt, MAX_LIVE_CALLS wird ignoriert")
+                    max_live_calls = 0
+                _dialer = Dialer(
+                    lambda **kwargs: get_twilio_client().calls.create(**kwargs),
+                    max_live_calls=max_live_calls,
+                )
+    return _dialer
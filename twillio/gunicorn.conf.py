@@ -0,0 +1,25 @@
+"""
+Deployment des Call-Servers mit mehreren Workern
+
+    gunicorn -c twillio/gunicorn.conf.py twillio.asgi_server:app
+
+Bei einem Deploy (SIGTERM / SIGHUP) nimmt ein Worker keine neuen
+Verbindungen mehr an, beantwortet die laufenden Webhooks und wartet auf
+Hintergrund-Antworten (asgi_server.CallDrain). Erst nach graceful_timeout
+wird hart beendet.
+"""
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5001')}"
+workers = int(os.getenv("CALL_SERVER_WORKERS", "2"))
+worker_class = "uvicorn.workers.UvicornWorker"
+# Etwas mehr als CALL_DRAIN_TIMEOUT_SECONDS, damit der Drain durchlaufen kann
+graceful_timeout = int(os.getenv("CALL_SERVER_GRACEFUL_TIMEOUT", "30"))
+timeout = 60
+# Twilio hält Verbindungen zwischen den Webhooks eines Calls offen
+keepalive = 75
+
+
+def on_starting(server):
+    if workers > 1 and os.getenv("SESSION_STORE", "memory").lower() != "sqlite":
+        server.log.warning("CALL_SERVER_WORKERS > 1 ohne SESSION_STORE=sqlite: Sessions sind pro Worker getrennt")
@@ -0,0 +1,249 @@
+"""
+Realtime-Modus über Twilio Media Streams (bidirektionaler WebSocket)
+Statt Gather -> Webhook -> <Play> pro Turn bleibt der Call auf einem Socket:
+eingehende μ-law Frames -> STT-Stufe -> Gemini -> ElevenLabs in ulaw_8000,
+dessen Chunks ohne Umkodierung direkt zurück in den Socket gehen.
+
+Pro Call wählbar über /voice?mode=stream (start_call(mode="stream")),
+Default bleibt der Gather-Flow. Läuft nur im ASGI-Server.
+"""
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import aclosing
+from typing import Iterable, Iterator, Optional, Set, Tuple
+import asyncio
+import base64
+import itertools
+import json
+import os
+import sys
+import threading
+
+# Pfad erweitern, damit Module im Root-Verzeichnis gefunden werden
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from starlette.websockets import WebSocket, WebSocketDisconnect
+from twilio.twiml.voice_response import Connect, VoiceResponse
+from language_input.speech_to_text import SpeechRecognizer, create_recognizer
+from language_output.language_output import prefetch_speech, speech_chunks
+from language_output.tts_cache import get_tts_cache
+from llmcall_method.callgemini import generate_llm_reply_stream
+from twillio.call_flow import outcome_tracker, sessions, start_conversation
+from twillio.turn_engine import iter_turn
+
+# μ-law 8 kHz ist das Format, das Twilio im Socket erwartet
+STREAM_OUTPUT_FORMAT = "ulaw_8000"
+# Werden als <Parameter> an den Stream gehängt und kommen im start-Event zurück
+STREAM_PARAMETERS = ("request_id", "title", "description")
+
+# LLM- und Audio-Iteratoren sind synchron, pro aktivem Turn laufen zwei davon
+_stream_pool = ThreadPoolExecutor(
+    max_workers=int(os.getenv("MEDIA_STREAM_THREADS", "64")),
+    thread_name_prefix="media-stream",
+)
+
+
+def build_stream_twiml(stream_url: str, values: dict) -> VoiceResponse:
+    """<Connect><Stream> statt <Gather>, der Request-Kontext reist als Parameter mit"""
+    resp = VoiceResponse()
+    connect = Connect()
+    stream = connect.stream(url=stream_url)
+    for name in STREAM_PARAMETERS:
+        if values.get(name):
+            stream.parameter(name=name, value=values[name])
+    resp.append(connect)
+    return resp
+
+
+async def _run_ahead(iterable: Iterable):
+    """
+    Iteriert einen blockierenden Iterator in einem Thread, ohne auf den Leser zu warten
+
+    So schreibt Gemini schon den nächsten Satz (und dessen TTS startet),
+    während der aktuelle noch in den Socket geht. Mit aclosing() benutzen,
+    dann beendet ein Abbruch (Barge-in) auch den Thread.
+    """
+    loop = asyncio.get_running_loop()
+    stop = threading.Event()
+    queue: asyncio.Queue = asyncio.Queue()
+    done = object()
+
+    def put(item):
+        try:
+            loop.call_soon_threadsafe(queue.put_nowait, item)
+        except RuntimeError:
+            # Loop ist schon zu (Shutdown)
+            stop.set()
+
+    def produce():
+        iterator = iter(iterable)
+        try:
+            for item in iterator:
+                if stop.is_set():
+                    break
+                put(item)
+        except Exception as e:
+            put(e)
+        finally:
+            close = getattr(iterator, "close", None)
+            if close is not None:
+                close()
+            put(done)
+
+    loop.run_in_executor(_stream_pool, produce)
+    try:
+        while True:
+            item = await queue.get()
+            if item is done:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        stop.set()
+
+
+def _opening_turn(call_sid: str, params: dict) -> Iterator[Tuple[str, Optional[str]]]:
+    text, _ = start_conversation(call_sid, params.get("request_id"), params.get("title"), params.get("description"))
+    # Vorberechnete Eröffnung liegt als MP3 vor -> in μ-law neu synthetisieren (danach Cache-Treffer)
+    yield text, prefetch_speech(text, output_format=STREAM_OUTPUT_FORMAT)
+
+
+def _reply_turn(call_sid: str, user_text: str) -> Iterator[Tuple[str, Optional[str]]]:
+    print(f"User sagte: {user_text}") # Debugging
+    session = sessions.append_turn(call_sid, f"Caller: {user_text}")
+    # Satz für Satz: TTS startet, während Gemini noch weiterschreibt
+    yield from iter_turn(generate_llm_reply_stream(user_text, session.turns), STREAM_OUTPUT_FORMAT)
+
+
+class MediaStreamCall:
+    """
+    Ein Call im Realtime-Modus, lebt so lange wie der WebSocket
+
+    Twilio schickt connected, start, media (20 ms μ-law, base64), mark und
+    stop. Zurück gehen media, mark (Ende einer Antwort) und clear: fängt das
+    Gegenüber an zu sprechen, während der Agent noch redet, wird die
+    laufende Antwort abgebrochen und Twilios Wiedergabepuffer geleert.
+    """
+
+    def __init__(self, websocket: WebSocket, recognizer: Optional[SpeechRecognizer] = None):
+        self.ws = websocket
+        self.recognizer = recognizer or create_recognizer()
+        self.stream_sid: Optional[str] = None
+        self.call_sid = ""
+        self._speaking: Optional[asyncio.Task] = None
+        self._transcribing: Set[asyncio.Task] = set()
+        # Nacheinander antworten, auch wenn zwei Äußerungen kurz hintereinander enden
+        self._turn_lock = asyncio.Lock()
+        self._pending_marks: Set[str] = set()
+        self._mark_ids = itertools.count(1)
+
+    @property
+    def speaking(self) -> bool:
+        """Agent erzeugt noch Audio oder Twilio spielt noch welches ab"""
+        return bool(self._pending_marks) or (self._speaking is not None and not self._speaking.done())
+
+    async def run(self):
+        try:
+            while True:
+                message = json.loads(await self.ws.receive_text())
+                event = message.get("event")
+                if event == "start":
+                    self._on_start(message["start"])
+                elif event == "media":
+                    await self._on_media(message["media"])
+                elif event == "mark":
+                    self._pending_marks.discard(message.get("mark", {}).get("name"))
+                elif event == "stop":
+                    break
+        except WebSocketDisconnect:
+            pass
+        finally:
+            await self._close()
+
+    def _on_start(self, start: dict):
+        self.stream_sid = start.get("streamSid")
+        self.call_sid = start.get("callSid", "")
+        print(f"🔌 Media Stream {self.stream_sid} für Call {self.call_sid}")
+        params = start.get("customParameters") or {}
+        self._speaking = asyncio.create_task(self._speak(_opening_turn(self.call_sid, params)))
+
+    async def _on_media(self, media: dict):
+        if media.get("track", "inbound") != "inbound":
+            return
+        event = self.recognizer.accept(base64.b64decode(media["payload"]))
+        if event is None:
+            return
+        if event.kind == "start":
+            if self.speaking:
+                await self._interrupt()
+        elif event.kind == "end":
+            task = asyncio.create_task(self._respond(event.audio))
+            self._transcribing.add(task)
+            task.add_done_callback(self._transcribing.discard)
+
+    async def _respond(self, audio: bytes):
+        loop = asyncio.get_running_loop()
+        try:
+            text = await loop.run_in_executor(_stream_pool, self.recognizer.transcribe, audio)
+        except Exception as e:
+            print(f"❌ Fehler bei der Spracherkennung: {e}")
+            return
+        if not text:
+            return
+        async with self._turn_lock:
+            if self.speaking:
+                await self._interrupt()
+            self._speaking = asyncio.create_task(self._speak(_reply_turn(self.call_sid, text), text))
+            await asyncio.gather(self._speaking, return_exceptions=True)
+
+    async def _speak(self, turn: Iterable[Tuple[str, Optional[str]]], user_text: Optional[str] = None):
+        """Sätze eines Turns der Reihe nach als μ-law in den Socket schreiben"""
+        spoken = []
+        try:
+            async with aclosing(_run_ahead(turn)) as sentences:
+                async for sentence, filename in sentences:
+                    spoken.append(sentence)
+                    chunks = speech_chunks(filename) if filename else None
+                    if chunks is None:
+                        continue
+                    async with aclosing(_run_ahead(chunks)) as audio:
+                        async for chunk in audio:
+                            await self._send("media", media={"payload": base64.b64encode(chunk).decode("ascii")})
+            mark = f"turn-{next(self._mark_ids)}"
+            self._pending_marks.add(mark)
+            await self._send("mark", mark={"name": mark})
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"❌ Fehler im Media Stream Turn: {e}")
+        finally:
+            if user_text is not None and spoken:
+                # Nur Sätze, die schon an Twilio gingen, landen im Verlauf
+                text = " ".join(spoken)
+                sessions.append_turn(self.call_sid, f"Assistant: {text}")
+                # Ergebnis (gebucht? wann?) im Hintergrund nachziehen, nicht auf dem Antwortpfad
+                outcome_tracker(self.call_sid).observe(user_text, text)
+
+    async def _interrupt(self):
+        """Barge-in: laufende Antwort abbrechen und Twilios Puffer leeren"""
+        if self._speaking is not None and not self._speaking.done():
+            self._speaking.cancel()
+            await asyncio.gather(self._speaking, return_exceptions=True)
+        self._pending_marks.clear()
+        await self._send("clear")
+
+    async def _send(self, event: str, **fields):
+        await self.ws.send_text(json.dumps({"event": event, "streamSid": self.stream_sid, **fields}))
+
+    async def _close(self):
+        tasks = list(self._transcribing)
+        if self._speaking is not None:
+            tasks.append(self._speaking)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self.recognizer.close()
+        # Socket zu = Call vorbei, das Backend gibt beim Status-Callback ebenfalls frei
+        get_tts_cache().release_call(self.call_sid)
+        print(f"🔌 Media Stream {self.stream_sid} beendet")
@@ -0,0 +1,115 @@
+"""
+Vorberechnete Gesprächseröffnungen
+Text + Audio werden bei Request-Eingang erzeugt, /voice spielt sie nur noch ab
+"""
+import json
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import Optional
+
+from language_output.language_output import talk
+from llmcall_method.callgemini import generate_llm_start
+
+
+DEFAULT_OPENER_DIR = os.getenv(
+    "OPENER_DIR",
+    str(Path(__file__).resolve().parent / "openers"),
+)
+DEFAULT_OPENER_TTL_SECONDS = int(os.getenv("OPENER_TTL_SECONDS", "3600"))
+
+
+class OpenerStore:
+    """
+    Eine JSON-Datei pro request_id
+
+    Liegt im Dateisystem, damit Backend (schreibt) und Call Server (liest)
+    als getrennte Prozesse darauf zugreifen können.
+    """
+
+    def __init__(self, directory: str = DEFAULT_OPENER_DIR, ttl_seconds: int = DEFAULT_OPENER_TTL_SECONDS):
+        self.directory = directory
+        self.ttl_seconds = ttl_seconds
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, request_id: str) -> str:
+        safe_id = "".join(c for c in request_id if c.isalnum() or c in "-_")
+        return os.path.join(self.directory, f"{safe_id}.json")
+
+    def put(self, request_id: str, text: str, audio_filename: str):
+        entry = {
+            "request_id": request_id,
+            "text": text,
+            "audio_filename": audio_filename,
+            "created_at": time.time(),
+        }
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix=".tmp_")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(entry, f, ensure_ascii=False)
+        os.replace(tmp_path, self._path(request_id))
+
+    def get(self, request_id: str) -> Optional[dict]:
+        try:
+            with open(self._path(request_id), encoding="utf-8") as f:
+                entry = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        if time.time() - entry.get("created_at", 0) > self.ttl_seconds:
+            self.delete(request_id)
+            return None
+        return entry
+
+    def delete(self, request_id: str):
+        try:
+            os.remove(self._path(request_id))
+        except FileNotFoundError:
+            pass
+
+    def purge(self) -> int:
+        """Löscht abgelaufene bzw. nie abgespielte Eröffnungen"""
+        removed = 0
+        cutoff = time.time() - self.ttl_seconds
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+                    removed += 1
+            except FileNotFoundError:
+                pass
+        return removed
+
+
+_store: Optional[OpenerStore] = None
+
+
+def get_opener_store() -> OpenerStore:
+    global _store
+    if _store is None:
+        _store = OpenerStore()
+    return _store
+
+
+def prepare_opener(request_id, title=None, description=None) -> Optional[dict]:
+    """
+    Erzeugt Eröffnungstext und Audio für einen Request (blockierend)
+
+    Returns:
+        Der gespeicherte Eintrag oder None, wenn die Synthese fehlschlug
+    """
+    store = get_opener_store()
+    store.purge()
+
+    existing = store.get(request_id)
+    if existing:
+        return existing
+
+    text = generate_llm_start(request_id, title, description)
+    print("AI Start Text (precomputed):", text)
+    audio_filename = talk(text)
+    if not audio_filename:
+        return None
+
+    store.put(request_id, text, audio_filename)
+    return store.get(request_id)
@@ -0,0 +1,297 @@
+"""
+Session Store für laufende Anrufe
+Hält kompakten Zustand pro Twilio CallSid (Request-Kontext + letzte Turns)
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field, asdict
+from pathlib import Path
+from typing import List, Optional
+
+
+DEFAULT_TTL_SECONDS = int(os.getenv("SESSION_TTL_SECONDS", "1800"))
+DEFAULT_MAX_TURNS = int(os.getenv("SESSION_MAX_TURNS", "12"))
+DEFAULT_MAX_SESSIONS = int(os.getenv("SESSION_MAX_SESSIONS", "1000"))
+DEFAULT_DB_PATH = os.getenv(
+    "SESSION_DB_PATH",
+    str(Path(__file__).resolve().parent / "sessions.sqlite3"),
+)
+
+
+@dataclass
+class CallSession:
+    """Kompakter Zustand eines einzelnen Anrufs"""
+    call_sid: str
+    request_id: Optional[str] = None
+    title: Optional[str] = None
+    description: Optional[str] = None
+    turns: List[str] = field(default_factory=list)
+    # Antwort, die im Hintergrund berechnet wird (siehe /gather/reply)
+    pending_reply: Optional[dict] = None
+    completed: bool = False
+    created_at: float = field(default_factory=time.time)
+    updated_at: float = field(default_factory=time.time)
+
+    def add_turn(self, text: str, max_turns: int = DEFAULT_MAX_TURNS):
+        """Hängt einen Turn an und behält nur die letzten max_turns"""
+        self.turns.append(text)
+        if len(self.turns) > max_turns:
+            del self.turns[:-max_turns]
+        self.updated_at = time.time()
+
+    def to_json(self) -> str:
+        return json.dumps(asdict(self), ensure_ascii=False)
+
+    @classmethod
+    def from_json(cls, raw: str) -> "CallSession":
+        return cls(**json.loads(raw))
+
+
+class SessionStore:
+    """
+    Basisklasse für Session Backends
+
+    Sessions werden nach ttl_seconds Inaktivität entfernt, abgeschlossene
+    Calls sofort. Mehr als max_sessions werden per LRU verdrängt.
+    """
+
+    def __init__(self, ttl_seconds: int = DEFAULT_TTL_SECONDS,
+                 max_turns: int = DEFAULT_MAX_TURNS,
+                 max_sessions: int = DEFAULT_MAX_SESSIONS):
+        self.ttl_seconds = ttl_seconds
+        self.max_turns = max_turns
+        self.max_sessions = max_sessions
+
+    def get(self, call_sid: str) -> Optional[CallSession]:
+        raise NotImplementedError
+
+    def save(self, session: CallSession):
+        raise NotImplementedError
+
+    def delete(self, call_sid: str):
+        raise NotImplementedError
+
+    def purge(self) -> int:
+        """Entfernt abgelaufene Sessions, gibt die Anzahl zurück"""
+        raise NotImplementedError
+
+    def save_outcome(self, call_sid: str, outcome: dict):
+        """
+        Strukturiertes Gesprächsergebnis ablegen
+
+        Getrennt von der Session gespeichert, damit das Hintergrund-Update
+        nicht mit save() der Request-Handler um dieselbe Zeile konkurriert.
+        """
+        raise NotImplementedError
+
+    def get_outcome(self, call_sid: str) -> Optional[dict]:
+        raise NotImplementedError
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+    def get_or_create(self, call_sid: str, request_id=None, title=None, description=None) -> CallSession:
+        session = self.get(call_sid)
+        if session is None:
+            session = CallSession(
+                call_sid=call_sid,
+                request_id=request_id,
+                title=title,
+                description=description,
+            )
+            self.save(session)
+        return session
+
+    def append_turn(self, call_sid: str, text: str) -> CallSession:
+        session = self.get_or_create(call_sid)
+        session.add_turn(text, self.max_turns)
+        self.save(session)
+        return session
+
+    def complete(self, call_sid: str):
+        """Markiert einen Call als beendet -> wird sofort freigegeben"""
+        self.delete(call_sid)
+
+    def _is_expired(self, session: CallSession, now: float) -> bool:
+        return session.completed or now - session.updated_at > self.ttl_seconds
+
+
+class MemorySessionStore(SessionStore):
+    """In-Process Backend (ein Worker)"""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._sessions: "OrderedDict[str, CallSession]" = OrderedDict()
+        self._outcomes: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, call_sid):
+        now = time.time()
+        with self._lock:
+            session = self._sessions.get(call_sid)
+            if session is None:
+                return None
+            if self._is_expired(session, now):
+                del self._sessions[call_sid]
+                return None
+            self._sessions.move_to_end(call_sid)
+            # Kopie zurückgeben, damit Änderungen erst mit save() sichtbar werden
+            return CallSession.from_json(session.to_json())
+
+    def save(self, session):
+        session.updated_at = time.time()
+        with self._lock:
+            self._sessions[session.call_sid] = CallSession.from_json(session.to_json())
+            self._sessions.move_to_end(session.call_sid)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+
+    def delete(self, call_sid):
+        with self._lock:
+            self._sessions.pop(call_sid, None)
+            self._outcomes.pop(call_sid, None)
+
+    def purge(self):
+        now = time.time()
+        with self._lock:
+            expired = [sid for sid, s in self._sessions.items() if self._is_expired(s, now)]
+            for sid in expired:
+                del self._sessions[sid]
+            for sid in [sid for sid, (_, updated_at) in self._outcomes.items() if now - updated_at > self.ttl_seconds]:
+                del self._outcomes[sid]
+        return len(expired)
+
+    def save_outcome(self, call_sid, outcome):
+        with self._lock:
+            self._outcomes[call_sid] = (dict(outcome), time.time())
+            self._outcomes.move_to_end(call_sid)
+            while len(self._outcomes) > self.max_sessions:
+                self._outcomes.popitem(last=False)
+
+    def get_outcome(self, call_sid):
+        with self._lock:
+            entry = self._outcomes.get(call_sid)
+            return dict(entry[0]) if entry else None
+
+    def __len__(self):
+        with self._lock:
+            return len(self._sessions)
+
+
+class SQLiteSessionStore(SessionStore):
+    """
+    Lokales SQLite Backend, das sich mehrere Worker-Prozesse teilen können
+    """
+
+    def __init__(self, db_path: str = DEFAULT_DB_PATH, **kwargs):
+        super().__init__(**kwargs)
+        self.db_path = db_path
+        self._local = threading.local()
+        with self._conn() as conn:
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS call_sessions (
+                    call_sid TEXT PRIMARY KEY,
+                    data TEXT NOT NULL,
+                    updated_at REAL NOT NULL
+                )"""
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_call_sessions_updated ON call_sessions(updated_at)"
+            )
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS call_outcomes (
+                    call_sid TEXT PRIMARY KEY,
+                    data TEXT NOT NULL,
+                    updated_at REAL NOT NULL
+                )"""
+            )
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, call_sid):
+        row = self._conn().execute(
+            "SELECT data FROM call_sessions WHERE call_sid = ?", (call_sid,)
+        ).fetchone()
+        if row is None:
+            return None
+        session = CallSession.from_json(row[0])
+        if self._is_expired(session, time.time()):
+            self.delete(call_sid)
+            return None
+        return session
+
+    def save(self, session):
+        session.updated_at = time.time()
+        conn = self._conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO call_sessions (call_sid, data, updated_at) VALUES (?, ?, ?)",
+            (session.call_sid, session.to_json(), session.updated_at),
+        )
+        # LRU: älteste Sessions über dem Limit verdrängen
+        conn.execute(
+            """DELETE FROM call_sessions WHERE call_sid IN (
+                SELECT call_sid FROM call_sessions ORDER BY updated_at DESC LIMIT -1 OFFSET ?
+            )""",
+            (self.max_sessions,),
+        )
+
+    def delete(self, call_sid):
+        conn = self._conn()
+        conn.execute("DELETE FROM call_sessions WHERE call_sid = ?", (call_sid,))
+        conn.execute("DELETE FROM call_outcomes WHERE call_sid = ?", (call_sid,))
+
+    def purge(self):
+        conn = self._conn()
+        cutoff = time.time() - self.ttl_seconds
+        cursor = conn.execute("DELETE FROM call_sessions WHERE updated_at < ?", (cutoff,))
+        conn.execute("DELETE FROM call_outcomes WHERE updated_at < ?", (cutoff,))
+        return cursor.rowcount
+
+    def save_outcome(self, call_sid, outcome):
+        self._conn().execute(
+            "INSERT OR REPLACE INTO call_outcomes (call_sid, data, updated_at) VALUES (?, ?, ?)",
+            (call_sid, json.dumps(outcome, ensure_ascii=False), time.time()),
+        )
+
+    def get_outcome(self, call_sid):
+        row = self._conn().execute(
+            "SELECT data FROM call_outcomes WHERE call_sid = ?", (call_sid,)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def __len__(self):
+        return self._conn().execute("SELECT COUNT(*) FROM call_sessions").fetchone()[0]
+
+
+_store: Optional[SessionStore] = None
+_store_lock = threading.Lock()
+
+
+def get_session_store() -> SessionStore:
+    """
+    Liefert den prozessweiten Session Store
+
+    SESSION_STORE=memory (Default) oder SESSION_STORE=sqlite für
+    Deployments mit mehreren Workern.
+    """
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                backend = os.getenv("SESSION_STORE", "memory").lower()
+                if backend == "sqlite":
+                    _store = SQLiteSessionStore()
+                else:
+                    _store = MemorySessionStore()
+    return _store
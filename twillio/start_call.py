@@ -1,16 +1,18 @@
 import os
+import sys
 import urllib.parse
+from pathlib import Path
 from dotenv import load_dotenv
-from twilio.rest import Client
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from twillio.dialer import get_dialer
 
 
 load_dotenv()
 
-# 1. Deine Zugangsdaten aus Umgebungsvariablen
-account_sid = os.getenv('TWILIO_ACCOUNT_SID')
-auth_token = os.getenv('TWILIO_AUTH_TOKEN')
-client = Client(account_sid, auth_token)
+# 1. Zugangsdaten kommen aus den Umgebungsvariablen, gewählt wird über den Dialer
+# (Rate Limit pro Nummer, Limit für gleichzeitige Calls, Retry bei 429)
 
 # 2. Der Anruf starten
 # Damit Twilio mit deinem lokalen Server sprechen kann, brauchen wir die öffentliche URL (Dev Tunnel/Ngrok).
@@ -20,13 +22,33 @@ webhook_url = os.getenv("PUBLIC_BASE_URL", "http://127.0.0.1:5001").strip().rstr
 if not webhook_url.endswith('/voice'):
     webhook_url = f"{webhook_url}/voice"
 
+# Status-Callbacks (ringing, answered, completed) gehen an das Backend, nicht an den Call Server
+backend_url = os.getenv("BACKEND_PUBLIC_URL", "").strip().rstrip('/')
+STATUS_CALLBACK_EVENTS = ["initiated", "ringing", "answered", "completed"]
+
+# gather (Twilio STT + <Play>) oder stream (Realtime über Media Streams)
+CALL_MODES = ("gather", "stream")
+DEFAULT_CALL_MODE = os.getenv("CALL_MODE", "gather")
+
+
 
 
+def start_call(number=None, request_id=None, title=None, description=None, mode=None):
+    """
+    Reiht den Anruf beim Dialer ein und kehrt sofort zurück
 
-def start_call(number=None, request_id=None, title=None, description=None):
+    Args:
+        mode: "gather" oder "stream" (Default: CALL_MODE)
+
+    Returns:
+        concurrent.futures.Future mit dem Twilio Call-Objekt
+    """
     to_number = number or os.getenv('TARGET_PHONE_NUMBER')
     if not to_number:
         raise ValueError("TARGET_PHONE_NUMBER ist nicht gesetzt und keine Nummer wurde übergeben.")
+    mode = mode or DEFAULT_CALL_MODE
+    if mode not in CALL_MODES:
+        raise ValueError(f"Unbekannter Call-Modus: {mode}")
 
     # Parameter vorbereiten
     params = {}
@@ -37,6 +59,8 @@ def start_call(number=None, request_id=None, title=None, description=None):
     if description:
         # Achtung: Zu lange Beschreibungen können die URL-Länge sprengen!
         params['description'] = description
+    if mode != "gather":
+        params['mode'] = mode
 
     # URL zusammenbauen
     call_url = webhook_url
@@ -45,17 +69,35 @@ def start_call(number=None, request_id=None, title=None, description=None):
         query_string = urllib.parse.urlencode(params)
         call_url = f"{webhook_url}?{query_string}"
 
-    call = client.calls.create(
+    status_kwargs = {}
+    if backend_url:
+        status_url = f"{backend_url}/api/twilio/status"
+        if request_id:
+            status_url = f"{status_url}?{urllib.parse.urlencode({'request_id': request_id})}"
+        status_kwargs = {
+            'status_callback': status_url,
+            'status_callback_event': STATUS_CALLBACK_EVENTS,
+            'status_callback_method': 'POST',
+        }
+
+    future = get_dialer().submit(
         # Wohin soll angerufen werden? (Muss im Trial-Modus verifiziert sein!)
         to=to_number,
         # Von welcher Nummer kommt der Anruf? (Deine Twilio-Nummer)
         from_=os.getenv('TWILIO_PHONE_NUMBER'),
         # Hier sagen wir Twilio: "Lade deine Anweisungen von dieser URL"
-        url=call_url
+        url=call_url,
+        **status_kwargs
     )
 
-    print(f"Anruf gestartet! SID: {call.sid}")
-    return call
+    def log_result(done):
+        if done.exception():
+            print(f"❌ Anruf für {request_id} fehlgeschlagen: {done.exception()}")
+        else:
+            print(f"Anruf gestartet! SID: {done.result().sid}")
+
+    future.add_done_callback(log_result)
+    return future
 
 
 if __name__ == "__main__":
@@ -64,7 +106,7 @@ if __name__ == "__main__":
         request_id="test_request_id",
         title="Heizung kaputt",
         description="Wasser läuft aus dem Heizkörper im Wohnzimmer."
-    )
+    ).result()
 
 
 
@@ -0,0 +1,217 @@
+"""
+Lokaler Stand-in für Twilio Media Streams (die Twilio-Seite des Sockets)
+Schickt connected/start, dann μ-law Frames im 20 ms Takt wie ein echtes
+Telefonat, beantwortet marks erst nach der simulierten Wiedergabe und misst
+pro Äußerung die Zeit vom Ende des Sprechens bis zum ersten Audio-Frame.
+
+    python twillio/test/fake_media_stream.py ws://127.0.0.1:5001/media-stream a.wav b.wav
+    python twillio/test/fake_media_stream.py ws://127.0.0.1:5001/media-stream      # synthetische Äußerungen
+    python twillio/test/fake_media_stream.py selftest "Hi, is Tuesday possible?" "10 am works."
+
+selftest startet den ASGI-Server im selben Prozess mit STT_ENGINE=scripted:
+die Endpunkt-Erkennung läuft echt, der erkannte Text kommt aus den Argumenten.
+Gemini und ElevenLabs werden wirklich aufgerufen (Keys aus .env).
+"""
+import asyncio
+import base64
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+import wave
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+import numpy as np
+from websockets.asyncio.client import connect
+
+from language_input.speech_to_text import SAMPLE_RATE, pcm16_to_ulaw
+
+FRAME_BYTES = 160  # 20 ms μ-law
+FRAME_SECONDS = FRAME_BYTES / SAMPLE_RATE
+PORT = int(os.getenv("FAKE_STREAM_PORT", "5098"))
+# So lange wird nach einer Äußerung höchstens auf die Antwort gewartet
+REPLY_TIMEOUT_SECONDS = 20.0
+
+
+def load_wav(path):
+    """WAV (16 bit, mono) -> μ-law 8 kHz"""
+    with wave.open(path, "rb") as wav:
+        if wav.getsampwidth() != 2 or wav.getnchannels() != 1:
+            raise ValueError(f"{path}: nur 16 bit mono WAV")
+        rate = wav.getframerate()
+        samples = np.frombuffer(wav.readframes(wav.getnframes()), dtype=np.int16)
+    if rate != SAMPLE_RATE:
+        positions = np.arange(0, len(samples), rate / SAMPLE_RATE)
+        samples = np.interp(positions, np.arange(len(samples)), samples).astype(np.int16)
+    return pcm16_to_ulaw(samples)
+
+
+def synthetic_utterance(seconds=1.2):
+    """Sprachähnliches Signal (Grundton + Rauschen, moduliert), genug für die VAD"""
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    envelope = 0.6 + 0.4 * np.sin(2 * np.pi * 3 * t)
+    signal = envelope * (3000 * np.sin(2 * np.pi * 180 * t) + np.random.normal(0, 800, t.size))
+    return pcm16_to_ulaw(signal)
+
+
+SILENCE_FRAME = pcm16_to_ulaw(np.zeros(FRAME_BYTES))
+
+
+class FakeTwilioStream:
+    def __init__(self, url, utterances, parameters=None):
+        self.url = url
+        self.utterances = utterances
+        self.parameters = parameters or {}
+        self.stream_sid = f"MZ{uuid.uuid4().hex}"
+        self.call_sid = f"CA{uuid.uuid4().hex}"
+        self.received_bytes = 0
+        self.clears = 0
+        self.turns = []
+        self._play_until = 0.0
+        self._speech_ended_at = None
+        self._first_audio_at = None
+        self._marks_echoed = 0
+        self._reply_done = asyncio.Event()
+
+    async def _send(self, ws, event, **fields):
+        await ws.send(json.dumps({"event": event, "streamSid": self.stream_sid, **fields}))
+
+    async def _send_frame(self, ws, frame, chunk):
+        await self._send(ws, "media", media={
+            "track": "inbound",
+            "chunk": str(chunk),
+            "timestamp": str(int(chunk * FRAME_SECONDS * 1000)),
+            "payload": base64.b64encode(frame).decode("ascii"),
+        })
+
+    async def _echo_mark(self, ws, name, delay):
+        # Twilio meldet den mark erst, wenn die Wiedergabe bis dorthin gekommen ist
+        await asyncio.sleep(max(0.0, delay))
+        await self._send(ws, "mark", mark={"name": name})
+        self._marks_echoed += 1
+        self._reply_done.set()
+
+    async def _receive(self, ws):
+        async for raw in ws:
+            message = json.loads(raw)
+            event = message.get("event")
+            now = time.monotonic()
+            if event == "media":
+                audio = base64.b64decode(message["media"]["payload"])
+                self.received_bytes += len(audio)
+                if self._first_audio_at is None:
+                    self._first_audio_at = now
+                self._play_until = max(now, self._play_until) + len(audio) / SAMPLE_RATE
+            elif event == "mark":
+                asyncio.create_task(self._echo_mark(ws, message["mark"]["name"], self._play_until - now))
+            elif event == "clear":
+                self.clears += 1
+                self._play_until = now
+
+    async def _stream_silence_until(self, ws, chunk, done, timeout):
+        deadline = time.monotonic() + timeout
+        while not done() and time.monotonic() < deadline:
+            await self._send_frame(ws, SILENCE_FRAME, chunk)
+            chunk += 1
+            await asyncio.sleep(FRAME_SECONDS)
+        return chunk
+
+    async def run(self):
+        async with connect(self.url) as ws:
+            receiver = asyncio.create_task(self._receive(ws))
+            await ws.send(json.dumps({"event": "connected", "protocol": "Call", "version": "1.0.0"}))
+            await self._send(ws, "start", start={
+                "streamSid": self.stream_sid,
+                "callSid": self.call_sid,
+                "tracks": ["inbound"],
+                "mediaFormat": {"encoding": "audio/x-mulaw", "sampleRate": SAMPLE_RATE, "channels": 1},
+                "customParameters": self.parameters,
+            })
+
+            # Eröffnung des Agents abwarten (wie ein Mensch, der zuhört)
+            chunk = await self._stream_silence_until(ws, 0, self._reply_done.is_set, REPLY_TIMEOUT_SECONDS)
+            print(f"🔈 Eröffnung: {self.received_bytes / SAMPLE_RATE:.1f}s Audio")
+
+            for index, audio in enumerate(self.utterances, start=1):
+                self._reply_done.clear()
+                self._first_audio_at = None
+                before = self.received_bytes
+                for start in range(0, len(audio), FRAME_BYTES):
+                    await self._send_frame(ws, audio[start:start + FRAME_BYTES], chunk)
+                    chunk += 1
+                    await asyncio.sleep(FRAME_SECONDS)
+                self._speech_ended_at = time.monotonic()
+                chunk = await self._stream_silence_until(ws, chunk, self._reply_done.is_set, REPLY_TIMEOUT_SECONDS)
+                latency = (self._first_audio_at - self._speech_ended_at) if self._first_audio_at else None
+                turn = {
+                    "utterance": index,
+                    "reply_seconds": round((self.received_bytes - before) / SAMPLE_RATE, 2),
+                    "first_audio_ms": round(latency * 1000) if latency is not None else None,
+                }
+                self.turns.append(turn)
+                print(f"🗣️  Äußerung {index}: {turn}")
+
+            await self._send(ws, "stop", stop={"callSid": self.call_sid})
+            receiver.cancel()
+
+    def report(self):
+        latencies = [t["first_audio_ms"] for t in self.turns if t["first_audio_ms"] is not None]
+        print("━" * 40)
+        print(f"Audio empfangen:  {self.received_bytes / SAMPLE_RATE:.1f}s ({self.received_bytes} bytes μ-law)")
+        print(f"Marks bestätigt:  {self._marks_echoed}, clear: {self.clears}")
+        if latencies:
+            print(f"Erstes Audio nach Sprechende: p50 {int(np.median(latencies))} ms, max {max(latencies)} ms")
+
+
+def run_server():
+    import uvicorn
+    from twillio.asgi_server import app
+
+    uvicorn.run(app, host="127.0.0.1", port=PORT, log_level="warning")
+
+
+def selftest(lines):
+    """Server + Client in einem Prozess, STT durch die Skript-Zeilen ersetzt"""
+    from language_input.speech_to_text import SpeechRecognizer, create_recognizer, register_recognizer
+
+    class ScriptedRecognizer(SpeechRecognizer):
+        """Echte Endpunkt-Erkennung, der Text kommt aber aus dem Skript"""
+
+        def __init__(self):
+            super().__init__()
+            self.lines = iter(lines)
+
+        def transcribe(self, audio):
+            return next(self.lines, "")
+
+    register_recognizer("scripted", ScriptedRecognizer)
+    # create_recognizer() liest STT_ENGINE pro Call, also auch im Server-Thread
+    os.environ["STT_ENGINE"] = "scripted"
+    assert isinstance(create_recognizer(), ScriptedRecognizer)
+    threading.Thread(target=run_server, daemon=True).start()
+    time.sleep(2.0)
+
+    stream = FakeTwilioStream(
+        f"ws://127.0.0.1:{PORT}/media-stream",
+        [synthetic_utterance() for _ in lines],
+        {"title": "Selftest", "description": "Termin für eine Kontrolle"},
+    )
+    asyncio.run(stream.run())
+    stream.report()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "selftest":
+        selftest(sys.argv[2:] or ["Hello, yes, how can I help?", "Tuesday at ten works."])
+    elif len(sys.argv) > 1:
+        wavs = sys.argv[2:]
+        utterances = [load_wav(path) for path in wavs] or [synthetic_utterance() for _ in range(2)]
+        stream = FakeTwilioStream(sys.argv[1], utterances)
+        asyncio.run(stream.run())
+        stream.report()
+    else:
+        print(__doc__)
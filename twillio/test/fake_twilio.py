@@ -0,0 +1,112 @@
+"""
+Lokaler Stand-in für die Twilio REST API (nur Calls.json)
+Erzwingt ein Calls-per-Second Limit pro Absender-Nummer und antwortet
+darüber mit 429, genau wie Twilio.
+
+    python twillio/test/fake_twilio.py            # Server auf :5099
+    python twillio/test/fake_twilio.py burst 30   # Dialer gegen den Fake testen
+
+Der echte Code spricht den Fake an mit:
+    TWILIO_API_BASE_URL=http://127.0.0.1:5099
+"""
+import os
+import sys
+import threading
+import time
+import uuid
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from flask import Flask, jsonify, request
+
+app = Flask(__name__)
+
+CALLS_PER_SECOND = float(os.getenv("FAKE_TWILIO_CPS", "1"))
+PORT = int(os.getenv("FAKE_TWILIO_PORT", "5099"))
+
+calls = []
+rejected = 0
+_last_call = {}
+_lock = threading.Lock()
+
+
+@app.route("/2010-04-01/Accounts/<account_sid>/Calls.json", methods=["POST"])
+def create_call(account_sid):
+    global rejected
+    from_number = request.form.get("From", "")
+    now = time.monotonic()
+    with _lock:
+        last = _last_call.get(from_number)
+        if last is not None and now - last < 1.0 / CALLS_PER_SECOND:
+            rejected += 1
+            return jsonify({
+                "code": 20429,
+                "message": "Too Many Requests",
+                "more_info": "https://www.twilio.com/docs/errors/20429",
+                "status": 429,
+            }), 429
+        _last_call[from_number] = now
+
+        call = {
+            "sid": f"CA{uuid.uuid4().hex}",
+            "account_sid": account_sid,
+            "to": request.form.get("To"),
+            "from": from_number,
+            "status": "queued",
+            "direction": "outbound-api",
+            "uri": f"/2010-04-01/Accounts/{account_sid}/Calls.json",
+        }
+        calls.append({**call, "url": request.form.get("Url"), "created_at": time.time()})
+    return jsonify(call), 201
+
+
+@app.route("/calls")
+def list_calls():
+    return jsonify({"calls": calls, "rejected": rejected})
+
+
+def run_server():
+    app.run(host="127.0.0.1", port=PORT, threaded=True)
+
+
+def burst(count):
+    """Schickt count Anrufe gleichzeitig an den Dialer und zeigt die Metriken"""
+    from twilio.rest import Client
+    from twillio.dialer import Dialer
+
+    threading.Thread(target=run_server, daemon=True).start()
+    time.sleep(0.5)
+
+    client = Client("ACfake", "fake-token")
+    client.api.base_url = f"http://127.0.0.1:{PORT}"
+    # Burst 2 gegen Fake-Limit 1/s -> provoziert 429 und damit Retries
+    dialer = Dialer(client.calls.create, calls_per_second=CALLS_PER_SECOND, burst=2, max_live_calls=10)
+
+    start = time.monotonic()
+    futures = [
+        dialer.submit(to=f"+4917600000{i:03d}", from_="+15550000000", url="http://127.0.0.1:5001/voice")
+        for i in range(count)
+    ]
+    print(f"📤 {count} Anrufe eingereiht in {(time.monotonic() - start) * 1000:.1f} ms")
+
+    # Live-Calls nach kurzer Zeit "beenden", sonst bleibt der Dialer am Limit stehen
+    done = 0
+    while done < count:
+        for future in futures:
+            if future.done() and not future.exception():
+                dialer.release(future.result().sid)
+        done = sum(1 for f in futures if f.done())
+        print(f"   {dialer.stats()}")
+        time.sleep(1)
+
+    failed = [f for f in futures if f.exception()]
+    print(f"✅ {count - len(failed)} gewählt, {len(failed)} fehlgeschlagen, "
+          f"{rejected} x 429 vom Fake, {time.monotonic() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "burst":
+        burst(int(sys.argv[2]) if len(sys.argv) > 2 else 30)
+    else:
+        run_server()
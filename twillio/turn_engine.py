@@ -0,0 +1,74 @@
+"""
+Pipelined Turn: Gemini Tokens -> Sätze -> TTS
+Die Synthese von Satz 1 läuft schon, während Gemini noch Satz 2 schreibt
+"""
+import re
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from language_output.language_output import OUTPUT_FORMAT, prefetch_speech
+
+
+# Satzende = . ! ? … gefolgt von Whitespace (nicht "14.30" oder "z.B." mitten im Wort)
+SENTENCE_END = re.compile(r'[.!?…]+["\')\]]*\s+')
+# Kürzere Stücke werden mit dem nächsten Satz zusammengelegt ("Dr. Müller", "Ja.")
+MIN_SENTENCE_CHARS = 20
+ABBREVIATIONS = {"dr", "prof", "hr", "fr", "nr", "str", "ca", "bzw", "usw", "z.b", "mr", "mrs", "ms", "st", "e.g", "i.e"}
+
+
+def iter_sentences(chunks: Iterable[str], min_chars: int = MIN_SENTENCE_CHARS) -> Iterator[str]:
+    """
+    Schneidet einen Token-Stream an Satzgrenzen
+
+    Args:
+        chunks: Text-Stücke wie sie vom LLM kommen
+        min_chars: Mindestlänge eines Segments
+
+    Returns:
+        Iterator über vollständige Sätze (getrimmt)
+    """
+    buffer = ""
+    for chunk in chunks:
+        buffer += chunk
+        start = 0
+        for match in SENTENCE_END.finditer(buffer):
+            if match.end() - start < min_chars:
+                continue
+            words = buffer[start:match.start()].split()
+            if words and words[-1].lower() in ABBREVIATIONS:
+                continue
+            sentence = buffer[start:match.end()].strip()
+            if sentence:
+                yield sentence
+            start = match.end()
+        buffer = buffer[start:]
+
+    rest = buffer.strip()
+    if rest:
+        yield rest
+
+
+def iter_turn(chunks: Iterable[str], output_format: str = OUTPUT_FORMAT) -> Iterator[Tuple[str, Optional[str]]]:
+    """
+    Wie run_turn(), liefert aber jeden Satz, sobald seine Synthese läuft
+
+    Returns:
+        Iterator über (Satz, Dateiname relativ zu /audio/ oder None)
+    """
+    for sentence in iter_sentences(chunks):
+        yield sentence, prefetch_speech(sentence, output_format=output_format)
+
+
+def run_turn(chunks: Iterable[str]) -> Tuple[str, List[str]]:
+    """
+    Startet für jeden fertigen Satz sofort die TTS-Synthese
+
+    Returns:
+        (kompletter Text, geordnete Liste der /audio URLs für <Play>)
+    """
+    sentences = []
+    urls = []
+    for sentence, filename in iter_turn(chunks):
+        sentences.append(sentence)
+        if filename:
+            urls.append(f"/audio/{filename}")
+    return " ".join(sentences), urls